@@ -0,0 +1,102 @@
+"""Compares throughput of interpreters on classic Prolog benchmarks.
+
+Run from repository root with:
+
+    python -m benchmarks.engines
+"""
+import sys
+import time
+from prolog import Parser, Scanner, Runtime, IterativeRuntime, WamRuntime
+
+
+NREV = '''
+app([], L, L).
+app([H | T], L, [H | R]) :- app(T, L, R).
+
+nrev([], []).
+nrev([H | T], R) :- nrev(T, RT), app(RT, [H], R).
+
+range(N, N, [N]) :- !.
+range(M, N, [M | Ns]) :- M1 is M + 1, range(M1, N, Ns).
+
+bench :- range(1, 30, L), nrev(L, _).
+'''
+
+QUEENS = '''
+range(N, N, [N]) :- !.
+range(M, N, [M | Ns]) :- M < N, M1 is M + 1, range(M1, N, Ns).
+
+select(X, [X | T], T).
+select(X, [H | T], [H | R]) :- select(X, T, R).
+
+permutation([], []).
+permutation(L, [H | T]) :- select(H, L, R), permutation(R, T).
+
+safe([]).
+safe([Q | Qs]) :- no_attack(Q, Qs, 1), safe(Qs).
+
+no_attack(_, [], _).
+no_attack(Q, [Q1 | Qs], D) :-
+    Up is Q1 + D, Q =/ Up, Down is Q1 - D, Q =/ Down,
+    D1 is D + 1, no_attack(Q, Qs, D1).
+
+queens(N, Qs) :- range(1, N, Ns), permutation(Ns, Qs), safe(Qs).
+
+bench :- queens(6, _), fail.
+bench.
+'''
+
+DERIV = '''
+d(plus(U, V), X, plus(DU, DV)) :- !, d(U, X, DU), d(V, X, DV).
+d(minus(U, V), X, minus(DU, DV)) :- !, d(U, X, DU), d(V, X, DV).
+d(times(U, V), X, plus(times(DU, V), times(U, DV))) :- !,
+    d(U, X, DU), d(V, X, DV).
+d(divide(U, V), X, divide(minus(times(DU, V), times(U, DV)), pow(V, 2))) :-
+    !, d(U, X, DU), d(V, X, DV).
+d(pow(U, N), X, times(DU, times(N, pow(U, N1)))) :- !,
+    N1 is N - 1, d(U, X, DU).
+d(neg(U), X, neg(DU)) :- !, d(U, X, DU).
+d(exp(U), X, times(exp(U), DU)) :- !, d(U, X, DU).
+d(log(U), X, divide(DU, U)) :- !, d(U, X, DU).
+d(X, X, 1) :- !.
+d(_, _, 0).
+
+ops8 :- d(times(plus(x, 1), times(plus(pow(x, 2), 2), plus(pow(x, 3), 3))),
+    x, _).
+divide10 :- d(divide(divide(divide(divide(divide(divide(divide(divide(
+    divide(x, x), x), x), x), x), x), x), x), x), x, _).
+log10 :- d(log(log(log(log(log(log(log(log(log(log(x)))))))))), x, _).
+times10 :- d(times(times(times(times(times(times(times(times(times(x, x), x),
+    x), x), x), x), x), x), x), x, _).
+
+bench :- ops8, divide10, log10, times10.
+'''
+
+PROGRAMS = [('nrev', NREV), ('queens', QUEENS), ('deriv', DERIV)]
+ENGINES = [Runtime, IterativeRuntime, WamRuntime]
+
+
+def measure(runtime_class, source, repeat):
+    runtime = runtime_class(Parser(Scanner(source).tokenize()).parse_rules())
+    goal = Parser(Scanner('bench.').tokenize()).parse_terms()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _ in runtime.execute(goal):
+            pass
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat=5):
+    sys.setrecursionlimit(10000)
+    names = [engine.__name__ for engine in ENGINES]
+    print(f'{"program":10}' + ''.join(f'{name:>18}' for name in names))
+    for name, source in PROGRAMS:
+        times = [measure(engine, source, repeat) for engine in ENGINES]
+        row = ''.join(
+            f'{t * 1000:9.2f} ms {times[0] / t:4.1f}x' for t in times
+        )
+        print(f'{name:10}{row}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
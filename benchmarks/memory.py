@@ -0,0 +1,37 @@
+"""Reports memory taken by parsed clauses of generated database.
+
+Run from repository root with:
+
+    python -m benchmarks.memory [facts]
+"""
+import gc
+import sys
+import tracemalloc
+from prolog import Parser, Scanner
+
+
+def database(facts):
+    rooms = ['kitchen', 'office', 'hall', 'cellar', 'attic']
+    return '\n'.join(
+        f'location(item{i}, {rooms[i % len(rooms)]}).' for i in range(facts)
+    )
+
+
+def measure(facts):
+    tokens = Scanner(database(facts)).tokenize()
+    gc.collect()
+    tracemalloc.start()
+    rules = Parser(tokens).parse_rules()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(rules) == facts
+    return size / facts
+
+
+def main(facts=50000):
+    print(f'location/2 {facts} facts: {measure(facts):.0f} bytes per fact')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
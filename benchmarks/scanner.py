@@ -0,0 +1,47 @@
+"""Times tokenizing of generated fact file.
+
+Run from repository root with:
+
+    python -m benchmarks.scanner [megabytes]
+"""
+import os
+import sys
+import tempfile
+import time
+from prolog import Scanner
+
+
+def write_database(path, size):
+    rooms = ['kitchen', 'office', 'hall', 'cellar', "'dinning room'"]
+    with open(path, 'w') as writer:
+        written = i = 0
+        while written < size:
+            room = rooms[i % len(rooms)]
+            text = (
+                f'% item {i}\n'
+                f'location(item{i}, {room}).\n'
+                f'weight(item{i}, {i % 97}.5).\n'
+                f'heavy(X) :- weight(X, W), W > {i % 50}.\n'
+            )
+            written += writer.write(text)
+            i += 1
+
+
+def main(megabytes=50):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facts.prolog')
+        write_database(path, megabytes * 2**20)
+        with open(path) as reader:
+            source = reader.read()
+
+    start = time.perf_counter()
+    tokens = Scanner(source).tokenize()
+    elapsed = time.perf_counter() - start
+    print(
+        f'{megabytes} MB, {len(tokens)} tokens: {elapsed:.2f} s, '
+        f'{megabytes / elapsed:.1f} MB/s'
+    )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
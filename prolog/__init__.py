@@ -1,6 +1,15 @@
 from .parser import Parser
 from .scanner import Scanner
-from .interpreter import Runtime, Rule, Conjunction
+from .interpreter import Runtime, IterativeRuntime, Rule, Conjunction
+from .wam import WamRuntime
 
 
-__all__ = ['Parser', 'Runtime', 'Rule', 'Conjunction', 'Scanner']
+__all__ = [
+    'Parser',
+    'Runtime',
+    'IterativeRuntime',
+    'WamRuntime',
+    'Rule',
+    'Conjunction',
+    'Scanner',
+]
@@ -3,6 +3,8 @@ from .merge_bindings import merge_bindings
 
 
 class BuiltinsBase(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def match(self, other):
         pass
@@ -21,9 +23,18 @@ class BuiltinsBase(ABC):
 
 
 class Fail:
+    __slots__ = ('name',)
+    ground = True
+
     def __init__(self):
         self.name = 'fail'
 
+    def rename(self, env):
+        return self
+
+    def resolve(self):
+        return self
+
     def match(self, other):
         return None
 
@@ -38,9 +49,18 @@ class Fail:
 
 
 class Cut:
+    __slots__ = ('name',)
+    ground = True
+
     def __init__(self):
         self.name = 'cut'
 
+    def rename(self, env):
+        return self
+
+    def resolve(self):
+        return self
+
     def match(self, other):
         return {}
 
@@ -55,9 +75,11 @@ class Cut:
 
 
 class Write(BuiltinsBase):
+    __slots__ = ('pred', 'args')
+
     def __init__(self, *args):
         self.pred = 'write'
-        self.args = list(args)
+        self.args = args
 
     def match(self, other):
         return {}
@@ -66,6 +88,12 @@ class Write(BuiltinsBase):
         result = Write(*map((lambda arg: arg.substitute(bindings)), self.args))
         return result
 
+    def rename(self, env):
+        return Write(*[arg.rename(env) for arg in self.args])
+
+    def resolve(self):
+        return Write(*[arg.resolve() for arg in self.args])
+
     def display(self, stream_writer):
         for arg in self.args:
             stream_writer(str(arg))
@@ -81,6 +109,9 @@ class Write(BuiltinsBase):
 
 
 class Nl(BuiltinsBase):
+    __slots__ = ('pred',)
+    ground = True
+
     def __init__(self):
         self.pred = 'nl'
 
@@ -90,6 +121,12 @@ class Nl(BuiltinsBase):
     def substitute(self, bindings):
         return Nl()
 
+    def rename(self, env):
+        return self
+
+    def resolve(self):
+        return self
+
     def display(self, stream_writer):
         stream_writer('\n')
 
@@ -101,6 +138,9 @@ class Nl(BuiltinsBase):
 
 
 class Tab(BuiltinsBase):
+    __slots__ = ('pred',)
+    ground = True
+
     def __init__(self):
         self.pred = 'tab'
 
@@ -110,6 +150,12 @@ class Tab(BuiltinsBase):
     def substitute(self, bindings):
         return Tab()
 
+    def rename(self, env):
+        return self
+
+    def resolve(self):
+        return self
+
     def display(self, stream_writer):
         stream_writer('\t')
 
@@ -121,6 +167,8 @@ class Tab(BuiltinsBase):
 
 
 class DatabaseOp(ABC):
+    __slots__ = ('pred', 'arg')
+
     def match(self, other):
         bindings = dict()
         if self != other:
@@ -135,6 +183,12 @@ class DatabaseOp(ABC):
     def execute(self, remove_rule):
         pass
 
+    def rename(self, env):
+        return type(self)(self.arg.rename(env))
+
+    def resolve(self):
+        return type(self)(self.arg.resolve())
+
     def query(self, runtime, bindings={}):
         param_bound = list(self.arg.query(runtime))
         if param_bound:
@@ -147,6 +201,8 @@ class DatabaseOp(ABC):
 
 
 class Retract(DatabaseOp):
+    __slots__ = ()
+
     def __init__(self, arg):
         self.pred = 'retract'
         self.arg = arg
@@ -168,6 +224,8 @@ class Retract(DatabaseOp):
 
 
 class AssertA(DatabaseOp):
+    __slots__ = ()
+
     def __init__(self, arg):
         self.pred = 'asserta'
         self.arg = arg
@@ -189,6 +247,8 @@ class AssertA(DatabaseOp):
 
 
 class AssertZ(DatabaseOp):
+    __slots__ = ()
+
     def __init__(self, arg):
         self.pred = 'assertz'
         self.arg = arg
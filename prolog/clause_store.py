@@ -0,0 +1,306 @@
+from heapq import merge
+from operator import itemgetter
+from .types import Term, deref
+
+
+_order = itemgetter(0)
+_rule = itemgetter(1)
+
+# Predicates with fewer clauses than this are always scanned.
+JIT_MIN_CLAUSES = 8
+
+
+def predicate_key(term):
+    """Returns name/arity key under which clauses for term are stored."""
+    return getattr(term, 'pred', None), len(getattr(term, 'args', ()))
+
+
+def argument_key(arg):
+    """Returns principal functor of an argument or None.
+
+    Only plain terms (atoms, numbers and compound terms) can be indexed.
+    Variables, lists, expressions and anything else may match more than
+    one functor and must always be tried.
+    """
+    arg = deref(arg)
+    if isinstance(arg, Term) and arg.pred is not None:
+        return arg.pred, len(arg.args)
+    return None
+
+
+class ArgumentIndex:
+    """Hash index of clause entries on principal functor of one argument.
+
+    Entries whose argument cannot be indexed are kept aside in
+    unindexed list and are merged into every lookup.
+    """
+
+    def __init__(self, position):
+        self.position = position
+        self.buckets = {}
+        self.unindexed = []
+        self._indexed = 0
+
+    @classmethod
+    def build(cls, position, entries):
+        index = cls(position)
+        for entry in entries:
+            index.add_right(entry)
+        return index
+
+    def _key(self, entry):
+        return argument_key(entry[1].head.args[self.position])
+
+    def _bucket(self, key):
+        if key is None:
+            return self.unindexed
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = []
+        return bucket
+
+    def add_left(self, entry):
+        key = self._key(entry)
+        self._indexed += key is not None
+        self._bucket(key).insert(0, entry)
+
+    def add_right(self, entry):
+        key = self._key(entry)
+        self._indexed += key is not None
+        self._bucket(key).append(entry)
+
+    def extend(self, entries):
+        """Appends entries as add_right of each one would."""
+        position = self.position
+        buckets = self.buckets
+        for entry in entries:
+            key = argument_key(entry[1].head.args[position])
+            if key is None:
+                self.unindexed.append(entry)
+                continue
+            self._indexed += 1
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = []
+            bucket.append(entry)
+
+    def remove(self, entry):
+        key = self._key(entry)
+        bucket = self._bucket(key)
+        bucket.remove(entry)
+        if key is not None:
+            self._indexed -= 1
+            if not bucket:
+                del self.buckets[key]
+
+    @property
+    def expected_size(self):
+        """Average number of clauses a lookup returns."""
+        if not self.buckets:
+            return len(self.unindexed)
+        return len(self.unindexed) + self._indexed / len(self.buckets)
+
+    def candidates(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return self.unindexed[:]
+        if not self.unindexed:
+            return bucket[:]
+        return merge(bucket[:], self.unindexed[:], key=_order)
+
+
+class Predicate:
+    """Clauses of single predicate in source order.
+
+    Clauses are kept as (order, rule) entries.  asserta style inserts get
+    decreasing order numbers and assertz style inserts get increasing ones
+    so every bucket stays sorted without renumbering.
+
+    First argument index is maintained on every update.  Indexes on other
+    arguments are built just in time, for positions that are bound in
+    most calls, and are dropped whenever clauses change.  Index that does
+    not split clauses into at least two groups is remembered as not
+    selective and not used.
+    """
+
+    def __init__(self, name, arity):
+        self.name = name
+        self.arity = arity
+        self._entries = []
+        self._first = 0
+        self._last = 0
+        self._indexes = {}
+        if arity > 0:
+            self._indexes[0] = ArgumentIndex(0)
+        self.calls = 0
+        self.bound = [0] * arity
+        self.index_builds = 0
+        self.index_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return map(_rule, self._entries)
+
+    def _invalidate(self):
+        for position in list(self._indexes):
+            if position != 0:
+                del self._indexes[position]
+
+    def insert_left(self, rule):
+        self._invalidate()
+        self._first -= 1
+        entry = (self._first, rule)
+        self._entries.insert(0, entry)
+        if self.arity > 0:
+            self._indexes[0].add_left(entry)
+
+    def insert_right(self, rule):
+        self._invalidate()
+        self._last += 1
+        entry = (self._last, rule)
+        self._entries.append(entry)
+        if self.arity > 0:
+            self._indexes[0].add_right(entry)
+
+    def extend(self, rules):
+        """Appends rules in order, as insert_right of each one would."""
+        self._invalidate()
+        entries = list(enumerate(rules, self._last + 1))
+        self._last += len(entries)
+        self._entries.extend(entries)
+        if self.arity > 0:
+            self._indexes[0].extend(entries)
+
+    def remove(self, rule):
+        for i, entry in enumerate(self._entries):
+            if entry[1] is rule:
+                self._entries.pop(i)
+                break
+        else:
+            return False
+
+        self._invalidate()
+        if self.arity > 0:
+            self._indexes[0].remove(entry)
+        return True
+
+    def _index(self, position):
+        if position in self._indexes:
+            return self._indexes[position]
+        if (
+            len(self._entries) < JIT_MIN_CLAUSES
+            or self.bound[position] * 2 < self.calls
+        ):
+            return None
+
+        index = ArgumentIndex.build(position, self._entries)
+        self.index_builds += 1
+        if len(index.buckets) < 2:
+            index = None
+        self._indexes[position] = index
+        return index
+
+    def _select_index(self, bound):
+        best = None
+        for position in bound:
+            index = self._index(position)
+            if index is None:
+                continue
+            if best is None or index.expected_size < best.expected_size:
+                best = index
+        return best
+
+    def candidates(self, goal):
+        """Returns clauses which may match goal, in clause order.
+
+        Buckets are copied so that clauses asserted or retracted while
+        goal is being resolved do not affect the running call.
+        """
+        self.calls += 1
+        keys = [argument_key(arg) for arg in goal.args]
+        bound = [i for i, key in enumerate(keys) if key is not None]
+        for position in bound:
+            self.bound[position] += 1
+
+        index = self._select_index(bound)
+        if index is None:
+            return map(_rule, self._entries[:])
+
+        self.index_hits += 1
+        return map(_rule, index.candidates(keys[index.position]))
+
+    def statistics(self):
+        return {
+            'clauses': len(self._entries),
+            'calls': self.calls,
+            'bound': list(self.bound),
+            'indexes': sorted(
+                position
+                for position, index in self._indexes.items()
+                if index is not None
+            ),
+            'index_builds': self.index_builds,
+            'index_hits': self.index_hits,
+        }
+
+
+class ClauseStore:
+    """Clause database keyed by predicate name and arity."""
+
+    def __init__(self, rules=()):
+        self._predicates = {}
+        for rule in rules:
+            self.insert_right(rule)
+
+    def __len__(self):
+        return sum(len(p) for p in self._predicates.values())
+
+    def __iter__(self):
+        for predicate in self._predicates.values():
+            yield from predicate
+
+    def predicate(self, key):
+        return self._predicates.get(key)
+
+    def _predicate_for(self, head):
+        return self._predicate_of(predicate_key(head))
+
+    def _predicate_of(self, key):
+        predicate = self._predicates.get(key)
+        if predicate is None:
+            predicate = self._predicates[key] = Predicate(*key)
+        return predicate
+
+    def insert_left(self, rule):
+        self._predicate_for(rule.head).insert_left(rule)
+
+    def insert_right(self, rule):
+        self._predicate_for(rule.head).insert_right(rule)
+
+    def extend(self, key, rules):
+        """Appends rules of predicate with name/arity key in one pass."""
+        self._predicate_of(key).extend(rules)
+
+    def remove(self, rule):
+        predicate = self._predicates.get(predicate_key(rule.head))
+        if predicate is None:
+            return False
+        return predicate.remove(rule)
+
+    def candidates(self, goal):
+        """Returns clauses which may match goal, in clause order."""
+        if not isinstance(goal, Term):
+            return iter(list(self))
+        predicate = self._predicates.get(predicate_key(goal))
+        if predicate is None:
+            return iter(())
+        return predicate.candidates(goal)
+
+    def statistics(self):
+        """Returns indexing counters of every predicate by name/arity."""
+        return {
+            f'{p.name}/{p.arity}': p.statistics()
+            for p in self._predicates.values()
+        }
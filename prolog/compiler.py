@@ -0,0 +1,245 @@
+from .types import (
+    Variable,
+    Term,
+    Dot,
+    Bar,
+    deref,
+    _compound,
+    _make_list,
+    _normalize_list,
+    _uncons,
+)
+
+
+def _variable_names(term, names):
+    if isinstance(term, Variable):
+        names.add(term.name)
+    elif isinstance(term, Dot):
+        for item in term:
+            _variable_names(item, names)
+    elif isinstance(term, Bar):
+        _variable_names(term.head, names)
+        _variable_names(term.tail, names)
+    elif isinstance(term, Term):
+        for arg in term.args:
+            _variable_names(arg, names)
+
+
+def _copy_variable(name):
+    if name == '_':
+        return lambda env: Variable('_')
+
+    def copy_variable(env):
+        variable = env.get(name)
+        if variable is None:
+            variable = env[name] = Variable(name)
+        return variable
+
+    return copy_variable
+
+
+def _copy_compound(term):
+    pred = term.pred
+    units = [compile_copy(arg) for arg in term.args]
+
+    def copy_compound(env):
+        return _compound(pred, tuple([unit(env) for unit in units]))
+
+    return copy_compound
+
+
+def _copy_list(term):
+    if isinstance(term, Bar):
+        head = _copy_list(term.head)
+        tail = compile_copy(term.tail)
+        return lambda env: Bar(head(env), tail(env))
+
+    units = [compile_copy(item) for item in term]
+    return lambda env: Dot.from_list([unit(env) for unit in units])
+
+
+def compile_copy(term):
+    """Compiles term into function(env) returning its renamed copy.
+
+    Copy is built directly from env of clause activation: ground parts
+    are shared, variables are looked up or created by name and nothing
+    else is type tested again.
+    """
+    if getattr(term, 'ground', False):
+        return lambda env: term
+    if type(term) is Variable:
+        return _copy_variable(term.name)
+    if type(term) is Term:
+        return _copy_compound(term)
+    if isinstance(term, (Dot, Bar)):
+        return _copy_list(term)
+    return term.rename
+
+
+def _unify_any(arg, env, trail):
+    return True
+
+
+def _compile_variable(name, seen):
+    if name == '_':
+        return _unify_any
+
+    if name not in seen:
+        seen.add(name)
+
+        def unify_first(arg, env, trail):
+            env[name] = deref(arg)
+            return True
+
+        return unify_first
+
+    def unify_again(arg, env, trail):
+        return env[name].unify(arg, trail)
+
+    return unify_again
+
+
+def _compile_atom(term):
+    pred = term.pred
+
+    def unify_atom(arg, env, trail):
+        if arg is term:
+            return True
+        arg = deref(arg)
+        if isinstance(arg, Term):
+            return arg.pred == pred and not arg.args
+        if isinstance(arg, Variable):
+            trail.bind(arg, term)
+            return True
+        return False
+
+    return unify_atom
+
+
+def _compile_compound(term, seen):
+    pred = term.pred
+    arity = len(term.args)
+    copy = compile_copy(term)
+    units = [_compile_arg(arg, seen) for arg in term.args]
+
+    def unify_compound(arg, env, trail):
+        arg = deref(arg)
+        if isinstance(arg, Variable):
+            trail.bind(arg, copy(env))
+            return True
+        if (
+            not isinstance(arg, Term)
+            or arg.pred != pred
+            or len(arg.args) != arity
+        ):
+            return False
+        for unit, value in zip(units, arg.args):
+            if not unit(value, env, trail):
+                return False
+        return True
+
+    return unify_compound
+
+
+def _compile_list(term, seen):
+    if isinstance(term, Bar):
+        items = list(term.head)
+        tail = term.tail
+    else:
+        items = list(term)
+        tail = None
+    copies = [compile_copy(item) for item in items]
+    tail_copy = None if tail is None else compile_copy(tail)
+    units = [_compile_arg(item, seen) for item in items]
+    tail_unit = None if tail is None else _compile_arg(tail, seen)
+
+    def unify_list(arg, env, trail):
+        for i, unit in enumerate(units):
+            arg = _normalize_list(arg)
+            if isinstance(arg, Variable):
+                rest = _make_list(
+                    [copy(env) for copy in copies[i:]],
+                    None if tail is None else tail_copy(env),
+                )
+                trail.bind(arg, rest)
+                return True
+            if not isinstance(arg, (Dot, Bar)) or (
+                isinstance(arg, Dot) and arg.is_empty
+            ):
+                return False
+            head, arg = _uncons(arg)
+            if not unit(head, env, trail):
+                return False
+
+        if tail_unit is not None:
+            return tail_unit(arg, env, trail)
+        arg = _normalize_list(arg)
+        if isinstance(arg, Variable):
+            trail.bind(arg, Dot.from_list([]))
+            return True
+        return isinstance(arg, Dot) and arg.is_empty
+
+    return unify_list
+
+
+def _compile_generic(term, seen):
+    _variable_names(term, seen)
+
+    def unify_generic(arg, env, trail):
+        return term.rename(env).unify(arg, trail)
+
+    return unify_generic
+
+
+def _compile_arg(term, seen):
+    """Returns function(arg, env, trail) unifying arg with head argument.
+
+    Variables of the clause are looked up in env by name.  First
+    occurrence of a variable simply records what it was unified with.
+    """
+    if type(term) is Variable:
+        return _compile_variable(term.name, seen)
+    if isinstance(term, Term):
+        if not term.args:
+            return _compile_atom(term)
+        if type(term) is Term:
+            return _compile_compound(term, seen)
+    if isinstance(term, (Dot, Bar)):
+        return _compile_list(term, seen)
+    return _compile_generic(term, seen)
+
+
+def compile_head(head):
+    """Compiles clause head into function(goal, env, trail).
+
+    Returned function unifies goal with head renamed into env, with
+    unification unrolled for every argument of the head, so that no
+    renamed copy of the head needs to be built.  Heads which cannot be
+    compiled fall back to renaming and generic unification.
+    """
+    if type(head) is not Term:
+
+        def unify_head(goal, env, trail):
+            return head.rename(env).unify(goal, trail)
+
+        return unify_head
+
+    pred = head.pred
+    arity = len(head.args)
+    seen = set()
+    units = [_compile_arg(arg, seen) for arg in head.args]
+
+    def unify_head(goal, env, trail):
+        goal = deref(goal)
+        if (
+            not isinstance(goal, Term)
+            or goal.pred != pred
+            or len(goal.args) != arity
+        ):
+            return head.rename(env).unify(goal, trail)
+        for unit, arg in zip(units, goal.args):
+            if not unit(arg, env, trail):
+                return False
+        return True
+
+    return unify_head
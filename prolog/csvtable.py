@@ -0,0 +1,322 @@
+import csv
+import heapq
+import itertools
+import os
+import re
+import struct
+import tempfile
+import zlib
+from .errors import InterpreterError
+from .external import ExternalTable
+from .types import Number, Term, atom, deref
+
+
+# Cells written as Prolog numbers become numbers, any other cell an atom.
+NUMBER_PATTERN = re.compile(r'-?[0-9]+(?:\.[0-9]+)?\Z')
+
+INDEX_MAGIC = b'PLI1'
+
+# Index entries are hash of column and value followed by offset of row,
+# in memory they are kept as single integers which sort the same way.
+INDEX_RECORD = struct.Struct('>QQ')
+
+OFFSET_MASK = (1 << 64) - 1
+
+# Index entries sorted in memory at once while index is built.
+INDEX_RUN_SIZE = 1 << 20
+
+# Index entries read from or written to disk at once.
+INDEX_READ_SIZE = 4096
+
+
+def cell_value(text):
+    """Returns number written in a cell or its text."""
+    if NUMBER_PATTERN.match(text):
+        return float(text) if '.' in text else int(text)
+    return text
+
+
+def cell_term(text):
+    """Returns term standing for text of a cell."""
+    value = cell_value(text)
+    if type(value) is str:
+        return atom(value)
+    return Number(value)
+
+
+def _index_hash(column, value):
+    if type(value) is str:
+        data = f'{column}:{value}'.encode()
+    else:
+        # Equal numbers must have equal hash, however they are written.
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        data = f'{column}#{value}'.encode()
+    return zlib.crc32(data) << 32 | zlib.adler32(data)
+
+
+def _read_entries(reader):
+    while True:
+        block = reader.read(INDEX_RECORD.size * INDEX_READ_SIZE)
+        if not block:
+            return
+        for code, offset in INDEX_RECORD.iter_unpack(block):
+            yield code << 64 | offset
+
+
+def _write_entries(writer, entries):
+    entries = iter(entries)
+    while True:
+        block = b''.join(
+            [
+                entry.to_bytes(INDEX_RECORD.size, 'big')
+                for entry in itertools.islice(entries, INDEX_READ_SIZE)
+            ]
+        )
+        if not block:
+            return
+        writer.write(block)
+
+
+class _Lines:
+    """Decoded lines of binary file, remembering offset of the next one."""
+
+    def __init__(self, reader, encoding):
+        self._reader = reader
+        self._encoding = encoding
+        self.offset = reader.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self._reader.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self._encoding)
+
+
+class CsvTable(ExternalTable):
+    """Facts of a predicate stored as rows of a CSV or TSV file.
+
+    File is read row by row on every call and facts are made only of rows
+    matching bound arguments, so neither startup time nor memory depend
+    on size of the file.  Cells which are Prolog numbers become numbers
+    and other cells become atoms.
+
+    Calls binding one of index columns read only rows listed in index
+    file next to the source.  Index is built on first such call, with
+    entries sorted in runs of limited size, and built again whenever the
+    source changes.
+    """
+
+    def __init__(
+        self,
+        name,
+        arity,
+        path,
+        delimiter=None,
+        header=False,
+        index=(),
+        encoding='utf-8',
+    ):
+        self.name = name
+        self.arity = arity
+        self.path = os.fspath(path)
+        if delimiter is None:
+            delimiter = '\t' if self.path.lower().endswith('.tsv') else ','
+        self.delimiter = delimiter
+        self.header = header
+        self.index = tuple(sorted(set(index)))
+        if any(not 0 <= column < arity for column in self.index):
+            raise ValueError(f'Index columns must be below arity {arity}')
+        self.encoding = encoding
+        self.index_path = self.path + '.index'
+
+    @property
+    def key(self):
+        return self.name, self.arity
+
+    def _row(self, cells):
+        """Tells whether cells make a row, blank lines are skipped."""
+        if len(cells) == self.arity:
+            return True
+        if not cells:
+            return False
+        raise InterpreterError(
+            f'{self.path}: row {cells} does not have {self.arity} cells'
+        )
+
+    def _rows(self):
+        with open(self.path, newline='', encoding=self.encoding) as reader:
+            rows = csv.reader(reader, delimiter=self.delimiter)
+            if self.header:
+                next(rows, None)
+            arity = self.arity
+            for cells in rows:
+                if len(cells) == arity or self._row(cells):
+                    yield cells
+
+    def _records(self, reader):
+        """Yields offset and cells of rows from position of reader."""
+        lines = _Lines(reader, self.encoding)
+        rows = csv.reader(lines, delimiter=self.delimiter)
+        offset = lines.offset
+        for cells in rows:
+            if self._row(cells):
+                yield offset, cells
+            offset = lines.offset
+
+    def _skip_header(self, reader):
+        """Reads header row of binary reader without checking its cells."""
+        lines = _Lines(reader, self.encoding)
+        next(csv.reader(lines, delimiter=self.delimiter), None)
+
+    def _rows_at(self, offsets):
+        with open(self.path, 'rb') as reader:
+            for offset in offsets:
+                reader.seek(offset)
+                yield next(self._records(reader))[1]
+
+    def facts(self, goal, filters=(), env=None):
+        """Yields facts of rows whose cells match bound arguments of goal."""
+        bound = []
+        for column, arg in enumerate(goal.args):
+            arg = deref(arg)
+            if isinstance(arg, Term):
+                if arg.args:
+                    return
+                bound.append((column, arg.pred))
+
+        rows = None
+        for column, value in bound:
+            if column in self.index:
+                try:
+                    index = self._open_index()
+                except OSError:
+                    # Index cannot be built next to a read-only source,
+                    # whole file is scanned instead.
+                    break
+                rows = self._rows_at(self._offsets(index, column, value))
+                break
+        if rows is None:
+            rows = self._rows()
+
+        # Cells are compared before any term is made of them.
+        name = self.name
+        for cells in rows:
+            for column, value in bound:
+                text = cells[column]
+                if text != value and cell_value(text) != value:
+                    break
+            else:
+                yield Term(name, *map(cell_term, cells))
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return repr(
+            (
+                stat.st_size,
+                stat.st_mtime_ns,
+                self.delimiter,
+                self.header,
+                self.index,
+                self.encoding,
+            )
+        ).encode()
+
+    def _open_index(self):
+        """Returns index file positioned at its first entry.
+
+        Missing or stale index is built first.
+        """
+        stamp = INDEX_MAGIC + self._stamp() + b'\n'
+        try:
+            reader = open(self.index_path, 'rb')
+        except FileNotFoundError:
+            reader = None
+        if reader is not None:
+            if reader.read(len(stamp)) == stamp:
+                return reader
+            reader.close()
+        self._build_index(stamp)
+        reader = open(self.index_path, 'rb')
+        reader.seek(len(stamp))
+        return reader
+
+    def _build_index(self, stamp):
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        runs = []
+        try:
+            entries = []
+            with open(self.path, 'rb') as reader:
+                if self.header:
+                    self._skip_header(reader)
+                records = self._records(reader)
+                for offset, cells in records:
+                    for column in self.index:
+                        code = _index_hash(column, cell_value(cells[column]))
+                        entries.append(code << 64 | offset)
+                    if len(entries) < INDEX_RUN_SIZE:
+                        continue
+                    entries.sort()
+                    runs.append(self._write_run(directory, entries))
+                    entries = []
+            entries.sort()
+            if not runs:
+                self._write_index(directory, stamp, entries)
+                return
+            runs.append(self._write_run(directory, entries))
+            readers = [open(run, 'rb') for run in runs]
+            try:
+                entries = heapq.merge(*map(_read_entries, readers))
+                self._write_index(directory, stamp, entries)
+            finally:
+                for reader in readers:
+                    reader.close()
+        finally:
+            for run in runs:
+                os.unlink(run)
+
+    def _write_run(self, directory, entries):
+        descriptor, path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(descriptor, 'wb') as writer:
+            _write_entries(writer, entries)
+        return path
+
+    def _write_index(self, directory, stamp, entries):
+        descriptor, path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as writer:
+                writer.write(stamp)
+                _write_entries(writer, entries)
+            os.replace(path, self.index_path)
+        except BaseException:
+            os.unlink(path)
+            raise
+
+    def _offsets(self, reader, column, value):
+        """Yields offsets of rows whose cell in column may equal value.
+
+        Reader is index file returned by _open_index, it is closed once
+        offsets are read.
+        """
+        target = _index_hash(column, value)
+        size = INDEX_RECORD.size
+        with reader:
+            start = reader.tell()
+            low = 0
+            high = (os.fstat(reader.fileno()).st_size - start) // size
+            while low < high:
+                middle = (low + high) // 2
+                reader.seek(start + middle * size)
+                if INDEX_RECORD.unpack(reader.read(size))[0] < target:
+                    low = middle + 1
+                else:
+                    high = middle
+            reader.seek(start + low * size)
+            for entry in _read_entries(reader):
+                if entry >> 64 != target:
+                    return
+                yield entry & OFFSET_MASK
@@ -4,3 +4,7 @@ class InterpreterError(Exception):
 
 class ScannerError(Exception):
     pass
+
+
+class Unsupported(Exception):
+    """Raised when external table cannot evaluate a goal by itself."""
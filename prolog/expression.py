@@ -16,6 +16,10 @@ class Visitor(ABC):
     def visit_primary(self, expr):
         pass
 
+    @abstractmethod
+    def visit_function(self, expr):
+        pass
+
 
 class BinaryExpression(Expr):
     def __init__(self, left, operand, right):
@@ -33,6 +37,22 @@ class BinaryExpression(Expr):
         return str(self)
 
 
+class FunctionExpression(Expr):
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def accept(self, visitor):
+        return visitor.visit_function(self)
+
+    def __str__(self):
+        args = ', '.join(map(str, self.args))
+        return f'{self.name}({args})'
+
+    def __repr__(self):
+        return str(self)
+
+
 class UnaryExpression:
     def __init__(self, operand, right):
         self.operand = operand
@@ -0,0 +1,30 @@
+from abc import ABC, abstractmethod
+from .errors import Unsupported
+
+
+class ExternalTable(ABC):
+    """Predicate whose facts are kept outside of the clause store.
+
+    Runtime looks it up by key, (name, arity) of the predicate, and asks
+    it for facts of every call.  Comparisons right after the call are
+    passed as filters, with env binding their variables.  Tables may use
+    them to skip rows, but the caller checks every fact against them
+    anyway.
+    """
+
+    @property
+    @abstractmethod
+    def key(self):
+        pass
+
+    @abstractmethod
+    def facts(self, goal, filters=(), env=None):
+        """Yields facts which may match goal."""
+
+    def aggregate(self, kind, template, goal, filters, env):
+        """Returns count, sum or max of template over solutions of goal.
+
+        Raises Unsupported when table cannot compute it by itself, goal is
+        then solved fact by fact.
+        """
+        raise Unsupported(goal)
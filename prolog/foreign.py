@@ -0,0 +1,78 @@
+import inspect
+from .errors import InterpreterError
+from .external import ExternalTable
+from .types import Term, Variable, deref, fact_argument
+
+
+def takes_arguments(func, arity):
+    """Tells whether func can be called with arity arguments.
+
+    Functions registered before they were given arguments of calls take
+    none, so they are still called without them.
+    """
+    if arity == 0:
+        return False
+    try:
+        inspect.signature(func).bind(*range(arity))
+    except TypeError:
+        return False
+    except ValueError:
+        # Signature of some builtins cannot be read, assume they fit.
+        return True
+    return True
+
+
+class ForeignPredicate(ExternalTable):
+    """Predicate whose solutions are yielded by Python callable.
+
+    Callable is called once per call of the predicate with its arguments,
+    bound ones as terms and unbound ones as None, and returns an iterable
+    of solutions.  Solutions are pulled from it one per backtrack, so
+    large or endless sources are never materialised, and its iterator is
+    closed as soon as the call is cut or abandoned.
+
+    Solution is a tuple with value of every argument, or a single value
+    for predicates of one argument.  Values are converted by
+    fact_argument, None keeps the argument of the call as it is.
+    """
+
+    def __init__(self, name, arity, func):
+        self.name = name
+        self.arity = arity
+        self.func = func
+        self._arguments = takes_arguments(func, arity)
+
+    @property
+    def key(self):
+        return self.name, self.arity
+
+    def facts(self, goal, filters=(), env=None):
+        """Yields fact of every solution, pulling it only when asked."""
+        args = [deref(arg) for arg in goal.args]
+        if self._arguments:
+            solutions = self.func(
+                *[None if isinstance(arg, Variable) else arg for arg in args]
+            )
+        else:
+            solutions = self.func()
+        solutions = iter(solutions)
+        name = self.name
+        try:
+            for solution in solutions:
+                if type(solution) is not tuple:
+                    solution = (solution,)
+                if len(solution) != len(args):
+                    raise InterpreterError(
+                        f'{name}/{len(args)} yielded solution {solution}'
+                    )
+                yield Term(
+                    name,
+                    *[
+                        arg if value is None else fact_argument(value)
+                        for arg, value in zip(args, solution)
+                    ],
+                )
+        finally:
+            close = getattr(solutions, 'close', None)
+            if close is not None:
+                close()
@@ -1,22 +1,65 @@
+import gc
 import io
+from operator import attrgetter
 from .types import (
-    TermFunction,
     Variable,
     Term,
-    merge_bindings,
+    Dot,
+    Bar,
     Arithmetic,
     Logic,
+    Number,
     FALSE,
     TRUE,
-    CUT,
+    _compound,
+    deref,
+    fact_argument,
 )
 from .builtins import Write, Nl, Tab, Fail, Cut, Retract, AssertA, AssertZ
+from .errors import InterpreterError, Unsupported
+from .trail import Trail
+from .clause_store import ClauseStore, predicate_key
+from .tabling import Table, TableSpace
+from .compiler import compile_head, compile_copy, _variable_names
+from .numeric import NumericTable
+from .csvtable import CsvTable
+from .sqltable import SqliteTable
+from .foreign import ForeignPredicate
+
+
+_ground = attrgetter('ground')
 
 
 class Rule:
-    def __init__(self, head, body):
+    def __init__(self, head, body, variables=None):
         self.head = head
         self.body = body
+        self._variables = variables
+        self._compiled = None
+
+    @property
+    def variables(self):
+        """Names of variables of the rule."""
+        if self._variables is None:
+            names = set()
+            _variable_names(self.head, names)
+            _variable_names(self.body, names)
+            self._variables = frozenset(names)
+        return self._variables
+
+    @property
+    def ground(self):
+        return not self.variables
+
+    @property
+    def compiled(self):
+        """Head unifier and body solver of the rule, built on first use."""
+        if self._compiled is None:
+            self._compiled = compile_head(self.head), compile_goal(self.body)
+        return self._compiled
+
+    def __reduce__(self):
+        return Rule, (self.head, self.body, self._variables)
 
     def __str__(self):
         return f'{self.head}{self.body}'
@@ -26,77 +69,271 @@ class Rule:
 
 
 class Conjunction(Term):
+    __slots__ = ()
+
     def __init__(self, args):
         super().__init__(None, *args)
 
-    def _is_builtin(self, arg):
-        if (
-            isinstance(arg, Write)
-            or isinstance(arg, Nl)
-            or isinstance(arg, Tab)
-        ):
-            return True
-        return False
-
-    def _is_db_builtin(self, arg):
-        if (
-            isinstance(arg, Retract)
-            or isinstance(arg, AssertA)
-            or isinstance(arg, AssertZ)
-        ):
-            return True
-        return False
-
-    def _is_fail(self, arg):
-        if isinstance(arg, Fail):
-            return True
-        return False
+    def solve(self, runtime, frame, trail):
+        def solutions(index):
+            if index >= len(self.args):
+                yield
+            else:
+                for _ in runtime.solve(self.args[index], frame, trail):
+                    yield from solutions(index + 1)
+                    if frame.cut:
+                        return
 
-    def _is_cut(self, arg):
-        if isinstance(arg, Cut):
-            return True
-        return False
+        yield from solutions(0)
 
     def query(self, runtime):
-        def solutions(index, bindings):
-            if index >= len(self.args):
-                yield self.substitute(bindings)
-            else:
-                arg = self.args[index]
-                if self._is_cut(arg):
-                    for item in runtime.execute(arg.substitute(bindings)):
-                        unified = merge_bindings(arg.match(item), bindings)
-                        if unified is not None:
-                            yield from solutions(index + 1, unified)
-                            yield CUT()
-                if self._is_fail(arg):
-                    yield FALSE()
-                elif self._is_builtin(arg):
-                    _ = list(arg.query(runtime, bindings))  # consume iter
-                    yield from solutions(index + 1, bindings)
-                elif self._is_db_builtin(arg):
-                    _ = list(arg.query(runtime, bindings))  # consume iter
-                    yield from solutions(index + 1, bindings)
-                elif isinstance(arg, Arithmetic):
-                    val = arg.substitute(bindings).evaluate()
-                    unified = merge_bindings({arg.var: val}, bindings)
-                    yield from solutions(index + 1, unified)
-                elif isinstance(arg, Logic):
-                    yield arg.substitute(bindings).evaluate()
-                else:
-                    for item in runtime.execute(arg.substitute(bindings)):
-                        unified = merge_bindings(arg.match(item), bindings)
-                        if unified is not None:
-                            yield from solutions(index + 1, unified)
+        yield from runtime.execute(self)
 
-        yield from solutions(0, {})
+    def rename(self, env):
+        if self.ground:
+            return self
+        return Conjunction([arg.rename(env) for arg in self.args])
+
+    def resolve(self):
+        if self.ground:
+            return self
+        return Conjunction([arg.resolve() for arg in self.args])
 
     def substitute(self, bindings):
+        if self.ground:
+            return self
         return Conjunction(
             map((lambda arg: arg.substitute(bindings)), self.args)
         )
 
 
+class AggregateAll(Term):
+    """aggregate_all(count | sum(X) | max(X), Goal, Result)."""
+
+    __slots__ = ()
+
+    def __init__(self, *args):
+        super().__init__('aggregate_all', *args)
+
+    def rename(self, env):
+        if self.ground:
+            return self
+        return AggregateAll(*[arg.rename(env) for arg in self.args])
+
+    def resolve(self):
+        if self.ground:
+            return self
+        return AggregateAll(*[arg.resolve() for arg in self.args])
+
+    def substitute(self, bindings):
+        if self.ground:
+            return self
+        return AggregateAll(*[arg.substitute(bindings) for arg in self.args])
+
+    def spec(self):
+        """Returns kind of aggregate and its template."""
+        spec = deref(self.args[0])
+        if isinstance(spec, Term) and not spec.args and spec.pred == 'count':
+            return 'count', None
+        if (
+            isinstance(spec, Term)
+            and len(spec.args) == 1
+            and spec.pred in ('sum', 'max')
+        ):
+            return spec.pred, spec.args[0]
+        raise InterpreterError(f'Unknown aggregate: {spec}')
+
+
+class Frame:
+    """Clause activation.
+
+    Holds fresh variables of the clause by name and whether cut was
+    executed in its body.  Iterative engine records height of choicepoint
+    stack to cut back to instead.
+    """
+
+    def __init__(self, barrier=0):
+        self.env = {}
+        self.cut = False
+        self.barrier = barrier
+
+
+def _copy_term(term, variables):
+    """Copies resolved term so that distinct variables get distinct names.
+
+    Variables of different clause activations may share a name, which
+    would make them one variable once the term is stored as a clause.
+    """
+    if isinstance(term, Variable):
+        copy = variables.get(term)
+        if copy is None:
+            names = {variable.name for variable in variables.values()}
+            name = term.name
+            suffix = 1
+            while name in names and name != '_':
+                name = f'{term.name}{suffix}'
+                suffix += 1
+            copy = variables[term] = Variable(name)
+        return copy
+    if isinstance(term, Dot):
+        return Dot.from_list([_copy_term(item, variables) for item in term])
+    if isinstance(term, Bar):
+        return Bar(
+            _copy_term(term.head, variables), _copy_term(term.tail, variables)
+        )
+    if isinstance(term, Term) and term.args:
+        return Term(
+            term.pred, *[_copy_term(arg, variables) for arg in term.args]
+        )
+    return term
+
+
+def _solve_cut(runtime, goal, frame, trail):
+    yield
+    frame.cut = True
+
+
+def _solve_fail(runtime, goal, frame, trail):
+    yield from ()
+
+
+def _solve_true(runtime, goal, frame, trail):
+    yield
+
+
+def _solve_conjunction(runtime, goal, frame, trail):
+    yield from goal.solve(runtime, frame, trail)
+
+
+def _solve_output(runtime, goal, frame, trail):
+    goal.rename(frame.env).resolve().display(runtime.stream_write)
+    yield
+
+
+def _solve_retract(runtime, goal, frame, trail):
+    mark = trail.mark()
+    if runtime._retract(goal.arg.rename(frame.env), trail):
+        yield
+    trail.undo(mark)
+
+
+def _solve_assert(runtime, goal, frame, trail):
+    runtime._assert(goal, frame)
+    yield
+
+
+def _solve_arithmetic(runtime, goal, frame, trail):
+    value = goal.evaluate(frame.env)
+    mark = trail.mark()
+    if goal.rename(frame.env).unify(value, trail):
+        yield
+    trail.undo(mark)
+
+
+def _solve_logic(runtime, goal, frame, trail):
+    if goal.holds(frame.env):
+        yield
+
+
+def _solve_aggregate(runtime, goal, frame, trail):
+    value = runtime._aggregate(goal, frame)
+    if value is None:
+        return
+    mark = trail.mark()
+    if goal.args[2].rename(frame.env).unify(value, trail):
+        yield
+    trail.undo(mark)
+
+
+def _solve_call(runtime, goal, frame, trail):
+    yield from runtime.evaluate_rules(goal.rename(frame.env), trail)
+
+
+def _goal_solver(goal):
+    if isinstance(goal, Cut):
+        return _solve_cut
+    elif isinstance(goal, (Fail, FALSE)):
+        return _solve_fail
+    elif isinstance(goal, TRUE):
+        return _solve_true
+    elif isinstance(goal, Conjunction):
+        return _solve_conjunction
+    elif isinstance(goal, (Write, Nl, Tab)):
+        return _solve_output
+    elif isinstance(goal, Retract):
+        return _solve_retract
+    elif isinstance(goal, (AssertA, AssertZ)):
+        return _solve_assert
+    elif isinstance(goal, Arithmetic):
+        return _solve_arithmetic
+    elif isinstance(goal, Logic):
+        return _solve_logic
+    elif isinstance(goal, AggregateAll):
+        return _solve_aggregate
+    return _solve_call
+
+
+def _chain(first, rest):
+    def solve_both(runtime, frame, trail):
+        for _ in first(runtime, frame, trail):
+            yield from rest(runtime, frame, trail)
+            if frame.cut:
+                return
+
+    return solve_both
+
+
+def _filters(goals, index):
+    """Returns comparisons which directly follow goals[index]."""
+    end = index + 1
+    while end < len(goals) and isinstance(goals[end], Logic):
+        end += 1
+    return goals[index + 1:end]
+
+
+def compile_goal(goal, filters=()):
+    """Compiles clause body into function(runtime, frame, trail).
+
+    Kind of every goal is decided once, when the clause is compiled, and
+    conjunction becomes a chain of closures, so solving the body does not
+    walk and type test its terms again.  Comparisons following a call are
+    passed along with it as filters, numeric tables apply them to whole
+    columns.
+    """
+    if isinstance(goal, Conjunction) and goal.args:
+        goals = goal.args
+        solve = compile_goal(goals[-1])
+        for index in range(len(goals) - 2, -1, -1):
+            solve = _chain(
+                compile_goal(goals[index], _filters(goals, index)), solve
+            )
+        return solve
+
+    solver = _goal_solver(goal)
+    if solver is _solve_call and filters:
+        copy = compile_copy(goal)
+
+        def solve_filtered(runtime, frame, trail):
+            return runtime.evaluate_rules(
+                copy(frame.env), trail, filters, frame.env
+            )
+
+        return solve_filtered
+
+    if solver is _solve_call:
+        copy = compile_copy(goal)
+
+        def solve_call(runtime, frame, trail):
+            return runtime.evaluate_rules(copy(frame.env), trail)
+
+        return solve_call
+
+    def solve_goal(runtime, frame, trail):
+        return solver(runtime, goal, frame, trail)
+
+    return solve_goal
+
+
 class Runtime:
     def __init__(self, rules):
         self.rules = rules
@@ -106,6 +343,22 @@ class Runtime:
     def __del__(self):
         self.stream.close()
 
+    @property
+    def rules(self):
+        return list(self._store)
+
+    @rules.setter
+    def rules(self, rules):
+        self._store = ClauseStore()
+        self._tables = TableSpace()
+        # Predicates whose facts are kept outside of the clause store.
+        self._external = {}
+        for rule in rules:
+            if isinstance(rule, Table):
+                self._tables.declare(rule.key)
+            else:
+                self._store.insert_right(rule)
+
     def stream_write(self, text):
         self.stream.write(text)
 
@@ -121,96 +374,544 @@ class Runtime:
         self.stream_pos = 0
 
     def register_function(self, func, predicate, arity):
-        args = []
-        for i in range(arity):
-            args.append(f'placeholder_{i}')
-        tf = TermFunction(func, predicate, *args)
-        self.rules.append(Rule(tf, TRUE()))
+        """Defines solutions of predicate by Python callable.
+
+        Callable taking arguments gets arguments of every call, unbound
+        ones as None, and returns an iterable whose solutions are pulled
+        one per backtrack.  See ForeignPredicate.
+        """
+        self._register_external(ForeignPredicate(predicate, arity, func))
+
+    def register_table(self, predicate, columns):
+        """Defines facts of predicate by columns of numbers or names.
+
+        Every column is converted to NumPy array and becomes one argument
+        of the predicate, so numpy has to be installed.
+        """
+        self._register_external(NumericTable(predicate, columns))
+
+    def register_csv(
+        self,
+        predicate,
+        arity,
+        path,
+        delimiter=None,
+        header=False,
+        index=(),
+        encoding='utf-8',
+    ):
+        """Defines facts of predicate by rows of CSV or TSV file at path.
+
+        File is read on demand on every call, index columns are looked up
+        in index file next to it.  Delimiter defaults to tab for `.tsv`
+        files and comma otherwise, header row is skipped.
+        """
+        self._register_external(
+            CsvTable(
+                predicate, arity, path, delimiter, header, index, encoding
+            )
+        )
+
+    def register_sqlite(self, predicate, database, table, columns=None):
+        """Defines facts of predicate by rows of table of SQLite database.
+
+        Database is a path or an open sqlite3 connection, columns default
+        to all columns of the table in their order.  Bound arguments of
+        calls are looked up by SQLite.
+        """
+        self._register_external(
+            SqliteTable(predicate, database, table, columns)
+        )
+
+    def _register_external(self, table):
+        self._external[table.key] = table
+        self._tables.invalidate(table.key)
+
+    def load_facts(self, name, rows):
+        """Appends facts of predicate name, one per row of Python values.
+
+        Values are converted by fact_argument and facts are added to the
+        clause store in one pass per arity, bypassing the parser.
+        """
+        true = TRUE()
+        variables = frozenset()
+        facts = {}
+        # Facts are never garbage, so collector runs would only slow
+        # creating millions of them down.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for row in rows:
+                args = tuple(map(fact_argument, row))
+                ground = all(map(_ground, args))
+                rules = facts.get(len(args))
+                if rules is None:
+                    rules = facts[len(args)] = []
+                head = _compound(name, args, ground)
+                rules.append(Rule(head, true, variables if ground else None))
+            for arity, rules in facts.items():
+                self._store.extend((name, arity), rules)
+                self._tables.invalidate((name, arity))
+        finally:
+            if enabled:
+                gc.enable()
+
+    def consult(self, clauses):
+        """Adds clauses and table directives in order as they arrive."""
+        for clause in clauses:
+            if isinstance(clause, Table):
+                self._tables.declare(clause.key)
+            else:
+                self.insert_rule_right(clause)
 
     def insert_rule_left(self, entry):
         if isinstance(entry, Term):
             entry = Rule(entry, TRUE())
-        for i, item in enumerate(self.rules):
-            if entry.head.pred == item.head.pred:
-                self.rules.insert(i, entry)
-                return
-        self.rules.append(entry)
+        self._store.insert_left(entry)
+        self._tables.invalidate(predicate_key(entry.head))
 
     def insert_rule_right(self, entry):
         if isinstance(entry, Term):
             entry = Rule(entry, TRUE())
-        last_index = -1
-        for i, item in enumerate(self.rules):
-            if entry.head.pred == item.head.pred:
-                last_index = i
-
-        if last_index == -1:
-            self.rules.append(entry)
-        else:
-            self.rules.insert(last_index + 1, entry)
+        self._store.insert_right(entry)
+        self._tables.invalidate(predicate_key(entry.head))
 
     def remove_rule(self, rule):
         if isinstance(rule, Term):
             rule = Rule(rule, TRUE())
-        for i, item in enumerate(self.rules):
-            if (
-                rule.head.pred == item.head.pred
-                and len(rule.head.args) == len(item.head.args)
-                and all(
-                    [
-                        (
-                            x.pred == y.pred
-                            if isinstance(x, Term)
-                            and isinstance(y, Term)  # noqa
-                            else (
-                                x.name == y.name
-                                if isinstance(x, Variable)
-                                and isinstance(y, Variable)  # noqa
-                                else False
-                            )
-                        )
-                        for x, y in zip(rule.head.args, item.head.args)
-                    ]
+        predicate = self._store.predicate(predicate_key(rule.head))
+        if predicate is None:
+            return
+        for item in predicate:
+            if all(
+                x is y
+                or (
+                    x.pred == y.pred
+                    if isinstance(x, Term)
+                    and isinstance(y, Term)  # noqa
+                    else (
+                        x.name == y.name
+                        if isinstance(x, Variable)
+                        and isinstance(y, Variable)  # noqa
+                        else False
+                    )
                 )
+                for x, y in zip(rule.head.args, item.head.args)
             ):
-                self.rules.pop(i)
+                predicate.remove(item)
+                self._tables.invalidate((predicate.name, predicate.arity))
                 break
 
+    def index_statistics(self):
+        return self._store.statistics()
+
     def all_rules(self, query):
-        rules = self.rules[:]
+        rules = self.rules
         if isinstance(query, Rule):
             return rules + [query]
         return rules
 
-    def evaluate_rules(self, query, goal):
-        for rule in self.all_rules(query):
-            match = rule.head.match(goal)
-            if match is not None:
-                head = rule.head.substitute(match)
-                body = rule.body.substitute(match)
-                if isinstance(body, Arithmetic):
-                    arith = None
-                    for arg in head.args:
-                        if isinstance(arg, Variable) and arg.name == body.name:
-                            arith = head.substitute({arg: body.evaluate()})
-                            break
-                    if arith is not None:
-                        yield arith
+    def _retract(self, term, trail):
+        """Removes first clause whose head unifies with term."""
+        # Failed matches are undone even where nothing backtracks over
+        # the call, so the trail records them regardless.
+        active = trail.active
+        trail.active = True
+        try:
+            for rule in self._store.candidates(term):
+                mark = trail.mark()
+                if rule.head.rename({}).unify(term, trail):
+                    self._store.remove(rule)
+                    self._tables.invalidate(predicate_key(rule.head))
+                    return True
+                trail.undo(mark)
+            return False
+        finally:
+            trail.active = active
+
+    def _assert(self, goal, frame):
+        term = _copy_term(goal.arg.rename(frame.env).resolve(), {})
+        if isinstance(goal, AssertA):
+            self.insert_rule_left(term)
+        else:
+            self.insert_rule_right(term)
+
+    def solve(self, goal, frame, trail):
+        """Solves goal of clause activated in frame.
+
+        Bindings are made in place and recorded on trail.  Generator yields
+        once per solution and undoes its bindings before it moves on.
+        """
+        return _goal_solver(goal)(self, goal, frame, trail)
+
+    def _candidates(self, goal, filters=(), env=None):
+        """Returns clauses to resolve goal with.
+
+        Goal of tabled predicate is resolved with answers from its table
+        instead of with its clauses.  External predicates yield their own
+        facts, numeric table only those rows which pass filters evaluated
+        in env.
+        """
+        if not self._tables and not self._external:
+            return self._store.candidates(goal)
+        key = predicate_key(goal)
+        self._tables.called(key)
+        table = self._external.get(key)
+        if table is not None:
+            facts = table.facts(goal, filters, env)
+            return (Rule(fact, TRUE()) for fact in facts)
+        if not self._tables.is_tabled(key):
+            return self._store.candidates(goal)
+        answers = self._tables.answers(goal, key, self._fill_table)
+        return (Rule(answer, TRUE()) for answer in answers)
+
+    def _fill_table(self, goal, add):
+        goal = _copy_term(goal, {})
+        trail = Trail()
+        for _ in self._resolve(goal, self._store.candidates(goal), trail):
+            add(_copy_term(goal.resolve(), {}))
+
+    def evaluate_rules(self, goal, trail, filters=(), env=None):
+        goal = deref(goal)
+        if isinstance(goal, Variable):
+            raise InterpreterError(
+                f'Arguments are not sufficiently instantiated: {goal}'
+            )
+        yield from self._resolve(
+            goal, self._candidates(goal, filters, env), trail
+        )
+
+    def _aggregate(self, goal, frame):
+        """Returns result of aggregate_all goal or None if it has none.
+
+        Call of numeric table, optionally followed by comparisons, is
+        aggregated over its columns, other goals are solved one solution
+        after another.
+        """
+        kind, template = goal.spec()
+        if self._external:
+            try:
+                return self._aggregate_table(
+                    kind, template, goal.args[1], frame
+                )
+            except Unsupported:
+                pass
+        count = 0
+        values = []
+        scope = Frame()
+        scope.env = frame.env
+        for _ in self.solve(goal.args[1], scope, Trail()):
+            count += 1
+            if template is not None:
+                value = deref(template.rename(frame.env))
+                if type(value) is not Number:
+                    raise InterpreterError(f'{value} is not a number')
+                values.append(value.pred)
+        if kind == 'count':
+            return Number(count)
+        if kind == 'sum':
+            return Number(sum(values))
+        return Number(max(values)) if values else None
+
+    def _aggregate_table(self, kind, template, inner, frame):
+        goals = inner.args if isinstance(inner, Conjunction) else (inner,)
+        call, filters = goals[0], goals[1:]
+        if type(call) is not Term or not all(
+            isinstance(goal, Logic) for goal in filters
+        ):
+            raise Unsupported(inner)
+        table = self._external.get(predicate_key(call))
+        if table is None:
+            raise Unsupported(inner)
+        env = dict(frame.env)
+        if template is not None:
+            template = template.rename(env)
+        return table.aggregate(kind, template, call.rename(env), filters, env)
+
+    def _resolve(self, goal, clauses, trail):
+        for rule in clauses:
+            mark = trail.mark()
+            unify_head, solve_body = rule.compiled
+            if type(rule.body) is TRUE and rule.ground:
+                if unify_head(goal, None, trail):
+                    yield
+                trail.undo(mark)
+                continue
+            frame = Frame()
+            if unify_head(goal, frame.env, trail):
+                yield from solve_body(self, frame, trail)
+            trail.undo(mark)
+            if frame.cut:
+                return
+
+    def execute(self, query):
+        if isinstance(query, Arithmetic):
+            yield query.evaluate()
+            return
+
+        goal = result = query
+        if isinstance(query, Rule):
+            goal = query.body
+            result = query.head
+
+        trail = Trail()
+        frame = Frame()
+        for _ in self.solve(goal, frame, trail):
+            yield result.rename(frame.env).resolve()
+
+
+class ChoicePoint:
+    def __init__(self, mark, goal, clauses, continuation):
+        self.mark = mark
+        self.goal = goal
+        self.clauses = clauses
+        self.alternative = next(clauses, None)
+        self.continuation = continuation
+
+
+class FillPoint:
+    """Choicepoint under a round of filling table.
+
+    It is backtracked into once the round has no more solutions, and
+    starts another round or goes on with goal which called the table.
+    """
+
+    def __init__(self, mark, table, position, goal, continuation):
+        self.mark = mark
+        self.table = table
+        self.position = position
+        self.added = None
+        self.goal = goal
+        self.continuation = continuation
+
+
+class TableAnswer:
+    """Last goal of a round of filling table, adds answer and fails."""
+
+    def __init__(self, table, goal):
+        self.table = table
+        self.goal = goal
+
+
+class IterativeRuntime(Runtime):
+    """Runtime which solves queries without Python recursion.
+
+    Goals still to be proven form linked list of (goal, frame, next)
+    nodes, and alternative clauses are kept on explicit choicepoint
+    stack.  Solutions come in same order as from Runtime.
+
+    Last goal of a clause body is called with continuation of the clause
+    itself, so frame of the caller is released (last call optimization).
+    Choicepoint is pushed only when another candidate clause remains,
+    and bindings are trailed only while some choicepoint exists.  A
+    deterministic tail recursive loop therefore runs in constant memory.
+
+    Tables are filled on the same stacks, every round of clauses of a
+    tabled goal runs above a FillPoint which is backtracked into once
+    the round is over.
+    """
+
+    def _try_clauses(self, choicepoints, trail, cp):
+        barrier = len(choicepoints)
+        rule = cp.alternative
+        while rule is not None:
+            alternative = next(cp.clauses, None)
+            trail.active = alternative is not None or barrier > 0
+            if type(rule.body) is TRUE and rule.ground:
+                frame = env = None
+            else:
+                frame = Frame(barrier)
+                env = frame.env
+            if rule.compiled[0](cp.goal, env, trail):
+                if alternative is not None:
+                    cp.alternative = alternative
+                    choicepoints.append(cp)
+                if frame is None:
+                    return cp.continuation
+                return (rule.body, frame, cp.continuation)
+            trail.undo(cp.mark)
+            rule = alternative
+        return False
+
+    def _cut(self, choicepoints, trail, barrier):
+        del choicepoints[barrier:]
+        if not choicepoints:
+            trail.clear()
+            trail.active = False
+
+    def _call(self, goal, continuation, choicepoints, trail):
+        goal = deref(goal)
+        if isinstance(goal, Variable):
+            raise InterpreterError(
+                f'Arguments are not sufficiently instantiated: {goal}'
+            )
+        if self._tables:
+            key = predicate_key(goal)
+            if self._tables.is_tabled(key) and key not in self._external:
+                self._tables.called(key)
+                table = self._tables.table(goal, key)
+                if table.evaluating or table.complete:
+                    return self._consume(
+                        table, goal, continuation, choicepoints, trail
+                    )
+                point = FillPoint(
+                    trail.mark(),
+                    table,
+                    self._tables.start(table),
+                    goal,
+                    continuation,
+                )
+                return self._fill_round(choicepoints, trail, point)
+        cp = ChoicePoint(
+            trail.mark(),
+            goal,
+            iter(self._candidates(goal)),
+            continuation,
+        )
+        return self._try_clauses(choicepoints, trail, cp)
+
+    def _consume(self, table, goal, continuation, choicepoints, trail):
+        answers = self._tables.consume(table)
+        cp = ChoicePoint(
+            trail.mark(),
+            goal,
+            (Rule(answer, TRUE()) for answer in answers),
+            continuation,
+        )
+        return self._try_clauses(choicepoints, trail, cp)
+
+    def _fill_round(self, choicepoints, trail, point):
+        point.added = self._tables.added
+        choicepoints.append(point)
+        goal = _copy_term(point.table.goal, {})
+        cp = ChoicePoint(
+            trail.mark(),
+            goal,
+            iter(self._store.candidates(goal)),
+            (TableAnswer(point.table, goal), None, None),
+        )
+        return self._try_clauses(choicepoints, trail, cp)
+
+    def _filled(self, choicepoints, trail, point):
+        if self._tables.added != point.added:
+            return self._fill_round(choicepoints, trail, point)
+        self._tables.stop(point.table)
+        self._tables.complete(point.table, point.position)
+        return self._consume(
+            point.table, point.goal, point.continuation, choicepoints, trail
+        )
+
+    def _step(self, goals, choicepoints, trail):
+        """Executes goal on top of goal stack.
+
+        Returns new goal stack, None when all goals are proven or False
+        when goal failed.
+        """
+        goal, frame, continuation = goals
+        if type(goal) is Term:
+            return self._call(
+                goal.rename(frame.env), continuation, choicepoints, trail
+            )
+        elif isinstance(goal, Cut):
+            self._cut(choicepoints, trail, frame.barrier)
+            return continuation
+        elif isinstance(goal, (Fail, FALSE)):
+            return False
+        elif isinstance(goal, TRUE):
+            return continuation
+        elif isinstance(goal, Conjunction):
+            for arg in reversed(goal.args):
+                continuation = (arg, frame, continuation)
+            return continuation
+        elif isinstance(goal, (Write, Nl, Tab)):
+            goal.rename(frame.env).resolve().display(self.stream_write)
+            return continuation
+        elif isinstance(goal, Retract):
+            if self._retract(goal.arg.rename(frame.env), trail):
+                return continuation
+            return False
+        elif isinstance(goal, (AssertA, AssertZ)):
+            self._assert(goal, frame)
+            return continuation
+        elif isinstance(goal, Arithmetic):
+            value = goal.evaluate(frame.env)
+            if goal.rename(frame.env).unify(value, trail):
+                return continuation
+            return False
+        elif isinstance(goal, Logic):
+            if goal.holds(frame.env):
+                return continuation
+            return False
+        elif isinstance(goal, AggregateAll):
+            value = self._aggregate(goal, frame)
+            if value is not None and goal.args[2].rename(frame.env).unify(
+                value, trail
+            ):
+                return continuation
+            return False
+        elif isinstance(goal, TableAnswer):
+            self._tables.add(goal.table, _copy_term(goal.goal.resolve(), {}))
+            return False
+        return self._call(
+            goal.rename(frame.env), continuation, choicepoints, trail
+        )
+
+    def _backtrack(self, choicepoints, trail):
+        while choicepoints:
+            cp = choicepoints.pop()
+            trail.undo(cp.mark)
+            if type(cp) is FillPoint:
+                goals = self._filled(choicepoints, trail, cp)
+            else:
+                goals = self._try_clauses(choicepoints, trail, cp)
+            if goals is not False:
+                return goals
+        return False
+
+    def _run(self, goals, choicepoints, trail):
+        """Yields once per solution of goal stack, backtracking after it."""
+        try:
+            while True:
+                if goals is False:
+                    goals = self._backtrack(choicepoints, trail)
+                    if goals is False:
+                        return
+                elif goals is None:
+                    yield
+                    goals = False
                 else:
-                    for item in body.query(self):
-                        if isinstance(item, CUT):
-                            yield item
-                            return
-                        if not isinstance(item, FALSE):
-                            yield head.substitute(body.match(item))
-                        elif isinstance(item, FALSE):
-                            yield item
+                    goals = self._step(goals, choicepoints, trail)
+        except Exception:
+            # Tables left half filled are filled again on next call.
+            for cp in reversed(choicepoints):
+                if type(cp) is FillPoint:
+                    self._tables.stop(cp.table)
+            raise
+
+    def _fill_table(self, goal, add):
+        goal = _copy_term(goal, {})
+        trail = Trail()
+        trail.active = False
+        choicepoints = []
+        cp = ChoicePoint(
+            trail.mark(), goal, iter(self._store.candidates(goal)), None
+        )
+        goals = self._try_clauses(choicepoints, trail, cp)
+        for _ in self._run(goals, choicepoints, trail):
+            add(_copy_term(goal.resolve(), {}))
 
     def execute(self, query):
-        goal = query
         if isinstance(query, Arithmetic):
             yield query.evaluate()
-        else:
-            if isinstance(query, Rule):
-                goal = query.head
-            yield from self.evaluate_rules(query, goal)
+            return
+
+        goal = result = query
+        if isinstance(query, Rule):
+            goal = query.body
+            result = query.head
+
+        trail = Trail()
+        trail.active = False
+        frame = Frame()
+        for _ in self._run((goal, frame, None), [], trail):
+            yield result.rename(frame.env).resolve()
@@ -0,0 +1,271 @@
+import bisect
+import functools
+import gc
+import hashlib
+import mmap
+import os
+import pickle
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from .parser import Parser
+from .scanner import PATTERNS, Scanner
+
+
+# Characters read from consulted file at once.
+CHUNK_SIZE = 1 << 16
+
+CACHE_MAGIC = b'PLC2'
+
+# Clauses pickled at once while cache is written, so that neither pickled
+# data nor memo of the pickler grow with the size of the file.
+CACHE_BATCH_SIZE = 1024
+
+# Matches either a dot ending a clause or a run of other tokens.  Runs are
+# made of the scanner's own patterns, so they skip dots inside numbers,
+# quoted atoms and comments just as the scanner does.
+CLAUSE_END_PATTERN = re.compile(
+    r'(?:[ \r\t]*(?:'
+    + '|'.join(
+        pattern for name, pattern in PATTERNS if name not in ('DOT', 'ERROR')
+    )
+    + r'|[^ \r\t.])|[ \r\t]+)+|(?P<DOT>\.)'
+)
+
+# Pieces of file parsed in parallel per worker process, more than one
+# keeps workers busy when some pieces take longer than others.
+PIECES_PER_WORKER = 4
+
+
+def cache_path(path):
+    """Returns path of compiled cache of source file at path."""
+    return os.path.splitext(path)[0] + '.plc'
+
+
+def split_clauses(text, count):
+    """Splits text after ends of clauses into at most count pieces.
+
+    Returns list of pairs of piece of similar length and number of its
+    first line.  Text is scanned to find ends of clauses, so dots inside
+    numbers, quoted atoms and comments are never mistaken for them.
+    """
+    ends = [
+        match.end()
+        for match in CLAUSE_END_PATTERN.finditer(text)
+        if match.lastgroup == 'DOT'
+    ]
+    pieces = []
+    start = 0
+    line = 1
+    for index in range(1, count):
+        position = bisect.bisect_left(ends, len(text) * index // count)
+        if position == len(ends):
+            break
+        end = ends[position]
+        if end <= start:
+            continue
+        pieces.append((text[start:end], line))
+        line += text.count('\n', start, end)
+        start = end
+    pieces.append((text[start:], line))
+    return pieces
+
+
+def _parse_piece(piece):
+    text, line = piece
+    return list(Parser(Scanner(text, line=line).scan()).rules())
+
+
+def map_clauses(path):
+    """Yields clauses of UTF-8 Prolog file at path scanning it memory mapped.
+
+    Bytes are scanned straight from the mapping and only lexemes of tokens
+    are ever turned into strings, so files close to the size of memory can
+    be consulted.  Files which cannot be mapped, such as empty files and
+    pipes, are read in chunks instead.
+    """
+    with open(path, 'rb') as reader:
+        try:
+            data = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            data = None
+
+    if data is None:
+        with open(path, encoding='utf-8') as reader:
+            chunks = iter(functools.partial(reader.read, CHUNK_SIZE), '')
+            yield from Parser(Scanner(chunks).scan()).rules()
+        return
+
+    tokens = Scanner(data).scan()
+    try:
+        yield from Parser(tokens).rules()
+    finally:
+        # Mapping cannot be closed while scanner still refers to it.
+        tokens.close()
+        data.close()
+
+
+def read_clauses(path, workers=1):
+    """Yields clauses of Prolog file at path one by one.
+
+    With more than one worker, or None for one per core, the whole file is
+    read and split into pieces which are parsed by separate processes.
+    Clauses are still yielded in source order.
+    """
+    if workers == 1:
+        yield from map_clauses(path)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with open(path, encoding='utf-8') as reader:
+        pieces = split_clauses(reader.read(), workers * PIECES_PER_WORKER)
+    executor = ProcessPoolExecutor(workers)
+    try:
+        for clauses in executor.map(_parse_piece, pieces):
+            yield from clauses
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+@functools.lru_cache(maxsize=None)
+def interpreter_version():
+    """Returns digest of interpreter sources and Python it runs on.
+
+    Parsed clauses are made of classes defined by those sources, so cache
+    written by any other version must not be used.
+    """
+    digest = hashlib.sha256(sys.implementation.cache_tag.encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as reader:
+                digest.update(reader.read())
+    return digest.hexdigest()
+
+
+def _cache_key(path):
+    digest = hashlib.sha256(interpreter_version().encode())
+    with open(path, 'rb') as reader:
+        for chunk in iter(functools.partial(reader.read, CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return CACHE_MAGIC + digest.digest()
+
+
+def _read_cache(path, key):
+    """Returns clauses stored in cache or None if it cannot be used.
+
+    Cache is a sequence of pickled lists of clauses ended by None.
+    """
+    # Unpickling creates many objects and none of them is garbage, so
+    # collector runs would only slow it down.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, 'rb') as reader:
+            if reader.read(len(key)) != key:
+                return None
+            clauses = []
+            while True:
+                batch = pickle.load(reader)
+                if batch is None:
+                    return clauses
+                clauses.extend(batch)
+    except Exception:
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class _CacheWriter:
+    """Writes cache batch by batch while clauses are being read.
+
+    Batches go to a temporary file which replaces the cache only once
+    all clauses are written.  Cache which cannot be written is skipped.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.batch = []
+        self.writer = None
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            descriptor, self.temporary = tempfile.mkstemp(dir=directory)
+        except OSError:
+            return
+        self.writer = os.fdopen(descriptor, 'wb')
+        try:
+            self.writer.write(key)
+        except OSError:
+            self.abandon()
+
+    def _dump(self, batch):
+        try:
+            pickle.dump(batch, self.writer, pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PicklingError, RecursionError):
+            self.abandon()
+            return False
+        return True
+
+    def add(self, clause):
+        if self.writer is None:
+            return
+        self.batch.append(clause)
+        if len(self.batch) >= CACHE_BATCH_SIZE:
+            self._dump(self.batch)
+            self.batch = []
+
+    def commit(self):
+        """Ends cache and puts it in place of the old one."""
+        if self.writer is None:
+            return
+        if not self._dump(self.batch) or not self._dump(None):
+            return
+        try:
+            self.writer.close()
+            os.replace(self.temporary, self.path)
+        except OSError:
+            self.abandon()
+            return
+        self.writer = None
+
+    def abandon(self):
+        """Removes unfinished cache."""
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        try:
+            os.unlink(self.temporary)
+        except OSError:
+            pass
+
+
+def load_clauses(path, cache=True, workers=1):
+    """Yields clauses of Prolog file at path.
+
+    With cache, clauses are stored in `.plc` file next to the source in
+    batches while it is parsed and next time loaded from there instead,
+    as long as neither the source nor the interpreter changed.  Cache is a pickle, so
+    it must be as trusted as the source itself.  Source is parsed by
+    workers processes as in read_clauses.
+    """
+    if not cache:
+        yield from read_clauses(path, workers)
+        return
+
+    key = _cache_key(path)
+    clauses = _read_cache(cache_path(path), key)
+    if clauses is not None:
+        yield from clauses
+        return
+
+    writer = _CacheWriter(cache_path(path), key)
+    try:
+        for clause in read_clauses(path, workers):
+            writer.add(clause)
+            yield clause
+        writer.commit()
+    finally:
+        writer.abandon()
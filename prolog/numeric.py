@@ -0,0 +1,255 @@
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from .errors import Unsupported
+from .expression import BinaryExpression, FunctionExpression
+from .external import ExternalTable
+from .types import Term, Number, Variable, deref, atom
+
+
+# NumPy functions of operators which keep their meaning on arrays.  Other
+# operators (integer division, shifts, ...) are left to the interpreter.
+VECTOR_OPERATORS = {
+    '+': 'add',
+    '-': 'subtract',
+    '*': 'multiply',
+    '/': 'true_divide',
+    '==': 'equal',
+    '=/': 'not_equal',
+    '=<': 'less_equal',
+    '<': 'less',
+    '>=': 'greater_equal',
+    '>': 'greater',
+}
+
+VECTOR_FUNCTIONS = {'abs': 'absolute', 'min': 'minimum', 'max': 'maximum'}
+
+_INT64_MAX = 2**63 - 1
+_INT64_MIN = -(2**63)
+
+# Integers above this are not exactly representable as float64.
+_FLOAT64_EXACT = 2**53
+
+
+def _bounds(function, operands):
+    """Returns bounds of integer result of function of bounded operands.
+
+    Raises Unsupported when result might not fit in 64 bits or integers
+    would be rounded by float division.
+    """
+    if function == 'true_divide':
+        for bounds in operands:
+            if bounds is not None and max(map(abs, bounds)) > _FLOAT64_EXACT:
+                raise Unsupported(function)
+        return None
+    if None in operands or function not in _BOUNDS:
+        return None
+    low, high = _BOUNDS[function](*operands)
+    if low < _INT64_MIN or high > _INT64_MAX:
+        raise Unsupported(function)
+    return low, high
+
+
+def _multiply_bounds(left, right):
+    products = [a * b for a in left for b in right]
+    return min(products), max(products)
+
+
+def _absolute_bounds(bounds):
+    low, high = bounds
+    if low <= 0 <= high:
+        return 0, max(-low, high)
+    return min(abs(low), abs(high)), max(abs(low), abs(high))
+
+
+_BOUNDS = {
+    'add': lambda left, right: (left[0] + right[0], left[1] + right[1]),
+    'subtract': lambda left, right: (left[0] - right[1], left[1] - right[0]),
+    'multiply': _multiply_bounds,
+    'absolute': _absolute_bounds,
+    'minimum': lambda left, right: (
+        min(left[0], right[0]),
+        min(left[1], right[1]),
+    ),
+    'maximum': lambda left, right: (
+        max(left[0], right[0]),
+        max(left[1], right[1]),
+    ),
+}
+
+
+class NumericTable(ExternalTable):
+    """Facts of a predicate stored column by column in NumPy arrays.
+
+    Column with numeric dtype holds numbers, any other column holds atoms
+    named by str of its items.  Bound arguments of a call and comparisons
+    on its variables select rows with array operations, so only matching
+    rows are ever turned into terms.
+    """
+
+    def __init__(self, name, columns):
+        if numpy is None:
+            raise ImportError('Numeric tables require numpy')
+        self.name = name
+        self.columns = [numpy.asarray(column) for column in columns]
+        sizes = {len(column) for column in self.columns}
+        if len(sizes) > 1:
+            raise ValueError('Columns of table must have equal length')
+        self.size = sizes.pop() if sizes else 0
+        self._labels = {}
+        self._integers = {}
+
+    @property
+    def key(self):
+        return self.name, len(self.columns)
+
+    def _numeric(self, index):
+        return self.columns[index].dtype.kind in 'iuf'
+
+    def _label(self, index):
+        labels = self._labels.get(index)
+        if labels is None:
+            labels = self._labels[index] = self.columns[index].astype(str)
+        return labels
+
+    def _item(self, index, row):
+        value = self.columns[index][row]
+        if self._numeric(index):
+            return Number(value.item())
+        return atom(str(value))
+
+    def _integer(self, index):
+        """Returns integer column as int64 array with its bounds."""
+        integer = self._integers.get(index)
+        if integer is None:
+            column = self.columns[index]
+            if len(column):
+                bounds = column.min().item(), column.max().item()
+            else:
+                bounds = 0, 0
+            if bounds[1] > _INT64_MAX:
+                raise Unsupported(column)
+            integer = column.astype(numpy.int64, copy=False), bounds
+            self._integers[index] = integer
+        return integer
+
+    def _positions(self, goal):
+        """Returns column of every unbound variable of goal and mask
+        requiring bound arguments and repeated variables to match.
+        """
+        positions = {}
+        mask = None
+        for index, arg in enumerate(goal.args):
+            arg = deref(arg)
+            column = self.columns[index]
+            if isinstance(arg, Variable):
+                if arg.name == '_':
+                    continue
+                first = positions.setdefault(arg, index)
+                if first == index:
+                    continue
+                test = column == self.columns[first]
+            elif type(arg) is Number and self._numeric(index):
+                test = column == arg.pred
+            elif type(arg) is Term and not arg.args:
+                if self._numeric(index):
+                    return positions, numpy.zeros(self.size, dtype=bool)
+                test = self._label(index) == arg.pred
+            else:
+                return positions, numpy.zeros(self.size, dtype=bool)
+            mask = test if mask is None else mask & test
+        return positions, mask
+
+    def _vector(self, expression, env, positions):
+        """Returns values of expression on columns and their bounds.
+
+        Bounds are the least and greatest integer result, None for floats
+        and truth values.  Integer arithmetic which might overflow 64 bits
+        raises Unsupported, the interpreter computes it exactly instead.
+        """
+        if isinstance(expression, BinaryExpression):
+            function = VECTOR_OPERATORS.get(expression.operand)
+            args = (expression.left, expression.right)
+        elif isinstance(expression, FunctionExpression):
+            function = VECTOR_FUNCTIONS.get(expression.name)
+            args = expression.args
+        else:
+            return self._operand(expression.exp, env, positions)
+        if function is None:
+            raise Unsupported(expression)
+        operands = [self._vector(arg, env, positions) for arg in args]
+        bounds = _bounds(function, [bounds for _, bounds in operands])
+        values = getattr(numpy, function)(*[values for values, _ in operands])
+        return values, bounds
+
+    def _operand(self, term, env, positions):
+        if isinstance(term, Variable):
+            term = deref(env.get(term.name, term))
+        if type(term) is Number:
+            value = term.pred
+            if type(value) is not int:
+                return value, None
+            if not _INT64_MIN <= value <= _INT64_MAX:
+                raise Unsupported(term)
+            return value, (value, value)
+        index = positions.get(term)
+        if index is None or not self._numeric(index):
+            raise Unsupported(term)
+        if self.columns[index].dtype.kind == 'f':
+            return self.columns[index], None
+        return self._integer(index)
+
+    def select(self, goal, filters=(), env=None):
+        """Returns rows matching goal and whether all filters were applied.
+
+        Filters are comparisons on variables of clause activation env.
+        Those which cannot be computed on columns are skipped and left to
+        be checked on every row.
+        """
+        positions, mask = self._positions(goal)
+        complete = True
+        for logic in filters:
+            try:
+                test, _ = self._vector(logic._expression, env, positions)
+            except Unsupported:
+                complete = False
+                continue
+            test = numpy.broadcast_to(test, (self.size,))
+            mask = test if mask is None else mask & test
+        if mask is None:
+            return numpy.arange(self.size), complete
+        return numpy.flatnonzero(mask), complete
+
+    def facts(self, goal, filters=(), env=None):
+        rows, _ = self.select(goal, filters, env)
+        arity = len(self.columns)
+        for row in rows:
+            yield Term(
+                self.name, *[self._item(index, row) for index in range(arity)]
+            )
+
+    def aggregate(self, kind, template, goal, filters, env):
+        """Returns count, sum or max over rows selected by goal and filters.
+
+        Returns None when there is no maximum of no rows and raises
+        Unsupported when the result needs solving goal row by row.
+        """
+        rows, complete = self.select(goal, filters, env)
+        if not complete:
+            raise Unsupported(goal)
+        if kind == 'count':
+            return Number(len(rows))
+        positions, _ = self._positions(goal)
+        index = positions.get(deref(template))
+        if index is None or not self._numeric(index):
+            raise Unsupported(template)
+        values = self.columns[index][rows]
+        if kind == 'max':
+            return Number(values.max().item()) if len(values) else None
+        if values.dtype.kind in 'iu' and len(values):
+            # Python integers never overflow, sums of fixed width ones may.
+            if numpy.abs(values).max() > _INT64_MAX // len(values):
+                return Number(sum(values.tolist()))
+        return Number(values.sum().item())
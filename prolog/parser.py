@@ -1,8 +1,19 @@
 from prolog.token_type import TokenType
-from .interpreter import Conjunction, Rule
+from .token import Token
+from .interpreter import AggregateAll, Conjunction, Rule
+from .tabling import Table
 from .types import Arithmetic, Logic, Variable, Term, TRUE, Number, Dot, Bar
+from .types import atom, intern_term
 from .builtins import Fail, Write, Nl, Tab, Retract, AssertA, AssertZ, Cut
 from .expression import BinaryExpression, PrimaryExpression
+from .expression import FunctionExpression
+
+
+# Arithmetic functions and their arities.
+FUNCTIONS = {'abs': 1, 'min': 2, 'max': 2}
+
+# Operators with the precedence of `*` written as atoms.
+WORD_OPERATORS = {'mod', 'rem'}
 
 
 def default_error_handler(line, message):
@@ -88,11 +99,38 @@ class Parser:
                     self._peek().line, f'Expected ")" after expression: {expr}'
                 )
             return expr
+        elif (
+            self._is_type(token, TokenType.ATOM)
+            and token.lexeme in FUNCTIONS
+            and self._next_token_matches(TokenType.LEFTPAREN)
+        ):
+            return self._parse_function()
 
         self._report(
             self._peek().line, f'Expected number or variable but got: {token}'
         )
 
+    def _parse_function(self):
+        name = self._advance().lexeme
+        self._advance()  # consume '('
+        args = [self._parse_expression()]
+        while self._token_matches(TokenType.COMMA):
+            self._advance()
+            args.append(self._parse_expression())
+
+        if not self._token_matches(TokenType.RIGHTPAREN):
+            self._report(
+                self._peek().line, f'Expected ")" after {name} arguments'
+            )
+        self._advance()
+
+        if len(args) != FUNCTIONS[name]:
+            self._report(
+                self._previous().line,
+                f'{name} expects {FUNCTIONS[name]} arguments',
+            )
+        return FunctionExpression(name, args)
+
     def _parse_equality(self):
         expr = self._parse_comperison()
 
@@ -130,10 +168,23 @@ class Parser:
             expr = BinaryExpression(expr, operator, right)
         return expr
 
+    def _is_multiplication(self):
+        if self._token_matches(TokenType.ATOM):
+            return self._peek().lexeme in WORD_OPERATORS
+        return self._token_matches(
+            [
+                TokenType.SLASH,
+                TokenType.STAR,
+                TokenType.SLASHSLASH,
+                TokenType.LESSLESS,
+                TokenType.GREATERGREATER,
+            ]
+        )
+
     def _parse_multiplication(self):
         expr = self._parse_primary()
 
-        while self._token_matches([TokenType.SLASH, TokenType.STAR]):
+        while self._is_multiplication():
             self._advance()
             operator = self._previous().lexeme
             right = self._parse_primary()
@@ -211,7 +262,7 @@ class Parser:
             if self._token_matches(TokenType.LEFTBRACKET):
                 list_term = self._parse_list()
             else:
-                list_term = self._parse_term()
+                list_term = intern_term(self._parse_term())
 
             if dot_tail is not None:
                 dot_tail = list_term
@@ -266,7 +317,9 @@ class Parser:
             token, TokenType.UNDERSCORE
         ):
             if self._is_type(token, TokenType.UNDERSCORE):
-                return Variable('_')
+                variable = Variable('_')
+                self._scope.setdefault('_', variable)
+                return variable
 
             if self._is_type(token, TokenType.VARIABLE):
                 if self._peek().token_type == TokenType.IS:
@@ -291,12 +344,12 @@ class Parser:
             return Number(number_value)
 
         if not self._token_matches(TokenType.LEFTPAREN):
-            return Term(predicate)
+            return atom(predicate)
 
         self._advance()
         args = []
         while not self._token_matches(TokenType.RIGHTPAREN):
-            args.append(self._parse_term())
+            args.append(intern_term(self._parse_term()))
             if not self._token_matches(
                 TokenType.COMMA
             ) and not self._token_matches(TokenType.RIGHTPAREN):
@@ -316,14 +369,18 @@ class Parser:
         if self._is_type(token, TokenType.WRITE):
             return Write(*args)
 
-        return Term(predicate, *args)
+        if predicate == 'aggregate_all' and len(args) == 3:
+            return AggregateAll(*args)
+
+        # Functor shares the name interned for the atom of the same name.
+        return Term(atom(predicate).pred, *args)
 
     def _parse_rule(self):
         head = self._parse_term()
 
         if self._token_matches(TokenType.DOT):
             self._advance()
-            return Rule(head, TRUE())
+            return Rule(head, TRUE(), frozenset(self._scope))
 
         if not self._token_matches(TokenType.COLONMINUS):
             self._report(
@@ -352,7 +409,39 @@ class Parser:
         else:
             body = Conjunction(args)
 
-        return Rule(head, body)
+        return Rule(head, body, frozenset(self._scope))
+
+    def _parse_predicate_indicator(self):
+        name = self._advance()
+        if not self._is_type(name, TokenType.ATOM) or not self._token_matches(
+            TokenType.SLASH
+        ):
+            self._report(name.line, f'Expected name/arity but got {name}')
+        self._advance()  # consume '/'
+
+        arity = self._advance()
+        if not self._is_type(arity, TokenType.NUMBER):
+            self._report(arity.line, f'Expected arity but got {arity}')
+        return name.lexeme, int(arity.literal)
+
+    def _parse_directive(self):
+        self._advance()  # consume ':-'
+        token = self._advance()
+        if token.lexeme != 'table':
+            self._report(token.line, f'Unknown directive: {token.lexeme}')
+
+        tables = [Table(*self._parse_predicate_indicator())]
+        while self._token_matches(TokenType.COMMA):
+            self._advance()
+            tables.append(Table(*self._parse_predicate_indicator()))
+
+        if not self._token_matches(TokenType.DOT):
+            self._report(
+                self._peek().line,
+                f'Expected . after directive but got {self._peek()}',
+            )
+        self._advance()
+        return tables
 
     def _all_vars(self, terms):
         variables = []
@@ -399,11 +488,33 @@ class Parser:
         return Rule(head, Conjunction(args))
 
     def parse_rules(self):
-        rules = []
-        while not self._is_done:
-            self._scope = {}
-            rules.append(self._parse_rule())
-        return rules
+        return list(self.rules())
+
+    def rules(self):
+        """Yields clauses and table directives one by one.
+
+        Tokens may also come from an iterator such as Scanner.scan, only
+        tokens of the clause being parsed are kept.
+        """
+        clause = []
+        for token in self._tokens:
+            clause.append(token)
+            if token.token_type == TokenType.DOT:
+                clause.append(Token(TokenType.EOF, '', None, token.line))
+            elif token.token_type != TokenType.EOF or len(clause) == 1:
+                continue
+            yield from self._parse_clause(clause)
+            clause = []
+
+    def _parse_clause(self, tokens):
+        self._tokens = tokens
+        self._current = 0
+        self._is_done = False
+        self._scope = {}
+        if self._token_matches(TokenType.COLONMINUS):
+            yield from self._parse_directive()
+        else:
+            yield self._parse_rule()
 
     def parse_terms(self):
         self._scope = {}
@@ -3,23 +3,15 @@
 import argparse
 import sys
 from .interpreter import Runtime
+from .loader import load_clauses
 from .repl import run_repl
-from .parser import Parser
-from .scanner import Scanner
 
 
-def start(input_path):
-    rules_text = ''
+def start(input_path, cache=True, workers=1):
     runtime = None
     try:
-        with open(input_path) as reader:
-            line = reader.readline()
-            while line != '':
-                rules_text += line
-                line = reader.readline()
-
-        rules = Parser(Scanner(rules_text).tokenize()).parse_rules()
-        runtime = Runtime(rules)
+        runtime = Runtime([])
+        runtime.consult(load_clauses(input_path, cache, workers))
     except Exception as e:
         print(f'Error loading rules: {e}')
         sys.exit()
@@ -37,9 +29,21 @@ def main():
         description='Simple Prolog interpreter',
     )
     ap.add_argument('Path', type=str, help='Path to file with Prolog rules')
+    ap.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write compiled .plc cache of rules',
+    )
+    ap.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help='Parse rules in that many processes, 0 for one per core',
+    )
     args = ap.parse_args()
     input_path = args.Path
-    run_repl(start(input_path))
+    run_repl(start(input_path, not args.no_cache, args.jobs or None))
 
 
 if __name__ == '__main__':
@@ -27,12 +27,11 @@ else:
     import tty
     import termios
 
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-
     def wait_for_char():
+        fd = sys.stdin.fileno()
+        old_settings = termios.tcgetattr(fd)
         try:
-            tty.setraw(sys.stdin.fileno())
+            tty.setraw(fd)
             ch = sys.stdin.read(1)
         finally:
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
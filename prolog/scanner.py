@@ -1,3 +1,5 @@
+import mmap
+import re
 from .token import Token
 from .token_type import TokenType
 from .errors import ScannerError
@@ -8,221 +10,271 @@ def default_error_handler(line, message):
     raise ScannerError('Scanner error')
 
 
+KEYWORDS = {
+    'fail': TokenType.FAIL,
+    'write': TokenType.WRITE,
+    'nl': TokenType.NL,
+    'tab': TokenType.TAB,
+    'is': TokenType.IS,
+    'retract': TokenType.RETRACT,
+    'asserta': TokenType.ASSERTA,
+    'assertz': TokenType.ASSERTZ,
+}
+
+# Alternatives of the master pattern, most frequent first.  Names of
+# groups which are also token types produce tokens of that type.
+PATTERNS = [
+    ('ATOM', r'[a-z][A-Za-z0-9_]*'),
+    # `_` starts a variable when character after the next one could
+    # continue a name.
+    ('VARIABLE', r'[A-Z][A-Za-z0-9_]*|_(?=[\s\S][A-Za-z0-9_])[A-Za-z0-9_]*'),
+    ('UNDERSCORE', r'_'),
+    ('LEFTPAREN', r'\('),
+    ('RIGHTPAREN', r'\)'),
+    ('COMMA', r','),
+    ('DOT', r'\.'),
+    ('NUMBER', r'-?[0-9]+(?:\.[0-9]+)?'),
+    ('NEWLINE', r'\n[ \r\t\n]*'),
+    ('COMMENT', r'%[^\n]*'),
+    ('BLOCK', r'/\*(?:[\s\S]*?\*/|[\s\S]*)'),
+    ('STRING', r"'[^']*'?"),
+    ('LEFTBRACKET', r'\['),
+    ('RIGHTBRACKET', r'\]'),
+    ('BAR', r'\|'),
+    ('CUT', r'!'),
+    ('STAR', r'\*'),
+    ('SLASHSLASH', r'//'),
+    ('SLASH', r'/'),
+    ('PLUS', r'\+'),
+    ('MINUS', r'-'),
+    ('EQUALEQUAL', r'=='),
+    ('EQUALSLASH', r'=/'),
+    ('EQUALLESS', r'=<'),
+    ('LESSLESS', r'<<'),
+    ('LESS', r'<'),
+    ('GREATEREQUAL', r'>='),
+    ('GREATERGREATER', r'>>'),
+    ('GREATER', r'>'),
+    ('COLONMINUS', r':-'),
+    ('COLON', r':'),
+    ('ERROR', r'[^ \r\t]'),
+]
+
+# Patterns looking at whole characters need to span all bytes of their
+# encoding when source is given as UTF-8 bytes.
+UTF8_CHARACTER = r'(?:[\xc0-\xff][\x80-\xbf]*|[\s\S])'
+BYTES_PATTERNS = {
+    'VARIABLE': r'[A-Z][A-Za-z0-9_]*|_(?='
+    + UTF8_CHARACTER
+    + r'[A-Za-z0-9_])[A-Za-z0-9_]*',
+    'ERROR': r'[\xc0-\xff][\x80-\xbf]*|[^ \r\t]',
+}
+
+
+def master_pattern(patterns):
+    """Returns text of the master pattern made of patterns.
+
+    Spaces before a token are skipped by the same match, spaces at the end
+    of source need a match of their own.
+    """
+    return (
+        '[ \r\t]*(?:'
+        + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in patterns)
+        + ')|(?P<SPACE>[ \r\t]+)'
+    )
+
+
+MASTER_PATTERN = re.compile(master_pattern(PATTERNS))
+
+# Token types of groups which need no further processing.
+TOKEN_TYPES = {
+    name: TokenType[name]
+    for name, _ in PATTERNS
+    if name in TokenType.__members__ and name not in ('ATOM', 'NUMBER')
+}
+
+# Master pattern for sources given as bytes, such as memory mapped files.
+BYTES_MASTER_PATTERN = re.compile(
+    master_pattern(
+        (name, BYTES_PATTERNS.get(name, pattern)) for name, pattern in PATTERNS
+    ).encode()
+)
+
+# Lexemes of token types which are always spelled the same.
+FIXED_LEXEMES = {
+    name: pattern.replace('\\', '')
+    for name, pattern in PATTERNS
+    if name in TOKEN_TYPES and name != 'VARIABLE'
+}
+
+
 class Scanner:
-    def __init__(self, source, report=default_error_handler):
+    """Splits source into tokens.
+
+    Whole source is matched against one master regular expression whose
+    named groups tell kind of every token, so each token costs a single
+    step of the regular expression engine instead of a Python call per
+    character.
+
+    Source is a string, an iterable of its chunks, such as pieces read
+    from a file, or UTF-8 bytes such as a memory mapped file.  Line is
+    number of the first line of source.
+    """
+
+    def __init__(self, source, report=default_error_handler, line=1):
         self._source = source
-        self._tokens = []
-        self._start = 0
-        self._current = 0
-        self._line = 1
         self._report = report
-        self._keywords = self._initialize_keywords()
-
-    def _initialize_keywords(self):
-        keywords = {
-            'fail': TokenType.FAIL,
-            'write': TokenType.WRITE,
-            'nl': TokenType.NL,
-            'tab': TokenType.TAB,
-            'is': TokenType.IS,
-            'retract': TokenType.RETRACT,
-            'asserta': TokenType.ASSERTA,
-            'assertz': TokenType.ASSERTZ,
-        }
-        return keywords
-
-    def _add_token(self, token_type):
-        self._add_token_with_literal(token_type, None)
-
-    def _add_token_with_literal(self, token_type, literal, lex=None):
-        lexeme = (
-            self._source[self._start : self._current] if lex is None else lex
-        )
-        self._tokens.append(Token(token_type, lexeme, literal, self._line))
-
-    def _is_at_end(self):
-        return self._current >= len(self._source)
-
-    def _advance(self):
-        self._current += 1
-        return self._source[self._current - 1]
-
-    def _make_token(self, token_type, literal, line):
-        lexeme = self._source[self._start : self._current]
-        return Token(token_type, lexeme, literal, line)
-
-    def _is_next(self, expected):
-        if self._is_at_end():
-            return False
-
-        if self._source[self._current] != expected:
-            return False
-
-        self._current += 1
-        return True
-
-    def _peek(self):
-        if self._is_at_end():
-            return '\0'
-        return self._source[self._current]
-
-    def _peek_next(self):
-        if self._current + 1 >= len(self._source):
-            return '\0'
-        return self._source[self._current + 1]
-
-    def _is_digit(self, c):
-        return c >= '0' and c <= '9'
-
-    def _is_alphanumeric(self, c):
-        return (
-            (c >= 'a' and c <= 'z')
-            or (c >= 'A' and c <= 'Z')
-            or (c >= '0' and c <= '9')
-            or (c == '_')
-        )
-
-    def _is_lowercase_alpha(self, c):
-        return c >= 'a' and c <= 'z'
-
-    def _is_uppercase_alpha(self, c):
-        return c >= 'A' and c <= 'Z'
-
-    def _is_whitespace(self, c):
-        return c == ' ' or c == '\r' or c == '\t'
-
-    def _str_to_number(self, strnum):
+        self._first_line = line
+        self._line = line
+
+    def _number(self, lexeme, line):
         try:
-            return float(strnum)
+            if '.' in lexeme:
+                return float(lexeme)
+            return int(lexeme)
         except Exception:
-            self._report(self._line, f'"{strnum}" is not a number.')
-
-    def _is_keyword(self):
-        value = self._source[self._start : self._current]
-        token_type = self._keywords.get(value, TokenType.ATOM)
-        return token_type
-
-    def _process_atom(self):
-        while self._is_alphanumeric(self._peek()):
-            self._advance()
-
-        token_type = self._is_keyword()
-        self._add_token(token_type)
-
-    def _process_variable(self):
-        while self._is_alphanumeric(self._peek()):
-            self._advance()
-
-        self._add_token(TokenType.VARIABLE)
-
-    def _process_number(self):
-        while self._is_digit(self._peek()):
-            self._advance()
-
-        if self._peek() == '.' and self._is_digit(self._peek_next()):
-            self._advance()
-            while self._is_digit(self._peek()):
-                self._advance()
-
-        value = self._str_to_number(self._source[self._start : self._current])
-        self._add_token_with_literal(TokenType.NUMBER, value)
-
-    def _process_string_literal(self):
-        while self._peek() != "'" and not self._is_at_end():
-            if self._peek() == '\n':
-                self._line += 1
-            self._advance()
-
-        if self._is_at_end():
-            self._report(self._line, 'Unterminated string')
-
-        self._advance()
-
-        literal = self._source[self._start + 1 : self._current - 1]
-        self._add_token_with_literal(TokenType.ATOM, literal, literal)
-
-    def _scan_token(self):
-        c = self._advance()
-
-        if self._is_whitespace(c):
-            pass
-        elif c == '\n':
-            self._line += 1
-        elif c == '%':
-            while not self._peek() == '\n' and not self._is_at_end():
-                self._advance()
-        elif c == '/' and self._is_next('*'):
-            while not self._is_at_end():
-                c = self._advance()
-                if c == '*' and self._is_next('/'):
-                    break
-                if self._is_at_end():
-                    self._report(self._line, 'Unterminated comment')
-        elif c == "'":
-            self._process_string_literal()
-        elif self._is_lowercase_alpha(c):
-            self._process_atom()
-        elif c == '_':
-            if not self._is_alphanumeric(self._peek_next()):
-                self._add_token(TokenType.UNDERSCORE)
-            else:
-                self._process_variable()
-        elif self._is_uppercase_alpha(c):
-            self._process_variable()
-        elif c == '-' and self._is_digit(self._peek()):
-            # TODO: refactor this logic to unary operator
-            self._process_number()
-        elif self._is_digit(c):
-            self._process_number()
-        elif c == '[':
-            self._add_token(TokenType.LEFTBRACKET)
-        elif c == ']':
-            self._add_token(TokenType.RIGHTBRACKET)
-        elif c == '|':
-            self._add_token(TokenType.BAR)
-        elif c == '!':
-            self._add_token(TokenType.CUT)
-        elif c == '(':
-            self._add_token(TokenType.LEFTPAREN)
-        elif c == ')':
-            self._add_token(TokenType.RIGHTPAREN)
-        elif c == '*':
-            self._add_token(TokenType.STAR)
-        elif c == '/':
-            self._add_token(TokenType.SLASH)
-        elif c == '+':
-            self._add_token(TokenType.PLUS)
-        elif c == '-':
-            self._add_token(TokenType.MINUS)
-        elif c == '=' and self._is_next('='):
-            self._add_token(TokenType.EQUALEQUAL)
-        elif c == '=' and self._is_next('/'):
-            self._add_token(TokenType.EQUALSLASH)
-        elif c == '=' and self._is_next('<'):
-            self._add_token(TokenType.EQUALLESS)
-        elif c == '<':
-            self._add_token(TokenType.LESS)
-        elif c == '>' and self._is_next('='):
-            self._add_token(TokenType.GREATEREQUAL)
-        elif c == '>':
-            self._add_token(TokenType.GREATER)
-        elif c == ':':
-            if self._is_next('-'):
-                self._add_token(TokenType.COLONMINUS)
-            else:
-                self._report(self._line, f'Expected `-` but found `{c}`')
-        elif c == '.':
-            self._add_token(TokenType.DOT)
-        elif c == ',':
-            self._add_token(TokenType.COMMA)
-        else:
-            self._report(self._line, f'Unexpected character: {c}')
+            self._report(line, f'"{lexeme}" is not a number.')
 
     def tokenize(self):
-        while self._is_at_end() is not True:
-            self._start = self._current
-            self._scan_token()
-
-        self._add_token(TokenType.EOF)
-
-        return self._tokens
+        return list(self.scan())
+
+    def scan(self):
+        """Yields tokens one by one.
+
+        Text at the end of a chunk which could still become part of a
+        longer token is kept and scanned together with the next chunk.
+        """
+        self._line = self._first_line
+        if isinstance(self._source, (bytes, bytearray, mmap.mmap)):
+            yield from self._scan_bytes(self._source)
+            return
+        if isinstance(self._source, str):
+            rest = self._source
+        else:
+            rest = ''
+            for chunk in self._source:
+                rest = yield from self._scan_text(rest + chunk, False)
+        yield from self._scan_text(rest, True)
+
+    def _scan_text(self, text, final):
+        """Yields tokens of text and returns text left unscanned.
+
+        Unless text is final, every token must be followed by at least
+        two characters, as much as scanner ever looks ahead.
+        """
+        report = self._report
+        token_types = TOKEN_TYPES
+        line = self._line
+        limit = len(text) if final else len(text) - 2
+        position = 0
+        match = None
+        for match in MASTER_PATTERN.finditer(text):
+            if match.end() > limit:
+                break
+            position = match.end()
+            kind = match.lastgroup
+            lexeme = match.group(kind)
+            token_type = token_types.get(kind)
+            if token_type is not None:
+                yield Token(token_type, lexeme, None, line)
+            elif kind == 'NEWLINE':
+                line += lexeme.count('\n')
+            elif kind == 'ATOM':
+                token_type = KEYWORDS.get(lexeme, TokenType.ATOM)
+                yield Token(token_type, lexeme, None, line)
+            elif kind == 'NUMBER':
+                value = self._number(lexeme, line)
+                yield Token(TokenType.NUMBER, lexeme, value, line)
+            elif kind == 'STRING':
+                line += lexeme.count('\n')
+                if len(lexeme) == 1 or lexeme[-1] != "'":
+                    report(line, 'Unterminated string')
+                    literal = lexeme[1:]
+                else:
+                    literal = lexeme[1:-1]
+                yield Token(TokenType.ATOM, literal, literal, line)
+            elif kind == 'BLOCK':
+                if len(lexeme) > 2 and (
+                    len(lexeme) < 4 or not lexeme.endswith('*/')
+                ):
+                    report(line, 'Unterminated comment')
+            elif kind == 'COLON':
+                report(line, 'Expected `-` but found `:`')
+            elif kind == 'ERROR':
+                report(line, f'Unexpected character: {lexeme}')
+        self._line = line
+
+        if not final:
+            return text[position:]
+
+        # End of input token carries text of the last scanning step.
+        lexeme = ''
+        if match is not None:
+            lexeme = text[match.start(match.lastgroup):]
+            if match.lastgroup in ('NEWLINE', 'SPACE'):
+                lexeme = text[-1]
+        yield Token(TokenType.EOF, lexeme, None, line)
+        return ''
+
+    def _scan_bytes(self, data):
+        """Yields tokens of bytes.
+
+        Only lexemes of tokens are decoded, spaces, new lines and comments
+        are skipped without creating any objects.
+        """
+        report = self._report
+        token_types = TOKEN_TYPES
+        fixed_lexemes = FIXED_LEXEMES
+        line = self._line
+        match = None
+        for match in BYTES_MASTER_PATTERN.finditer(data):
+            kind = match.lastgroup
+            token_type = token_types.get(kind)
+            if kind == 'ATOM':
+                lexeme = match.group(kind).decode()
+                token_type = KEYWORDS.get(lexeme, TokenType.ATOM)
+                yield Token(token_type, lexeme, None, line)
+            elif token_type is not None:
+                lexeme = fixed_lexemes.get(kind)
+                if lexeme is None:
+                    lexeme = match.group(kind).decode()
+                yield Token(token_type, lexeme, None, line)
+            elif kind == 'NEWLINE':
+                start, end = match.span(kind)
+                if end - start == 1:
+                    line += 1
+                else:
+                    line += data[start:end].count(b'\n')
+            elif kind == 'NUMBER':
+                lexeme = match.group(kind).decode()
+                value = self._number(lexeme, line)
+                yield Token(TokenType.NUMBER, lexeme, value, line)
+            elif kind == 'STRING':
+                lexeme = match.group(kind).decode()
+                line += lexeme.count('\n')
+                if len(lexeme) == 1 or lexeme[-1] != "'":
+                    report(line, 'Unterminated string')
+                    literal = lexeme[1:]
+                else:
+                    literal = lexeme[1:-1]
+                yield Token(TokenType.ATOM, literal, literal, line)
+            elif kind == 'BLOCK':
+                start, end = match.span(kind)
+                if end - start > 2 and (
+                    end - start < 4 or data[end - 2:end] != b'*/'
+                ):
+                    report(line, 'Unterminated comment')
+            elif kind == 'COLON':
+                report(line, 'Expected `-` but found `:`')
+            elif kind == 'ERROR':
+                lexeme = match.group(kind).decode(errors='replace')
+                report(line, f'Unexpected character: {lexeme}')
+        self._line = line
+
+        # End of input token carries text of the last scanning step.
+        lexeme = b''
+        if match is not None:
+            lexeme = data[match.start(match.lastgroup):]
+            if match.lastgroup in ('NEWLINE', 'SPACE'):
+                lexeme = data[-1:]
+        yield Token(TokenType.EOF, lexeme.decode(errors='replace'), None, line)
@@ -0,0 +1,139 @@
+import os
+import sqlite3
+from .errors import Unsupported
+from .external import ExternalTable
+from .types import Number, Term, Variable, atom, deref
+
+
+def quote(name):
+    """Returns name quoted as SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Atom standing for NULL cells, calls binding it look for NULL.
+NULL = 'null'
+
+
+def value_term(value):
+    """Returns term standing for value of SQLite column."""
+    if isinstance(value, (int, float)):
+        return Number(value)
+    if value is None:
+        return atom(NULL)
+    if isinstance(value, bytes):
+        value = value.decode(errors='replace')
+    return atom(value)
+
+
+class SqliteTable(ExternalTable):
+    """Facts of a predicate stored as rows of SQLite table.
+
+    Every call is turned into a query whose WHERE clause requires columns
+    of bound arguments to equal them and columns of repeated variables to
+    equal each other, so SQLite can answer it with its indexes.  Query
+    text is built once per pattern of bound arguments and the connection
+    keeps it prepared, values are always passed as parameters.
+
+    NULL cells become atom null, and a bound null matches them as well as
+    text 'null', so facts of NULL cells can be called again.
+    """
+
+    def __init__(self, name, database, table, columns=None):
+        if isinstance(database, sqlite3.Connection):
+            self.connection = database
+        else:
+            self.connection = sqlite3.connect(os.fspath(database))
+        self.name = name
+        self.table = table
+        if columns is None:
+            info = self.connection.execute(
+                f'PRAGMA table_info({quote(table)})'
+            )
+            columns = [row[1] for row in info]
+            if not columns:
+                raise ValueError(f'Table {table} does not exist')
+        self.columns = list(columns)
+        self._select = (
+            f'SELECT {", ".join(map(quote, self.columns))} '
+            f'FROM {quote(table)}'
+        )
+        self._queries = {}
+
+    @property
+    def key(self):
+        return self.name, len(self.columns)
+
+    def _where(self, goal):
+        """Returns pattern of goal and values of its bound arguments.
+
+        Pattern is a tuple with column of every bound argument and first
+        column of every repeated variable, NULL for arguments bound to
+        null and None for other arguments.
+        Returns None when goal cannot match any row.
+        """
+        pattern = []
+        values = []
+        variables = {}
+        for index, arg in enumerate(goal.args):
+            arg = deref(arg)
+            if isinstance(arg, Variable):
+                if arg.name == '_':
+                    pattern.append(None)
+                else:
+                    first = variables.setdefault(arg, index)
+                    pattern.append(None if first == index else first)
+            elif isinstance(arg, Term) and not arg.args:
+                pattern.append(NULL if arg.pred == NULL else index)
+                values.append(arg.pred)
+            else:
+                return None
+        return tuple(pattern), values
+
+    def _query(self, pattern, select):
+        query = self._queries.get((pattern, select))
+        if query is None:
+            tests = []
+            for index, bound in enumerate(pattern):
+                column = quote(self.columns[index])
+                if bound == index:
+                    tests.append(f'{column} = ?')
+                elif bound == NULL:
+                    tests.append(f'({column} IS NULL OR {column} = ?)')
+                elif bound is not None:
+                    # Unlike =, IS holds for two NULL cells.
+                    tests.append(
+                        f'{column} IS {quote(self.columns[bound])}'
+                    )
+            query = select
+            if tests:
+                query += ' WHERE ' + ' AND '.join(tests)
+            self._queries[(pattern, select)] = query
+        return query
+
+    def facts(self, goal, filters=(), env=None):
+        """Yields facts of rows matching goal as rows arrive from SQLite."""
+        where = self._where(goal)
+        if where is None:
+            return
+        pattern, values = where
+        query = self._query(pattern, self._select)
+        name = self.name
+        for row in self.connection.execute(query, values):
+            yield Term(name, *map(value_term, row))
+
+    def aggregate(self, kind, template, goal, filters, env):
+        """Returns count of rows matching goal, counted by SQLite.
+
+        Raises Unsupported for other aggregates and for goals followed by
+        filters, those are solved row by row.
+        """
+        if kind != 'count' or filters:
+            raise Unsupported(goal)
+        where = self._where(goal)
+        if where is None:
+            return Number(0)
+        pattern, values = where
+        select = f'SELECT count(*) FROM {quote(self.table)}'
+        query = self._query(pattern, select)
+        (count,) = self.connection.execute(query, values).fetchone()
+        return Number(count)
@@ -0,0 +1,187 @@
+from .types import Variable, Term, Dot, Bar, deref, _list_parts
+
+
+class Table:
+    """`:- table name/arity.` directive."""
+
+    def __init__(self, name, arity):
+        self.name = name
+        self.arity = arity
+
+    @property
+    def key(self):
+        return self.name, self.arity
+
+    def __str__(self):
+        return f':- table {self.name}/{self.arity}.'
+
+    def __repr__(self):
+        return str(self)
+
+
+def variant_key(term, variables=None):
+    """Returns hashable key which is equal for variants of resolved term.
+
+    Variables are numbered in order of first occurrence, so terms that
+    differ only in names of their variables get the same key.
+    """
+    if variables is None:
+        variables = {}
+    term = deref(term)
+    if isinstance(term, Variable):
+        if term not in variables:
+            variables[term] = len(variables)
+        return Variable, variables[term]
+    if isinstance(term, (Dot, Bar)):
+        items, tail = _list_parts(term)
+        return (
+            Dot,
+            tuple(variant_key(item, variables) for item in items),
+            None if tail is None else variant_key(tail, variables),
+        )
+    if isinstance(term, Term):
+        return (
+            type(term),
+            term.pred,
+            tuple(variant_key(arg, variables) for arg in term.args),
+        )
+    return type(term), str(term)
+
+
+class AnswerTable:
+    """Answers found so far for one variant subgoal."""
+
+    def __init__(self, goal, key):
+        self.goal = goal
+        self.answers = []
+        self.complete = False
+        self.evaluating = False
+        self.leader = None
+        self.depends = {key}
+        self._keys = set()
+
+    def add(self, answer):
+        key = variant_key(answer)
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        self.answers.append(answer)
+        return True
+
+
+class TableSpace:
+    """Answer tables of tabled predicates keyed by variant subgoal.
+
+    Table is filled by running clauses of its predicate again and again
+    until a whole round adds no new answer.  Call of a subgoal that is
+    still being filled only consumes answers found so far, which is what
+    makes left recursion terminate.  Tables that consumed such answers
+    belong to the component of the oldest table they reached and are
+    completed together with it.
+
+    Every table remembers predicates it depends on, and is dropped when
+    clauses of any of them change.
+    """
+
+    def __init__(self):
+        self.tabled = set()
+        self._tables = {}
+        self._stack = []
+        self.added = 0
+
+    def __bool__(self):
+        return bool(self.tabled)
+
+    def declare(self, key):
+        self.tabled.add(key)
+
+    def is_tabled(self, key):
+        return key in self.tabled
+
+    def called(self, key):
+        """Records that every table being filled depends on key."""
+        for table in self._stack:
+            table.depends.add(key)
+
+    def invalidate(self, key):
+        self._tables = {
+            variant: table
+            for variant, table in self._tables.items()
+            if key not in table.depends
+        }
+
+    def answers(self, goal, predicate, fill):
+        """Returns answers of goal, filling its table with fill first.
+
+        fill(goal, add) must run clauses of a fresh copy of goal and call
+        add with every solution it finds.  Answer list of table which is
+        still being filled keeps growing while caller iterates over it.
+        """
+        table = self.table(goal, predicate)
+        if not (table.evaluating or table.complete):
+            self._fill(table, fill)
+        return self.consume(table)
+
+    def table(self, goal, predicate):
+        """Returns table of variant of goal, empty one for a new variant."""
+        goal = goal.resolve()
+        variant = variant_key(goal)
+        table = self._tables.get(variant)
+        if table is None:
+            table = self._tables[variant] = AnswerTable(goal, predicate)
+        return table
+
+    def consume(self, table):
+        """Returns answer list of table to goal being solved."""
+        if table.evaluating:
+            self._depend_on(table)
+        for caller in self._stack:
+            caller.depends |= table.depends
+        return table.answers
+
+    def _depend_on(self, table):
+        position = self._stack.index(table)
+        for caller in self._stack[position + 1:]:
+            caller.leader = min(caller.leader, position)
+
+    def add(self, table, answer):
+        if table.add(answer):
+            self.added += 1
+
+    def start(self, table):
+        """Starts filling table, returns its position on table stack.
+
+        Table is filled by rounds, until added stays same for a whole
+        round, and then stopped and completed.
+        """
+        table.evaluating = True
+        table.leader = position = len(self._stack)
+        self._stack.append(table)
+        return position
+
+    def stop(self, table):
+        self._stack.pop()
+        table.evaluating = False
+
+    def complete(self, table, position):
+        if table.leader == position:
+            table.complete = True
+            for other in list(self._tables.values()):
+                if other.leader is not None and other.leader >= position:
+                    other.complete = True
+                    other.leader = None
+        elif self._stack:
+            caller = self._stack[-1]
+            caller.leader = min(caller.leader, table.leader)
+
+    def _fill(self, table, fill):
+        position = self.start(table)
+        try:
+            while True:
+                added = self.added
+                fill(table.goal, lambda answer: self.add(table, answer))
+                if self.added == added:
+                    break
+        finally:
+            self.stop(table)
+        self.complete(table, position)
@@ -21,6 +21,9 @@ class TokenType(Enum):
     MINUS = (auto(),)
     SLASH = (auto(),)
     STAR = (auto(),)
+    SLASHSLASH = (auto(),)
+    LESSLESS = (auto(),)
+    GREATERGREATER = (auto(),)
     GREATER = (auto(),)
     LESS = (auto(),)
     GREATEREQUAL = (auto(),)
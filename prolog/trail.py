@@ -0,0 +1,38 @@
+class Trail:
+    """Records variable bindings so that they can be undone.
+
+    Variables are bound in place during unification.  Every binding is
+    pushed on the trail, and backtracking unwinds the trail to a mark
+    taken before the bindings were made.
+
+    When nothing can backtrack over a binding there is no need to undo
+    it, so engine may switch recording off by clearing active flag.
+    """
+
+    def __init__(self):
+        self._variables = []
+        self.active = True
+
+    def bind(self, variable, value):
+        variable.ref = value
+        if self.active:
+            self._variables.append(variable)
+
+    def mark(self):
+        return len(self._variables)
+
+    def undo(self, mark):
+        variables = self._variables
+        while len(variables) > mark:
+            variables.pop().ref = None
+
+    def clear(self):
+        """Forgets recorded bindings without undoing them."""
+        self._variables.clear()
+
+    def bindings(self, mark=0):
+        """Returns bindings made since mark in binding order."""
+        return {
+            variable: variable.ref.resolve()
+            for variable in self._variables[mark:]
+        }
@@ -1,19 +1,62 @@
-from functools import reduce
-from .math_interpreter import MathInterpreter
-from .logic_interpreter import LogicInterpreter
+import operator
+import sys
+import weakref
+from .errors import InterpreterError
 from .expression import Visitor, PrimaryExpression, BinaryExpression
-from .merge_bindings import merge_bindings
+from .expression import FunctionExpression
+from .trail import Trail
+
+
+def deref(term):
+    while isinstance(term, Variable) and term.ref is not None:
+        term = term.ref
+    return term
+
+
+def match(term, other):
+    """Returns bindings which unify term with other or None."""
+    trail = Trail()
+    if not term.unify(other, trail):
+        trail.undo(0)
+        return None
+    bindings = trail.bindings()
+    trail.undo(0)
+    return bindings
 
 
 class Variable:
+    __slots__ = ('name', 'ref')
+    ground = False
+
     def __init__(self, name):
         self.name = name
+        self.ref = None
 
     def match(self, other):
-        bindings = dict()
-        if self != other:
-            bindings[self] = other
-        return bindings
+        return match(self, other)
+
+    def unify(self, other, trail):
+        this = deref(self)
+        if this is not self:
+            return this.unify(other, trail)
+        other = deref(other)
+        if other is not self:
+            trail.bind(self, other)
+        return True
+
+    def rename(self, env):
+        if self.name == '_':
+            return Variable('_')
+        variable = env.get(self.name)
+        if variable is None:
+            variable = env[self.name] = Variable(self.name)
+        return variable
+
+    def resolve(self):
+        value = deref(self)
+        if value is self:
+            return self
+        return value.resolve()
 
     def substitute(self, bindings):
         value = bindings.get(self, None)
@@ -28,47 +71,190 @@ class Variable:
         return str(self)
 
 
+_atoms = {}
+_ground_terms = weakref.WeakValueDictionary()
+
+
+def atom(name):
+    """Returns the one Term standing for atom name."""
+    term = _atoms.get(name)
+    if term is None:
+        term = _atoms[name] = Term(sys.intern(name))
+    return term
+
+
+def _ground_key(arg):
+    if type(arg) is Number:
+        value = arg.pred
+        # 1 equals 1.0 and 0.0 equals -0.0, but they print differently.
+        if type(value) is float:
+            return Number, repr(value)
+        return Number, value
+    return arg
+
+
+def intern_term(term):
+    """Returns shared instance of ground compound term.
+
+    Equal ground terms built from interned arguments or numbers are
+    replaced with the first one seen, so they are stored only once and
+    compare by identity.  Other terms are returned unchanged.
+    """
+    if type(term) is not Term or not term.ground or not term.args:
+        return term
+    key = (term.pred, *[_ground_key(arg) for arg in term.args])
+    shared = _ground_terms.get(key)
+    if shared is None:
+        _ground_terms[key] = shared = term
+    return shared
+
+
+def _compound(pred, args, ground=False):
+    """Returns Term of args tuple whose groundness is already known."""
+    term = Term.__new__(Term)
+    term.pred = pred
+    term.args = args
+    term.ground = ground
+    return term
+
+
+def _list_parts(term):
+    """Splits list into its elements and tail.
+
+    Tail is None for proper list, otherwise it is unbound variable or
+    whatever non list term closes the list.
+    """
+    items = []
+    while True:
+        if isinstance(term, Dot):
+            node = term
+            while not node.is_empty:
+                items.append(node.head)
+                node = node.tail
+                if node is None:
+                    return items, None
+                if not isinstance(node, Dot):
+                    break
+            else:
+                return items, None
+            term = deref(node)
+        elif isinstance(term, Bar):
+            items.extend(term.head)
+            term = deref(term.tail)
+        else:
+            return items, term
+
+
+def _make_list(items, tail):
+    if tail is None:
+        return Dot.from_list(items)
+    if not items:
+        return tail
+    return Bar(Dot.from_list(items), tail)
+
+
+def _normalize_list(term):
+    term = deref(term)
+    while isinstance(term, Bar) and term.head.is_empty:
+        term = deref(term.tail)
+    return term
+
+
+def _uncons(term):
+    """Returns head and tail of non empty normalized list."""
+    if isinstance(term, Bar):
+        node = term.head
+        if node.tail is None:
+            return node.head, term.tail
+        return node.head, Bar(node.tail, term.tail)
+    if term.tail is None:
+        return term.head, Dot.from_list([])
+    return term.head, term.tail
+
+
+def _unify_lists(left, right, trail):
+    """Unifies two lists element by element.
+
+    Only as much of both lists is walked as is needed, so unifying
+    [H | T] with long list costs the same as with short one.
+    """
+    while True:
+        left = _normalize_list(left)
+        right = _normalize_list(right)
+        if not isinstance(left, (Dot, Bar)) or not isinstance(
+            right, (Dot, Bar)
+        ):
+            if isinstance(left, Variable):
+                return left.unify(right, trail)
+            if isinstance(right, Variable):
+                return right.unify(left, trail)
+            return False
+
+        left_empty = isinstance(left, Dot) and left.is_empty
+        right_empty = isinstance(right, Dot) and right.is_empty
+        if left_empty or right_empty:
+            return left_empty and right_empty
+
+        left_head, left = _uncons(left)
+        right_head, right = _uncons(right)
+        if not left_head.unify(right_head, trail):
+            return False
+
+
+def _resolve_list(term):
+    items, tail = _list_parts(term)
+    items = [item.resolve() for item in items]
+    if tail is not None:
+        tail = tail.resolve()
+    return _make_list(items, tail)
+
+
 class Dot:
+    __slots__ = ('head', 'tail', 'ground')
+
     def __init__(self, head, tail=None):
-        self._name = '.'
         self.head = head
         self.tail = tail
-        self._current_element = self
+        self.ground = (
+            isinstance(head, list) or getattr(head, 'ground', False)
+        ) and (tail is None or tail.ground)
 
     @classmethod
     def from_list(cls, lst):
         if not lst:
             return cls([])
-        head = Dot(lst[0])
-        first_head = head
-        for elem in lst[1:]:
-            head.tail = Dot(elem)
-            head = head.tail
-        return first_head
+        node = None
+        for elem in reversed(lst):
+            node = Dot(elem, node)
+        return node
 
     @staticmethod
     def concat(dot1, dot2):
         return Dot.from_list(list(dot1) + list(dot2))
 
-    def _match_lsts(self, lst1, lst2):
-        m = list(map((lambda arg1, arg2: arg1.match(arg2)), lst1, lst2))
-
-        return reduce(merge_bindings, [{}] + m)
+    @property
+    def is_empty(self):
+        return self.tail is None and isinstance(self.head, list)
 
     def match(self, other):
-        if isinstance(other, Bar):
-            return other.match(self)
+        return match(self, other)
 
-        if not isinstance(other, Dot):
-            return {}
+    def unify(self, other, trail):
+        return _unify_lists(self, other, trail)
 
-        l1 = list(self)
-        l2 = list(other)
-        if len(l1) == len(l2):
-            return self._match_lsts(l1, l2)
-        return None
+    def rename(self, env):
+        if self.ground:
+            return self
+        return Dot.from_list([arg.rename(env) for arg in self])
+
+    def resolve(self):
+        if self.ground:
+            return self
+        return _resolve_list(self)
 
     def substitute(self, bindings):
+        if self.ground:
+            return self
         return Dot.from_list(
             list(map((lambda arg: arg.substitute(bindings)), self))
         )
@@ -77,15 +263,10 @@ class Dot:
         yield from runtime.execute(self)
 
     def __iter__(self):
-        self._current_element = self
-        return self
-
-    def __next__(self):
-        if self._current_element is None:
-            raise StopIteration
-        element = self._current_element.head
-        self._current_element = self._current_element.tail
-        return element
+        node = None if self.is_empty else self
+        while node is not None:
+            yield node.head
+            node = node.tail
 
     def __str__(self):
         return str(list(self))
@@ -95,31 +276,26 @@ class Dot:
 
 
 class Bar:
+    __slots__ = ('head', 'tail')
+    ground = False
+
     def __init__(self, head, tail):
         self.head = head
         self.tail = tail
 
     def match(self, other):
-        if not isinstance(other, Dot):
-            return None
+        return match(self, other)
 
-        other_left = list(other)[: len(list(self.head))]
-        other_right = list(other)[len(list(self.head)) :]
-        other_head = Dot.from_list(other_left)
-        other_tail = Dot.from_list(other_right)
-        head_match = self.head.match(other_head)
-        tail_match = self.tail.match(other_tail)
+    def unify(self, other, trail):
+        return _unify_lists(self, other, trail)
 
-        if head_match is not None and tail_match is not None:
-            return {**head_match, **tail_match}
+    def rename(self, env):
+        return Bar(self.head.rename(env), self.tail.rename(env))
 
-        return None
+    def resolve(self):
+        return _resolve_list(self)
 
     def substitute(self, bindings):
-        # return Dot.from_list(list(map(
-        #     (lambda arg: arg.substitute(bindings)),
-        #     self
-        # )))
         new_head = self.head.substitute(bindings)
         new_tail = self.tail.substitute(bindings)
         return Bar(new_head, new_tail)
@@ -140,26 +316,48 @@ class Bar:
 
 
 class Term:
+    __slots__ = ('pred', 'args', 'ground', '__weakref__')
+
     def __init__(self, pred, *args):
         self.pred = pred
-        self.args = list(args)
+        self.args = args
+        self.ground = all(getattr(arg, 'ground', False) for arg in args)
 
     def match(self, other):
-        if isinstance(other, Term):
-            if self.pred != other.pred or len(self.args) != len(other.args):
-                return None
-
-            m = list(
-                map(
-                    (lambda arg1, arg2: arg1.match(arg2)), self.args, other.args
-                )
-            )
-
-            return reduce(merge_bindings, [{}] + m)
-
-        return other.match(self)
+        return match(self, other)
+
+    def unify(self, other, trail):
+        other = deref(other)
+        if other is self:
+            return True
+        if isinstance(other, Variable):
+            trail.bind(other, self)
+            return True
+        if (
+            not isinstance(other, Term)
+            or self.pred != other.pred
+            or len(self.args) != len(other.args)
+        ):
+            return False
+        for arg, other_arg in zip(self.args, other.args):
+            if not arg.unify(other_arg, trail):
+                return False
+        return True
+
+    def rename(self, env):
+        if self.ground:
+            return self
+        args = tuple([arg.rename(env) for arg in self.args])
+        return _compound(self.pred, args)
+
+    def resolve(self):
+        if self.ground:
+            return self
+        return Term(self.pred, *[arg.resolve() for arg in self.args])
 
     def substitute(self, bindings):
+        if self.ground:
+            return self
         return Term(
             self.pred, *map((lambda arg: arg.substitute(bindings)), self.args)
         )
@@ -167,6 +365,12 @@ class Term:
     def query(self, runtime):
         yield from runtime.execute(self)
 
+    def __reduce_ex__(self, protocol):
+        # Unpickled atoms are interned again.
+        if type(self) is Term and not self.args:
+            return atom, (self.pred,)
+        return super().__reduce_ex__(protocol)
+
     def __str__(self):
         if len(self.args) == 0:
             return f'{self.pred}'
@@ -177,38 +381,21 @@ class Term:
         return str(self)
 
 
-class TermFunction(Term):
-    def __init__(self, func, predicate, *args):
-        super().__init__(predicate, *args)
-        self._func = func
-
-    def _execute_func(self):
-        result = next(self._func())
-        if isinstance(result, tuple):
-            self.args = [*result]
-        else:
-            self.args = [result]
-
-    def match(self, other):
-        if isinstance(other, Term):
-            if self.pred != other.pred or len(self.args) != len(other.args):
-                return None
-
-            self._execute_func()
-            m = list(
-                map(
-                    (lambda arg1, arg2: arg1.match(arg2)), self.args, other.args
-                )
-            )
-
-            return reduce(merge_bindings, [{}] + m)
-
-        return other.match(self)
-
-
 class Logic:
-    def __init__(self, expression):
+    __slots__ = ('_expression', '_compiled', '_env')
+    ground = False
+
+    def __init__(self, expression, env=None):
         self._expression = expression
+        self._compiled = None
+        self._env = {} if env is None else env
+
+    def _with_env(self, env):
+        if self._compiled is None:
+            self._compiled = compile_expression(self._expression)
+        logic = Logic(self._expression, env)
+        logic._compiled = self._compiled
+        return logic
 
     def match(self, other):
         bindings = dict()
@@ -221,43 +408,59 @@ class Logic:
         if value is not None:
             return value.substitute(bindings)
 
-        expression_binder = ExpressionBinder(bindings)
-        expression = self._expression.accept(expression_binder)
-        return Logic(expression)
+        return self._with_env(
+            _bound_values(self._expression, self._env, _Bindings(bindings))
+        )
 
-    def evaluate(self):
-        return self._expression.accept(logic_interpreter)
+    def rename(self, env):
+        return self._with_env(env)
+
+    def resolve(self):
+        return self
+
+    def holds(self, env=None):
+        """Returns whether comparison holds for variables in env."""
+        if self._compiled is None:
+            self._compiled = compile_expression(self._expression)
+        return self._compiled(self._env if env is None else env)
+
+    def evaluate(self, env=None):
+        if self.holds(env):
+            return TRUE()
+        return FALSE()
+
+    def __reduce__(self):
+        return Logic, (self._expression, self._env)
 
     def query(self, runtime):
         yield self.evaluate()
 
     def __str__(self):
-        return f'{self._expression}'
+        if not self._env:
+            return f'{self._expression}'
+        return f'{self._expression.accept(ExpressionBinder(self._env))}'
 
     def __repr__(self):
         return str(self)
 
 
 class Arithmetic(Variable):
-    def __init__(self, name, expression):
+    __slots__ = ('_expression', '_compiled', '_env')
+
+    def __init__(self, name, expression, env=None):
         super().__init__(name)
         self._expression = expression
+        self._compiled = None
+        self._env = {} if env is None else env
 
     @property
     def args(self):
-        return [self]
+        return (self,)
 
     @property
     def var(self):
         return self
 
-    def _bind_name(self, bindings):
-        for k, v in bindings.items():
-            if isinstance(k, Variable) and k.name == self.name:
-                if isinstance(v, Variable):
-                    return v.name
-        return self.name
-
     def match(self, other):
         bindings = dict()
         if self != other:
@@ -269,18 +472,32 @@ class Arithmetic(Variable):
         if value is not None:
             return value.substitute(bindings)
 
-        expression_binder = ExpressionBinder(bindings)
-        name = self._bind_name(bindings)
-        expression = self._expression.accept(expression_binder)
-        return Arithmetic(name, expression)
+        if self._compiled is None:
+            self._compiled = _compile_arithmetic(self._expression)
+        bindings = _Bindings(bindings)
+        name = self.name
+        value = bindings.get(self)
+        if isinstance(value, Variable):
+            name = value.name
+        arithmetic = Arithmetic(
+            name,
+            self._expression,
+            _bound_values(self._expression, self._env, bindings),
+        )
+        arithmetic._compiled = self._compiled
+        return arithmetic
 
-    def evaluate(self):
-        val = self._expression.accept(math_interpreter)
-        return val
+    def evaluate(self, env=None):
+        if self._compiled is None:
+            self._compiled = _compile_arithmetic(self._expression)
+        return self._compiled(self._env if env is None else env)
 
     def query(self, runtime):
         yield self
 
+    def __reduce__(self):
+        return Arithmetic, (self.name, self._expression, self._env)
+
     def __str__(self):
         return f'{self.name}'
 
@@ -289,8 +506,12 @@ class Arithmetic(Variable):
 
 
 class Number(Term):
+    __slots__ = ()
+
     def __init__(self, pred):
-        super().__init__(pred)
+        self.pred = pred
+        self.args = ()
+        self.ground = True
 
     def multiply(self, number):
         return Number(self.pred * number.pred)
@@ -335,7 +556,29 @@ class Number(Term):
         return FALSE()
 
 
+# Conversions of the most common Python values to terms, by exact type.
+_FACT_ARGUMENTS = {str: atom, int: Number, float: Number}
+
+
+def fact_argument(value):
+    """Returns term standing for Python value in a fact.
+
+    Terms are kept, numbers become numbers and anything else becomes atom
+    named by its str.
+    """
+    convert = _FACT_ARGUMENTS.get(type(value))
+    if convert is not None:
+        return convert(value)
+    if isinstance(value, (Term, Dot)):
+        return intern_term(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return Number(value)
+    return atom(str(value))
+
+
 class TRUE(Term):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(TRUE)
 
@@ -347,6 +590,8 @@ class TRUE(Term):
 
 
 class FALSE(Term):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(FALSE)
 
@@ -358,6 +603,8 @@ class FALSE(Term):
 
 
 class CUT(Term):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(CUT)
 
@@ -368,36 +615,244 @@ class CUT(Term):
         yield self
 
 
-class ExpressionBinder(Visitor):
-    """Binds variables.
+class _Bindings:
+    """Finds values of variables in bindings by identity, then by name.
 
-    This class given dictionary of variable bindings walks expression tree
-    and substitutes each variable for the value found in bindings dictionary.
-    This returns identical expression tree as the input but with variables
-    replaced with values.
+    Bindings are indexed by variable name only once, and only if some
+    variable is not found by identity.
     """
 
     def __init__(self, bindings):
         self._bindings = bindings
+        self._names = None
+
+    def get(self, variable):
+        value = self._bindings.get(variable)
+        if value is None:
+            if self._names is None:
+                self._names = {}
+                for key, item in self._bindings.items():
+                    if isinstance(key, Variable):
+                        self._names.setdefault(key.name, item)
+            value = self._names.get(variable.name)
+        return value
+
+
+def _expression_variables(expr, variables):
+    if isinstance(expr, BinaryExpression):
+        _expression_variables(expr.left, variables)
+        _expression_variables(expr.right, variables)
+    elif isinstance(expr, FunctionExpression):
+        for arg in expr.args:
+            _expression_variables(arg, variables)
+    elif isinstance(expr.exp, Variable):
+        variables.append(expr.exp)
+    return variables
+
+
+def _bound_values(expression, env, bindings):
+    """Returns env extended with values bindings give to variables."""
+    env = dict(env)
+    for variable in _expression_variables(expression, []):
+        value = bindings.get(variable)
+        if value is not None:
+            env[variable.name] = value
+    return env
 
-    def _bind_expr(self, expr):
-        return expr.accept(self)
+
+class ExpressionBinder(Visitor):
+    """Binds variables.
+
+    This class given dictionary of values of variables by name walks
+    expression tree and substitutes each variable for its value.  This
+    returns identical expression tree as the input but with variables
+    replaced with values.  It is used only to display expressions;
+    evaluation reads values of variables directly.
+    """
+
+    def __init__(self, env):
+        self._env = env
 
     def visit_binary(self, expr):
-        left = self._bind_expr(expr.left)
-        right = self._bind_expr(expr.right)
+        left = expr.left.accept(self)
+        right = expr.right.accept(self)
 
         return BinaryExpression(left, expr.operand, right)
 
+    def visit_function(self, expr):
+        args = [arg.accept(self) for arg in expr.args]
+        return FunctionExpression(expr.name, args)
+
     def visit_primary(self, expr):
         exp = expr.exp
         if isinstance(exp, Variable):
-            for k, v in self._bindings.items():
-                if k.name == exp.name:
-                    return PrimaryExpression(v)
+            value = self._env.get(exp.name)
+            if value is not None:
+                return PrimaryExpression(deref(value))
 
         return expr
 
 
-math_interpreter = MathInterpreter()
-logic_interpreter = LogicInterpreter()
+def _integers(function):
+    def apply(left, right):
+        if type(left) is not int or type(right) is not int:
+            raise InterpreterError(
+                f'Expected integers but got: {left} and {right}'
+            )
+        return function(left, right)
+
+    return apply
+
+
+def _evaluating(function):
+    """Turns overflows and invalid operands of function into errors."""
+
+    def apply(left, right):
+        try:
+            return function(left, right)
+        except (OverflowError, ValueError) as error:
+            raise InterpreterError(f'Evaluation error: {error}') from None
+
+    return apply
+
+
+def _dividing(function):
+    def apply(left, right):
+        if right == 0:
+            raise InterpreterError(
+                f'Evaluation error: {left} divided by zero'
+            )
+        return function(left, right)
+
+    return apply
+
+
+def _divide(left, right):
+    if type(left) is int and type(right) is int and left % right == 0:
+        return left // right
+    return left / right
+
+
+def _truncate(left, right):
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def _remainder(left, right):
+    return left - right * _truncate(left, right)
+
+
+OPERATORS = {
+    '*': _evaluating(operator.mul),
+    '/': _evaluating(_dividing(_divide)),
+    '//': _integers(_dividing(_truncate)),
+    'mod': _integers(_dividing(operator.mod)),
+    'rem': _integers(_dividing(_remainder)),
+    '<<': _integers(_evaluating(operator.lshift)),
+    '>>': _integers(_evaluating(operator.rshift)),
+    '+': _evaluating(operator.add),
+    '-': _evaluating(operator.sub),
+    '==': operator.eq,
+    '=/': operator.ne,
+    '=<': operator.le,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+COMPARISONS = {'==', '=/', '=<', '<', '>=', '>'}
+
+FUNCTIONS = {'abs': abs, 'min': min, 'max': max}
+
+
+def _number(term):
+    term = deref(term)
+    if type(term) is Number:
+        return term.pred
+    if isinstance(term, Variable):
+        raise InterpreterError(
+            f'Arguments are not sufficiently instantiated: {term}'
+        )
+    raise InterpreterError(f'Expected number but got: {term}')
+
+
+class ExpressionCompiler(Visitor):
+    """Compiles expression into function(env) computing plain number.
+
+    Variables are looked up by name in clause activation environment.
+    Visit methods return pair of value and function, where function is
+    None for constant sub-expression, whose value is computed here once.
+    """
+
+    def visit_binary(self, expr):
+        function = OPERATORS.get(expr.operand)
+        if function is None:
+            raise InterpreterError(f'Invalid binary operand {expr.operand}')
+        left_value, left = expr.left.accept(self)
+        right_value, right = expr.right.accept(self)
+
+        if left is None and right is None:
+            try:
+                return function(left_value, right_value), None
+            except InterpreterError:
+                # Error is raised when the expression is evaluated.
+                return None, lambda env: function(left_value, right_value)
+        if left is None:
+            return None, lambda env: function(left_value, right(env))
+        if right is None:
+            return None, lambda env: function(left(env), right_value)
+        return None, lambda env: function(left(env), right(env))
+
+    def visit_function(self, expr):
+        function = FUNCTIONS.get(expr.name)
+        if function is None:
+            raise InterpreterError(f'Unknown arithmetic function {expr.name}')
+        compiled = [arg.accept(self) for arg in expr.args]
+        if all(unit is None for _, unit in compiled):
+            return function(*[value for value, _ in compiled]), None
+
+        units = [
+            unit if unit is not None else (lambda env, value=value: value)
+            for value, unit in compiled
+        ]
+        if len(units) == 1:
+            unit = units[0]
+            return None, lambda env: function(unit(env))
+        left, right = units
+        return None, lambda env: function(left(env), right(env))
+
+    def visit_primary(self, expr):
+        exp = deref(expr.exp)
+        if type(exp) is Number:
+            return exp.pred, None
+        if not isinstance(exp, Variable):
+            return None, lambda env: _number(exp)
+
+        name = exp.name
+        return None, lambda env: _number(env.get(name, exp))
+
+
+def compile_expression(expression):
+    """Returns function(env) evaluating expression to number or bool."""
+    value, function = expression.accept(ExpressionCompiler())
+    if function is None:
+        return lambda env: value
+    return function
+
+
+def _compile_arithmetic(expression):
+    if isinstance(expression, PrimaryExpression) and isinstance(
+        deref(expression.exp), Variable
+    ):
+        # `X is Y` takes value of Y whatever it is bound to.
+        variable = deref(expression.exp)
+        name = variable.name
+        return lambda env: deref(env.get(name, variable))
+
+    function = compile_expression(expression)
+    if (
+        isinstance(expression, BinaryExpression)
+        and expression.operand in COMPARISONS
+    ):
+        return lambda env: TRUE() if function(env) else FALSE()
+    return lambda env: Number(function(env))
@@ -0,0 +1,1120 @@
+from collections import deque
+from .types import (
+    Variable,
+    Arithmetic,
+    Logic,
+    Term,
+    Number,
+    Dot,
+    Bar,
+    FALSE,
+    TRUE,
+    deref as deref_term,
+    ExpressionCompiler,
+    FUNCTIONS,
+    OPERATORS,
+    _list_parts,
+    _make_list,
+)
+from .expression import BinaryExpression, PrimaryExpression
+from .expression import FunctionExpression
+from .builtins import Write, Nl, Tab, Fail, Cut, DatabaseOp
+from .errors import InterpreterError
+from .trail import Trail
+from .interpreter import Runtime, Rule, Conjunction, Frame, _goal_solver
+from .clause_store import predicate_key
+
+
+# Cell tags.  Heap and registers hold (tag, value) cells.
+REF = 0  # (REF, address) of variable, unbound when it points to itself
+STR = 1  # (STR, address) of functor cell of structure
+CON = 2  # (CON, constant)
+FUN = 3  # (FUN, (name, arity)) followed by arity argument cells
+
+NIL = '[]'
+LIST = ('.', 2)
+
+
+class _Nil:
+    def __repr__(self):
+        return NIL
+
+
+_nil = _Nil()
+
+# Instruction set.
+GET_VARIABLE = 0
+GET_VALUE = 1
+GET_CONSTANT = 2
+GET_STRUCTURE = 3
+UNIFY_VARIABLE = 4
+UNIFY_VALUE = 5
+UNIFY_CONSTANT = 6
+UNIFY_VOID = 7
+PUT_VARIABLE = 8
+PUT_VALUE = 9
+PUT_CONSTANT = 10
+PUT_STRUCTURE = 11
+PUT_VOID = 12
+ALLOCATE = 13
+DEALLOCATE = 14
+CALL = 15
+EXECUTE = 16
+PROCEED = 17
+TRY_ME_ELSE = 18
+RETRY_ME_ELSE = 19
+TRUST_ME = 20
+NECK_CUT = 21
+CUT = 22
+CALL_VARIABLE = 23
+BUILTIN = 24
+FAIL = 25
+SUCCEED = 26
+IS = 27
+COMPARE = 28
+SWITCH_ON_TERM = 29
+TRY = 30
+RETRY = 31
+TRUST = 32
+
+OPCODES = {
+    value: name.lower()
+    for name, value in list(globals().items())
+    if isinstance(value, int) and value >= 0 and name.isupper()
+    and name not in ('REF', 'STR', 'CON', 'FUN')
+}
+
+# Procedure whose clauses are run by the tree walking interpreter.
+FOREIGN = 'foreign'
+
+
+class CompileError(Exception):
+    pass
+
+
+def _constant(term):
+    if isinstance(term, Dot) and term.is_empty:
+        return _nil
+    if isinstance(term.pred, (str, int, float)):
+        return term.pred
+    raise CompileError(f'Cannot compile constant: {term}')
+
+
+def _shape(term):
+    """Returns ('var', name), ('const', value) or ('struct', f, args)."""
+    if type(term) is Variable or type(term) is Arithmetic:
+        return 'var', term.name
+    if isinstance(term, (Dot, Bar)):
+        if isinstance(term, Dot) and term.is_empty:
+            return 'const', _nil
+        items, tail = _list_parts(term)
+        shape = ('const', _nil) if tail is None else _shape(tail)
+        for item in reversed(items):
+            shape = 'struct', LIST, [_shape(item), shape]
+        return shape
+    if type(term) is Term or type(term) is Number:
+        if not term.args:
+            return 'const', _constant(term)
+        return 'struct', (term.pred, len(term.args)), [
+            _shape(arg) for arg in term.args
+        ]
+    raise CompileError(f'Cannot compile term: {term}')
+
+
+def _expression_names(expr, names):
+    if isinstance(expr, BinaryExpression):
+        _expression_names(expr.left, names)
+        _expression_names(expr.right, names)
+    elif isinstance(expr, FunctionExpression):
+        for arg in expr.args:
+            _expression_names(arg, names)
+    elif isinstance(expr, PrimaryExpression):
+        _term_names(expr.exp, names)
+
+
+def _term_names(term, names):
+    """Appends names of variables of term in order of occurrence."""
+    if isinstance(term, Variable):
+        if term.name != '_' and term.name not in names:
+            names.append(term.name)
+        if isinstance(term, Arithmetic):
+            _expression_names(term._expression, names)
+    elif isinstance(term, Logic):
+        _expression_names(term._expression, names)
+    elif isinstance(term, Dot):
+        for item in term:
+            _term_names(item, names)
+    elif isinstance(term, Bar):
+        _term_names(term.head, names)
+        _term_names(term.tail, names)
+    elif isinstance(term, DatabaseOp):
+        _term_names(term.arg, names)
+    elif isinstance(term, (Term, Write)):
+        for arg in term.args:
+            _term_names(arg, names)
+    return names
+
+
+def _body_goals(body):
+    goals = []
+    stack = [body]
+    while stack:
+        goal = stack.pop()
+        if isinstance(goal, Conjunction):
+            stack.extend(reversed(goal.args))
+        elif not isinstance(goal, TRUE):
+            goals.append(goal)
+    return goals
+
+
+def _is_call(goal):
+    return type(goal) is Term or type(goal) is Variable
+
+
+class ClauseCompiler:
+    """Compiles one clause into WAM instructions.
+
+    Variables which occur in more than one chunk (head and first call,
+    then every further call) are permanent and kept in the environment,
+    others live in X registers.  Every variable cell is allocated on the
+    heap, so there are no unsafe variables to take care of.  Temporary
+    registers are numbered above the largest arity used in the clause.
+    """
+
+    def __init__(self, head, goals, query=None):
+        self.head = head
+        self.goals = goals
+        self.query = query
+        self.code = []
+        self._seen = set()
+
+        arities = [len(getattr(head, 'args', ()))]
+        arities.extend(
+            len(getattr(goal, 'args', ())) for goal in goals if _is_call(goal)
+        )
+        self._next_temp = max(arities) + 1
+
+        chunks = {}
+        chunk = 0
+        for name in _term_names(head, []):
+            chunks.setdefault(name, set()).add(chunk)
+        for goal in goals:
+            for name in _term_names(goal, []):
+                chunks.setdefault(name, set()).add(chunk)
+            if _is_call(goal):
+                chunk += 1
+        if query is not None:
+            for name in query:
+                chunks.setdefault(name, set()).add(chunk)
+
+        self._registers = {}
+        permanent = [name for name, used in chunks.items() if len(used) > 1]
+        for i, name in enumerate(permanent):
+            self._registers[name] = -(i + 1)
+        self.permanent = len(permanent)
+
+        calls = [i for i, goal in enumerate(goals) if _is_call(goal)]
+        self.needs_environment = (
+            self.permanent > 0
+            or query is not None
+            or any(i != len(goals) - 1 for i in calls)
+        )
+
+    @property
+    def registers(self):
+        return self._next_temp
+
+    def _temp(self):
+        register = self._next_temp
+        self._next_temp += 1
+        return register
+
+    def _register(self, name):
+        register = self._registers.get(name)
+        if register is None:
+            register = self._registers[name] = self._temp()
+        return register
+
+    def _first(self, name):
+        if name in self._seen:
+            return False
+        self._seen.add(name)
+        return True
+
+    def _emit(self, *instruction):
+        self.code.append(instruction)
+
+    def _get(self, shape, register):
+        queue = deque([(shape, register)])
+        while queue:
+            shape, register = queue.popleft()
+            kind = shape[0]
+            if kind == 'var':
+                name = shape[1]
+                if name == '_':
+                    continue
+                if self._first(name):
+                    self._emit(GET_VARIABLE, self._register(name), register)
+                else:
+                    self._emit(GET_VALUE, self._register(name), register)
+            elif kind == 'const':
+                self._emit(GET_CONSTANT, shape[1], register)
+            else:
+                self._emit(GET_STRUCTURE, shape[1], register)
+                for arg in shape[2]:
+                    if arg[0] == 'struct':
+                        temp = self._temp()
+                        self._emit(UNIFY_VARIABLE, temp, '_')
+                        queue.append((arg, temp))
+                    else:
+                        self._unify(arg)
+
+    def _unify(self, shape):
+        if shape[0] == 'const':
+            self._emit(UNIFY_CONSTANT, shape[1])
+        elif shape[1] == '_':
+            self._emit(UNIFY_VOID)
+        elif self._first(shape[1]):
+            self._emit(UNIFY_VARIABLE, self._register(shape[1]), shape[1])
+        else:
+            self._emit(UNIFY_VALUE, self._register(shape[1]))
+
+    def _put(self, shape, register):
+        kind = shape[0]
+        if kind == 'var':
+            name = shape[1]
+            if name == '_':
+                self._emit(PUT_VOID, register)
+            elif self._first(name):
+                self._emit(PUT_VARIABLE, self._register(name), register, name)
+            else:
+                self._emit(PUT_VALUE, self._register(name), register)
+        elif kind == 'const':
+            self._emit(PUT_CONSTANT, shape[1], register)
+        else:
+            # Nested structures are built first, innermost first.
+            order = []
+            temps = {}
+            stack = [(shape, register)]
+            while stack:
+                shape, target = stack.pop()
+                order.append((shape, target))
+                for arg in shape[2]:
+                    if arg[0] == 'struct':
+                        temps[id(arg)] = self._temp()
+                        stack.append((arg, temps[id(arg)]))
+            for shape, target in reversed(order):
+                self._emit(PUT_STRUCTURE, shape[1], target)
+                for arg in shape[2]:
+                    if arg[0] == 'struct':
+                        self._emit(UNIFY_VALUE, temps[id(arg)])
+                    else:
+                        self._unify(arg)
+
+    def _expression(self, expr):
+        """Compiles expression into function(machine, env) of numbers."""
+        value, function = expr.accept(ExpressionCompiler())
+        if function is None:
+            return lambda machine, env: value
+
+        if isinstance(expr, BinaryExpression):
+            function = OPERATORS.get(expr.operand)
+            if function is None:
+                raise CompileError(f'Cannot compile operator: {expr.operand}')
+            left = self._expression(expr.left)
+            right = self._expression(expr.right)
+            return lambda machine, env: function(
+                left(machine, env), right(machine, env)
+            )
+
+        if isinstance(expr, FunctionExpression):
+            function = FUNCTIONS[expr.name]
+            args = [self._expression(arg) for arg in expr.args]
+            if len(args) == 1:
+                arg = args[0]
+                return lambda machine, env: function(arg(machine, env))
+            left, right = args
+            return lambda machine, env: function(
+                left(machine, env), right(machine, env)
+            )
+
+        term = expr.exp
+        if type(term) is Number:
+            value = term.pred
+            return lambda machine, env: value
+        if isinstance(term, Variable) and term.name in self._seen:
+            register = self._register(term.name)
+            return lambda machine, env: machine.number(register, env)
+        raise CompileError(f'Cannot compile expression: {expr}')
+
+    def _builtin(self, goal):
+        try:
+            if type(goal) is Arithmetic:
+                evaluate = self._expression(goal._expression)
+                self._variables(goal)
+                self._emit(IS, self._register(goal.name), evaluate)
+                return
+            if isinstance(goal, Logic):
+                self._emit(COMPARE, self._expression(goal._expression))
+                return
+        except (CompileError, InterpreterError):
+            pass
+        self._emit(BUILTIN, goal, self._variables(goal))
+
+    def _variables(self, goal):
+        names = []
+        for name in _term_names(goal, []):
+            if self._first(name):
+                self._emit(PUT_VARIABLE, self._register(name), None, name)
+            names.append((name, self._register(name)))
+        return tuple(names)
+
+    def compile(self):
+        if self.needs_environment:
+            self._emit(ALLOCATE, self.permanent)
+        if isinstance(self.head, Term):
+            for i, arg in enumerate(self.head.args):
+                self._get(_shape(arg), i)
+
+        last = len(self.goals) - 1
+        for i, goal in enumerate(self.goals):
+            tail = i == last and self.query is None
+            if type(goal) is Term:
+                for j, arg in enumerate(goal.args):
+                    self._put(_shape(arg), j)
+                key = (goal.pred, len(goal.args))
+                if tail:
+                    if self.needs_environment:
+                        self._emit(DEALLOCATE)
+                    self._emit(EXECUTE, key)
+                else:
+                    self._emit(CALL, key)
+            elif type(goal) is Variable:
+                temp = self._temp()
+                self._put(_shape(goal), temp)
+                if tail and self.needs_environment:
+                    self._emit(DEALLOCATE)
+                self._emit(CALL_VARIABLE, temp, tail)
+            elif isinstance(goal, Cut):
+                if self.needs_environment:
+                    self._emit(CUT)
+                else:
+                    self._emit(NECK_CUT)
+            elif isinstance(goal, (Fail, FALSE)):
+                self._emit(FAIL)
+            elif isinstance(
+                goal, (Write, Nl, Tab, DatabaseOp, Arithmetic, Logic)
+            ):
+                self._builtin(goal)
+            else:
+                raise CompileError(f'Cannot compile goal: {goal}')
+
+        if self.query is not None:
+            names = tuple(
+                (name, self._register(name))
+                for name in self.query
+                if name in self._seen
+            )
+            self._emit(SUCCEED, names)
+        elif not self.goals or not _is_call(self.goals[-1]):
+            if self.needs_environment:
+                self._emit(DEALLOCATE)
+            self._emit(PROCEED)
+        return self.code
+
+
+def _first_argument_key(head):
+    if not head.args:
+        return None
+    shape = _shape(head.args[0])
+    if shape[0] == 'var':
+        return None
+    return shape[1]
+
+
+def _chain(labels, arity):
+    """Returns try, retry and trust instructions over clause labels."""
+    if len(labels) == 1:
+        return []
+    code = [(TRY, labels[0], arity)]
+    code.extend((RETRY, label) for label in labels[1:-1])
+    code.append((TRUST, labels[-1]))
+    return code
+
+
+def compile_predicate(rules, arity):
+    """Compiles clauses of one predicate into single instruction list.
+
+    Alternatives are chained with try_me_else, retry_me_else and trust_me.
+    When first argument is bound, switch_on_term jumps to chain of try,
+    retry and trust over clauses whose first argument may match.
+    Returns code and the number of registers it uses.
+    """
+    blocks = []
+    keys = []
+    registers = arity
+    for rule in rules:
+        compiler = ClauseCompiler(rule.head, _body_goals(rule.body))
+        blocks.append(compiler.compile())
+        keys.append(_first_argument_key(rule.head))
+        registers = max(registers, compiler.registers)
+
+    if not blocks:
+        return [(FAIL,)], registers
+    if len(blocks) == 1:
+        return blocks[0], registers
+
+    code = []
+    indexed = arity > 0 and any(key is not None for key in keys)
+    if indexed:
+        code.append([SWITCH_ON_TERM])
+
+    labels = []
+    previous = None
+    for i, block in enumerate(blocks):
+        if i == 0:
+            instruction = [TRY_ME_ELSE, None, arity]
+        elif i == len(blocks) - 1:
+            instruction = [TRUST_ME]
+        else:
+            instruction = [RETRY_ME_ELSE, None]
+        start = len(code)
+        code.append(instruction)
+        labels.append(len(code))
+        code.extend(block)
+        if previous is not None:
+            code[previous][1] = start
+        previous = start
+    code = [tuple(instruction) for instruction in code]
+
+    if indexed:
+        table = {}
+        for key in keys:
+            if key is not None and key not in table:
+                table[key] = [
+                    label
+                    for label, other in zip(labels, keys)
+                    if other is None or other == key
+                ]
+        table[None] = [
+            label for label, other in zip(labels, keys) if other is None
+        ]
+        switch = {}
+        for key, matching in table.items():
+            if not matching:
+                switch[key] = len(code)
+                code.append((FAIL,))
+            elif len(matching) == 1:
+                switch[key] = matching[0]
+            else:
+                switch[key] = len(code)
+                code.extend(_chain(matching, arity))
+        default = switch.pop(None)
+        code[0] = (SWITCH_ON_TERM, 1, switch, default)
+    return code, registers
+
+
+def disassemble(code):
+    """Returns readable listing of instructions."""
+    lines = []
+    for i, instruction in enumerate(code):
+        args = ', '.join(map(repr, instruction[1:]))
+        lines.append(f'{i:4} {OPCODES[instruction[0]]} {args}'.rstrip())
+    return '\n'.join(lines)
+
+
+class ChoicePoint:
+    def __init__(self, args, env, cont, cut, code, pc, trail, heap):
+        self.args = args
+        self.env = env
+        self.cont = cont
+        self.cut = cut
+        self.code = code
+        self.pc = pc
+        self.trail = trail
+        self.heap = heap
+        self.solutions = None
+        self.variables = None
+
+
+class WamRuntime(Runtime):
+    """Runtime which runs clauses on Warren Abstract Machine.
+
+    Predicates are compiled on first call into flat instruction lists and
+    recompiled after asserta, assertz or retract change them.  Heap, trail
+    and registers are flat lists of (tag, value) cells.
+
+    Builtins, registered Python functions and tabled predicates are run
+    by the tree walking interpreter, with arguments decoded from the heap
+    and bindings copied back.  Queries which cannot be compiled are
+    answered by Runtime.
+    """
+
+    @property
+    def rules(self):
+        return Runtime.rules.fget(self)
+
+    @rules.setter
+    def rules(self, rules):
+        Runtime.rules.fset(self, rules)
+        self._procedures = {}
+
+    def insert_rule_left(self, entry):
+        super().insert_rule_left(entry)
+        self._changed(entry)
+
+    def insert_rule_right(self, entry):
+        super().insert_rule_right(entry)
+        self._changed(entry)
+
+    def load_facts(self, name, rows):
+        super().load_facts(name, rows)
+        for key in [key for key in self._procedures if key[0] == name]:
+            del self._procedures[key]
+
+    def remove_rule(self, rule):
+        super().remove_rule(rule)
+        self._changed(rule)
+
+    def _retract(self, term, trail):
+        if super()._retract(term, trail):
+            self._changed(term)
+            return True
+        return False
+
+    def _changed(self, entry):
+        head = entry.head if isinstance(entry, Rule) else entry
+        self._procedures.pop(predicate_key(head), None)
+
+    def procedure(self, key):
+        """Returns (code, registers) of predicate, FOREIGN or None."""
+        procedure = self._procedures.get(key)
+        if procedure is None:
+            procedure = self._procedures[key] = self._compile(key)
+        return procedure
+
+    def _register_external(self, table):
+        super()._register_external(table)
+        self._procedures.pop(table.key, None)
+
+    def _compile(self, key):
+        if key in self._external:
+            return FOREIGN
+        predicate = self._store.predicate(key)
+        if predicate is None:
+            return None
+        rules = list(predicate)
+        if self._tables.is_tabled(key):
+            return FOREIGN
+        try:
+            return compile_predicate(rules, key[1])
+        except CompileError:
+            return FOREIGN
+
+    def execute(self, query):
+        if isinstance(query, Arithmetic):
+            yield query.evaluate()
+            return
+
+        goal = result = query
+        if isinstance(query, Rule):
+            goal = query.body
+            result = query.head
+
+        names = _term_names(result, [])
+        compiler = ClauseCompiler(None, _body_goals(goal), names)
+        try:
+            code = compiler.compile()
+        except CompileError:
+            yield from super().execute(query)
+            return
+
+        machine = Machine(self, compiler.registers)
+        for env in machine.run(code):
+            yield result.rename(env).resolve()
+
+
+class Machine:
+    """State of one query run on WamRuntime."""
+
+    def __init__(self, runtime, registers):
+        self.runtime = runtime
+        self.heap = []
+        # Names of source variables of heap variables by their address.
+        self.names = {}
+        self.trail = []
+        self.x = [None] * registers
+        self.heap_barrier = 0
+
+    # Heap access.
+
+    def deref(self, cell):
+        heap = self.heap
+        while cell[0] == REF:
+            value = heap[cell[1]]
+            if value[0] == REF and value[1] == cell[1]:
+                return value
+            cell = value
+        return cell
+
+    def new_variable(self, name='_'):
+        cell = (REF, len(self.heap))
+        self.names[cell[1]] = name
+        self.heap.append(cell)
+        return cell
+
+    def bind(self, address, cell):
+        self.heap[address] = cell
+        if address < self.heap_barrier:
+            self.trail.append(address)
+
+    def unify(self, a, b):
+        heap = self.heap
+        deref = self.deref
+        stack = [a, b]
+        while stack:
+            a = deref(stack.pop())
+            b = deref(stack.pop())
+            if a == b:
+                continue
+            # Variable of the clause is bound to the goal's term, as the
+            # tree walking engines do, so the same variables survive.
+            if b[0] == REF:
+                self.bind(b[1], a)
+            elif a[0] == REF:
+                self.bind(a[1], b)
+            elif a[0] == STR and b[0] == STR:
+                functor = heap[a[1]]
+                if functor != heap[b[1]]:
+                    return False
+                for i in range(1, functor[1][1] + 1):
+                    stack.append(heap[a[1] + i])
+                    stack.append(heap[b[1] + i])
+            else:
+                return False
+        return True
+
+    def undo(self, mark):
+        heap = self.heap
+        trail = self.trail
+        while len(trail) > mark:
+            address = trail.pop()
+            heap[address] = (REF, address)
+
+    # Conversion between heap cells and terms.
+
+    def decode(self, cell, variables):
+        """Returns term for cell, mapping heap variables to Variables."""
+        heap = self.heap
+        cell = self.deref(cell)
+        tag, value = cell
+        if tag == REF:
+            variable = variables.get(value)
+            if variable is None:
+                variable = variables[value] = Variable(self.names[value])
+            return variable
+        if tag == CON:
+            if value is _nil:
+                return Dot.from_list([])
+            if isinstance(value, str):
+                return Term(value)
+            return Number(value)
+
+        functor = heap[value]
+        if functor[1] == LIST:
+            items = []
+            while True:
+                items.append(self.decode(heap[value + 1], variables))
+                tail = self.deref(heap[value + 2])
+                if tail[0] != STR or heap[tail[1]][1] != LIST:
+                    break
+                value = tail[1]
+            if tail[0] == CON and tail[1] is _nil:
+                return Dot.from_list(items)
+            return _make_list(items, self.decode(tail, variables))
+
+        name, arity = functor[1]
+        return Term(
+            name,
+            *[
+                self.decode(heap[value + i], variables)
+                for i in range(1, arity + 1)
+            ],
+        )
+
+    def encode(self, term, variables):
+        """Builds term on heap and returns its cell.
+
+        variables maps Variables to heap cells and is extended with cells
+        of variables seen for the first time.
+        """
+        heap = self.heap
+        term = deref_term(term)
+        if isinstance(term, Variable):
+            cell = variables.get(term)
+            if cell is None:
+                cell = variables[term] = self.new_variable(term.name)
+            return cell
+        if isinstance(term, (Dot, Bar)):
+            items, tail = _list_parts(term)
+            cell = (
+                (CON, _nil) if tail is None else self.encode(tail, variables)
+            )
+            for item in reversed(items):
+                head = self.encode(item, variables)
+                address = len(heap)
+                heap.append((FUN, LIST))
+                heap.append(head)
+                heap.append(cell)
+                cell = (STR, address)
+            return cell
+        if isinstance(term, Term):
+            if not term.args:
+                try:
+                    return CON, _constant(term)
+                except CompileError:
+                    raise InterpreterError(f'Cannot store term: {term}')
+            args = [self.encode(arg, variables) for arg in term.args]
+            address = len(heap)
+            heap.append((FUN, (term.pred, len(args))))
+            heap.extend(args)
+            return STR, address
+        raise InterpreterError(f'Cannot store term: {term}')
+
+    def number(self, register, env):
+        cell = self.deref(self._register(env, register))
+        if cell[0] != CON or type(cell[1]) not in (int, float):
+            raise InterpreterError(
+                f'Expected number but got {self.decode(cell, {})}'
+            )
+        return cell[1]
+
+    def copy_bindings(self, variables):
+        """Unifies heap variables with values their Variables were bound to."""
+        cells = {
+            variable: (REF, address) for address, variable in variables.items()
+        }
+        for address, variable in list(variables.items()):
+            if variable.ref is not None:
+                value = self.encode(variable.resolve(), cells)
+                if not self.unify((REF, address), value):
+                    return False
+        return True
+
+    # Execution.
+
+    def _register(self, env, register):
+        if register >= 0:
+            return self.x[register]
+        return env[2 - register]
+
+    def _foreign(self, goal, choicepoints, env, cont, cut):
+        """Starts tree walking resolution of goal.
+
+        Choicepoint which resumes it is pushed, returns continuation on
+        success or None on failure.
+        """
+        cp = ChoicePoint(
+            None, env, cont, cut, None, 0, len(self.trail), len(self.heap)
+        )
+        cp.variables = {}
+        goal = Term(
+            goal[0],
+            *[self.decode(self.x[i], cp.variables) for i in range(goal[1])],
+        )
+        cp.solutions = self.runtime.evaluate_rules(goal, Trail())
+        choicepoints.append(cp)
+        self.heap_barrier = cp.heap
+        return self._resume(cp, choicepoints)
+
+    def _resume(self, cp, choicepoints):
+        for _ in cp.solutions:
+            if self.copy_bindings(cp.variables):
+                return cp.cont
+            self.undo(cp.trail)
+            del self.heap[cp.heap:]
+        choicepoints.pop()
+        return None
+
+    def _builtin(self, goal, names, env):
+        variables = {}
+        frame = Frame()
+        for name, register in names:
+            frame.env[name] = self.decode(
+                self._register(env, register), variables
+            )
+        solutions = _goal_solver(goal)(self.runtime, goal, frame, Trail())
+        for _ in solutions:
+            result = self.copy_bindings(variables)
+            solutions.close()
+            return result
+        return False
+
+    def run(self, code):
+        """Runs query code and yields bindings of query variables."""
+        runtime = self.runtime
+        heap = self.heap
+        names = self.names
+        trail = self.trail
+        x = self.x
+        deref = self.deref
+        bind = self.bind
+        unify = self.unify
+        procedure = runtime.procedure
+
+        choicepoints = []
+        env = None
+        cont = None
+        cut = 0
+        mode_read = False
+        s = 0
+        pc = 0
+        failed = False
+
+        while True:
+            if failed:
+                failed = False
+                if not choicepoints:
+                    return
+                cp = choicepoints[-1]
+                self.undo(cp.trail)
+                del heap[cp.heap:]
+                self.heap_barrier = cp.heap
+                env = cp.env
+                cont = cp.cont
+                cut = cp.cut
+                if cp.solutions is not None:
+                    resumed = self._resume(cp, choicepoints)
+                    if resumed is None:
+                        failed = True
+                    else:
+                        code, pc = resumed
+                    continue
+                x[: len(cp.args)] = cp.args
+                code = cp.code
+                pc = cp.pc
+
+            instruction = code[pc]
+            op = instruction[0]
+            pc += 1
+
+            if op == GET_VARIABLE:
+                register = instruction[1]
+                if register >= 0:
+                    x[register] = x[instruction[2]]
+                else:
+                    env[2 - register] = x[instruction[2]]
+            elif op == GET_VALUE:
+                register = instruction[1]
+                value = x[register] if register >= 0 else env[2 - register]
+                failed = not unify(value, x[instruction[2]])
+            elif op == GET_CONSTANT:
+                cell = deref(x[instruction[2]])
+                if cell[0] == REF:
+                    bind(cell[1], (CON, instruction[1]))
+                else:
+                    failed = cell[0] != CON or cell[1] != instruction[1]
+            elif op == GET_STRUCTURE:
+                cell = deref(x[instruction[2]])
+                if cell[0] == REF:
+                    address = len(heap)
+                    heap.append((FUN, instruction[1]))
+                    bind(cell[1], (STR, address))
+                    mode_read = False
+                elif cell[0] == STR and heap[cell[1]][1] == instruction[1]:
+                    s = cell[1] + 1
+                    mode_read = True
+                else:
+                    failed = True
+            elif op == UNIFY_VARIABLE:
+                if mode_read:
+                    cell = heap[s]
+                    s += 1
+                else:
+                    cell = (REF, len(heap))
+                    names[cell[1]] = instruction[2]
+                    heap.append(cell)
+                register = instruction[1]
+                if register >= 0:
+                    x[register] = cell
+                else:
+                    env[2 - register] = cell
+            elif op == UNIFY_VALUE:
+                register = instruction[1]
+                value = x[register] if register >= 0 else env[2 - register]
+                if mode_read:
+                    failed = not unify(value, heap[s])
+                    s += 1
+                else:
+                    heap.append(value)
+            elif op == UNIFY_CONSTANT:
+                if mode_read:
+                    cell = deref(heap[s])
+                    s += 1
+                    if cell[0] == REF:
+                        bind(cell[1], (CON, instruction[1]))
+                    else:
+                        failed = cell[0] != CON or cell[1] != instruction[1]
+                else:
+                    heap.append((CON, instruction[1]))
+            elif op == UNIFY_VOID:
+                if mode_read:
+                    s += 1
+                else:
+                    names[len(heap)] = '_'
+                    heap.append((REF, len(heap)))
+            elif op == PUT_VARIABLE:
+                cell = (REF, len(heap))
+                names[cell[1]] = instruction[3]
+                heap.append(cell)
+                register = instruction[1]
+                if register >= 0:
+                    x[register] = cell
+                else:
+                    env[2 - register] = cell
+                if instruction[2] is not None:
+                    x[instruction[2]] = cell
+            elif op == PUT_VALUE:
+                register = instruction[1]
+                x[instruction[2]] = (
+                    x[register] if register >= 0 else env[2 - register]
+                )
+            elif op == PUT_CONSTANT:
+                x[instruction[2]] = (CON, instruction[1])
+            elif op == PUT_STRUCTURE:
+                address = len(heap)
+                heap.append((FUN, instruction[1]))
+                x[instruction[2]] = (STR, address)
+                mode_read = False
+            elif op == PUT_VOID:
+                cell = (REF, len(heap))
+                names[cell[1]] = '_'
+                heap.append(cell)
+                x[instruction[1]] = cell
+            elif op == ALLOCATE:
+                env = [env, cont, cut] + [None] * instruction[1]
+            elif op == DEALLOCATE:
+                cont = env[1]
+                env = env[0]
+            elif op == CALL or op == EXECUTE or op == CALL_VARIABLE:
+                if op == CALL_VARIABLE:
+                    cell = deref(x[instruction[1]])
+                    if cell[0] == CON and isinstance(cell[1], str):
+                        key = (cell[1], 0)
+                    elif cell[0] == STR:
+                        key = heap[cell[1]][1]
+                        for i in range(key[1]):
+                            x[i] = heap[cell[1] + 1 + i]
+                    else:
+                        raise InterpreterError(
+                            'Arguments are not sufficiently instantiated: '
+                            f'{self.decode(cell, {})}'
+                        )
+                    if not instruction[2]:
+                        cont = (code, pc)
+                else:
+                    key = instruction[1]
+                    if op == CALL:
+                        cont = (code, pc)
+                cut = len(choicepoints)
+                target = procedure(key)
+                if target is None:
+                    failed = True
+                elif target is FOREIGN:
+                    resumed = self._foreign(
+                        key, choicepoints, env, cont, cut
+                    )
+                    if resumed is None:
+                        failed = True
+                    else:
+                        code, pc = resumed
+                else:
+                    code, registers = target
+                    pc = 0
+                    if registers > len(x):
+                        x.extend([None] * (registers - len(x)))
+            elif op == PROCEED:
+                code, pc = cont
+            elif op == TRY_ME_ELSE:
+                arity = instruction[2]
+                choicepoints.append(
+                    ChoicePoint(
+                        x[:arity],
+                        env,
+                        cont,
+                        cut,
+                        code,
+                        instruction[1],
+                        len(trail),
+                        len(heap),
+                    )
+                )
+                self.heap_barrier = len(heap)
+            elif op == SWITCH_ON_TERM:
+                cell = deref(x[0])
+                if cell[0] == CON:
+                    pc = instruction[2].get(cell[1], instruction[3])
+                elif cell[0] == STR:
+                    pc = instruction[2].get(heap[cell[1]][1], instruction[3])
+                else:
+                    pc = instruction[1]
+            elif op == TRY:
+                arity = instruction[2]
+                choicepoints.append(
+                    ChoicePoint(
+                        x[:arity],
+                        env,
+                        cont,
+                        cut,
+                        code,
+                        pc,
+                        len(trail),
+                        len(heap),
+                    )
+                )
+                self.heap_barrier = len(heap)
+                pc = instruction[1]
+            elif op == RETRY:
+                choicepoints[-1].pc = pc
+                pc = instruction[1]
+            elif op == TRUST:
+                choicepoints.pop()
+                self.heap_barrier = (
+                    choicepoints[-1].heap if choicepoints else 0
+                )
+                pc = instruction[1]
+            elif op == RETRY_ME_ELSE:
+                choicepoints[-1].pc = instruction[1]
+            elif op == TRUST_ME:
+                choicepoints.pop()
+                self.heap_barrier = (
+                    choicepoints[-1].heap if choicepoints else 0
+                )
+            elif op == NECK_CUT or op == CUT:
+                barrier = cut if op == NECK_CUT else env[2]
+                if len(choicepoints) > barrier:
+                    del choicepoints[barrier:]
+                    self.heap_barrier = (
+                        choicepoints[-1].heap if choicepoints else 0
+                    )
+            elif op == BUILTIN:
+                failed = not self._builtin(
+                    instruction[1], instruction[2], env
+                )
+            elif op == IS:
+                value = (CON, instruction[2](self, env))
+                register = instruction[1]
+                failed = not unify(
+                    x[register] if register >= 0 else env[2 - register], value
+                )
+            elif op == COMPARE:
+                failed = not instruction[1](self, env)
+            elif op == FAIL:
+                failed = True
+            elif op == SUCCEED:
+                variables = {}
+                yield {
+                    name: self.decode(self._register(env, register), variables)
+                    for name, register in instruction[1]
+                }
+                failed = True
@@ -9,6 +9,7 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=required,
+    extras_require={'numeric': ['numpy']},
     entry_points={},
     author='Rob Sliwa',
     author_email='robjsliwa@example.com',
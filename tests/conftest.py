@@ -0,0 +1,15 @@
+import pytest
+from prolog.interpreter import Runtime, IterativeRuntime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from prolog.wam import WamRuntime
+
+
+def query(runtime, text):
+    goal = Parser(Scanner(text).tokenize()).parse_query()
+    return [str(item) for item in runtime.execute(goal)]
+
+
+@pytest.fixture(params=[Runtime, IterativeRuntime, WamRuntime])
+def runtime_class(request):
+    return request.param
@@ -0,0 +1,170 @@
+from prolog.clause_store import ClauseStore
+from prolog.interpreter import Runtime, Rule
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from prolog.types import Number, Term, TRUE
+from tests.conftest import query
+
+
+def test_first_argument_index_selects_matching_clauses():
+    source = '''
+    location(desk, office).
+    location(apple, kitchen).
+    location(X, hall).
+    location(flashlight, desk).
+    location(desk, cellar).
+    '''
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    store = ClauseStore(rules)
+
+    goal = Parser(Scanner('location(desk, Y).').tokenize()).parse_terms()
+
+    candidates = [str(rule.head) for rule in store.candidates(goal)]
+    assert candidates == [
+        'location(desk, office)',
+        'location(X, hall)',
+        'location(desk, cellar)',
+    ]
+
+
+def test_clause_order_is_kept_by_asserts():
+    source = '''
+    room(kitchen).
+    door(kitchen, office).
+    room(office).
+    '''
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = Runtime(rules)
+
+    runtime.insert_rule_left(Rule(Term('room', Term('hall')), TRUE()))
+    runtime.insert_rule_right(Rule(Term('room', Term('cellar')), TRUE()))
+    runtime.insert_rule_left(Rule(Term('room', Term('office')), TRUE()))
+
+    goal = Parser(Scanner('room(X).').tokenize()).parse_terms()
+
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'room(office)',
+        'room(hall)',
+        'room(kitchen)',
+        'room(office)',
+        'room(cellar)',
+    ]
+
+    goal = Parser(Scanner('room(office).').tokenize()).parse_terms()
+
+    assert len(list(runtime.execute(goal))) == 2
+
+
+def test_indexed_lookup_in_large_database():
+    source = ''.join(
+        f'location(item{i}, room{i % 100}).\n' for i in range(10000)
+    )
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = Runtime(rules)
+
+    goal = Parser(
+        Scanner('location(item4242, X).').tokenize()
+    ).parse_terms()
+
+    x = goal.args[1]
+
+    results = list(runtime.execute(goal))
+    assert len(results) == 1
+    assert str(goal.match(results[0]).get(x)) == 'room42'
+
+
+def test_jit_index_on_second_argument():
+    source = ''.join(
+        f'door(room{i}, room{i + 1}).\n' for i in range(100)
+    )
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = Runtime(rules)
+
+    goal = Parser(Scanner('door(R, room42).').tokenize()).parse_terms()
+    r = goal.args[0]
+
+    results = list(runtime.execute(goal))
+    assert len(results) == 1
+    assert str(goal.match(results[0]).get(r)) == 'room41'
+
+    stats = runtime.index_statistics()['door/2']
+    assert stats['indexes'] == [0, 1]
+    assert stats['index_builds'] == 1
+    assert stats['index_hits'] == 1
+
+    goal = Parser(Scanner('door(R, room7).').tokenize()).parse_terms()
+    assert len(list(runtime.execute(goal))) == 1
+
+    stats = runtime.index_statistics()['door/2']
+    assert stats['index_builds'] == 1
+    assert stats['index_hits'] == 2
+
+
+def test_jit_index_is_invalidated_by_assert():
+    source = ''.join(
+        f'door(room{i}, room{i + 1}).\n' for i in range(100)
+    )
+    source += 'add :- assertz(door(cellar, room42)).\n'
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = Runtime(rules)
+
+    goal_text = 'door(R, room42).'
+    goal = Parser(Scanner(goal_text).tokenize()).parse_terms()
+    assert len(list(runtime.execute(goal))) == 1
+
+    add = Parser(Scanner('add.').tokenize()).parse_query()
+    assert list(runtime.execute(add))
+    assert runtime.index_statistics()['door/2']['indexes'] == [0]
+
+    goal = Parser(Scanner(goal_text).tokenize()).parse_terms()
+    r = goal.args[0]
+    assert [
+        str(goal.match(item).get(r)) for item in runtime.execute(goal)
+    ] == ['room41', 'cellar']
+    assert runtime.index_statistics()['door/2']['index_builds'] == 2
+
+
+def test_jit_index_skips_unselective_argument():
+    source = ''.join(f'colour(item{i}, red).\n' for i in range(20))
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = Runtime(rules)
+
+    goal = Parser(Scanner('colour(X, red).').tokenize()).parse_terms()
+    assert len(list(runtime.execute(goal))) == 20
+
+    stats = runtime.index_statistics()['colour/2']
+    assert stats['indexes'] == [0]
+    assert stats['index_builds'] == 1
+    assert stats['index_hits'] == 0
+
+
+def test_load_facts_appends_in_order(runtime_class):
+    source = '''
+    item(first, 0).
+    cheap(I) :- item(I, P), P < 3.
+    '''
+
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = runtime_class(rules)
+
+    assert query(runtime, 'cheap(I).') == ['cheap(first)']
+
+    runtime.load_facts('item', ((f'i{i}', i) for i in range(1, 1000)))
+    runtime.load_facts('pair', [(Term('p', Term('a')), 2.5), (1, 'b c')])
+    last = Term('item', Term('last'), Number(1))
+    runtime.insert_rule_right(Rule(last, TRUE()))
+
+    assert query(runtime, 'cheap(I).') == [
+        'cheap(first)', 'cheap(i1)', 'cheap(i2)', 'cheap(last)'
+    ]
+    assert query(runtime, 'item(i424, P).') == ['item(i424, 424)']
+    assert query(runtime, 'pair(X, Y).') == [
+        'pair(p(a), 2.5)', 'pair(1, b c)'
+    ]
+    assert runtime.index_statistics()['item/2']['clauses'] == 1001
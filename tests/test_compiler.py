@@ -0,0 +1,145 @@
+import pytest
+from prolog.compiler import compile_head, compile_copy
+from prolog.errors import InterpreterError
+from prolog.interpreter import Runtime, compile_goal, Frame
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from prolog.trail import Trail
+from prolog.types import Term, Number, Variable, FALSE
+from prolog.types import ExpressionCompiler
+
+
+def parse_rule(text):
+    return Parser(Scanner(text).tokenize()).parse_rules()[0]
+
+
+def parse_goal(text):
+    return Parser(Scanner(text).tokenize()).parse_terms()
+
+
+def unify_head(rule_text, goal_text):
+    rule = parse_rule(rule_text)
+    goal = parse_goal(goal_text)
+    trail = Trail()
+    env = {}
+    if not compile_head(rule.head)(goal, env, trail):
+        return None
+    return str(goal.resolve()), str(rule.head.rename(env).resolve())
+
+
+def test_compiled_head_unification():
+    assert unify_head('p(a, X, X).', 'p(A, b, B).') == (
+        'p(a, b, b)',
+        'p(a, b, b)',
+    )
+    assert unify_head('p(a, X, X).', 'p(a, b, c).') is None
+    assert unify_head('p(f(X, Y), Y).', 'p(Z, c).') == (
+        'p(f(X, c), c)',
+        'p(f(X, c), c)',
+    )
+    assert unify_head('p(f(X), X).', 'p(f(g(a)), g(B)).') == (
+        'p(f(g(a)), g(a))',
+        'p(f(g(a)), g(a))',
+    )
+    assert unify_head('p(_, _).', 'p(a, b).') == ('p(a, b)', 'p(_, _)')
+    assert unify_head('p(f(a)).', 'p(g(a)).') is None
+
+
+def test_compiled_list_patterns():
+    assert unify_head('p([H | T], H, T).', 'p([a, b], X, Y).') == (
+        'p([a, b], a, [b])',
+        'p([a, b], a, [b])',
+    )
+    assert unify_head('p([a, b | T]).', 'p([a | X]).') == (
+        'p([a, b | T])',
+        'p([a, b | T])',
+    )
+    assert unify_head('p([]).', 'p([a]).') is None
+    assert unify_head('p([X]).', 'p(L).') == ('p([X])', 'p([X])')
+    assert unify_head('p([a, b]).', 'p([a, b, c]).') is None
+
+
+def test_uncompiled_heads_fall_back_to_unification():
+    class Pair(Term):
+        __slots__ = ()
+
+    head = Pair('pair', Term('a'), Term('b'))
+    goal = parse_goal('pair(X, Y).')
+
+    assert compile_head(head)(goal, {}, Trail())
+    assert str(goal.resolve()) == 'pair(a, b)'
+
+
+def test_compiled_body_dispatch():
+    runtime = Runtime(
+        Parser(Scanner('data(one). data(two).').tokenize()).parse_rules()
+    )
+    rule = parse_rule('r(X) :- data(X), write(X), nl, !, fail.')
+    frame = Frame()
+    solve = compile_goal(rule.body)
+
+    assert list(solve(runtime, frame, Trail())) == []
+    assert frame.cut
+    assert runtime.stream_read() == 'one\n'
+
+
+def test_compiled_copy_renames_apart():
+    term = parse_goal('p(X, f(a, [b, c]), [X | T], _, _).')
+    copy = compile_copy(term)
+
+    first, second = {}, {}
+    one, two = copy(first), copy(second)
+    assert str(one) == 'p(X, f(a, [b, c]), [X | T], _, _)'
+    assert one.args[1] is term.args[1] and two.args[1] is term.args[1]
+    assert one.args[0] is first['X'] and one.args[0] is not two.args[0]
+    assert one.args[0] is not term.args[0]
+    assert one.args[3] is not one.args[4]
+
+    runtime = Runtime(
+        Parser(
+            Scanner(
+                'len([], 0).\n'
+                'len([_ | T], N) :- len(T, M), N is M + 1.'
+            ).tokenize()
+        ).parse_rules()
+    )
+    goal = Parser(Scanner('len([a, b, c], N).').tokenize()).parse_query()
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'len([a, b, c], 3)'
+    ]
+
+
+def test_compiled_arithmetic():
+    rule = parse_rule('p(X, Y) :- Y is X * (2 + 4) / 3, Y >= 4.')
+    arithmetic, logic = rule.body.args
+    env = {'X': Number(3.0)}
+    assert str(arithmetic.evaluate(env)) == '6.0'
+    assert logic.holds({'Y': Number(6.0)})
+    assert not logic.holds({'Y': Number(2.0)})
+    assert str(logic.evaluate({'Y': Number(2.0)})) == str(FALSE())
+
+    value, function = parse_goal('X is 2 * (3 + 4).')._expression.accept(
+        ExpressionCompiler()
+    )
+    assert (value, function) == (14.0, None)
+
+    with pytest.raises(InterpreterError):
+        arithmetic.evaluate({})
+
+
+def test_substituted_expressions_share_compiled_code():
+    rule = parse_rule('p(X, Y) :- Y is X * 2, Y >= X.')
+    arithmetic, logic = rule.body.args
+    x, y = rule.head.args
+    bindings = {Variable(f'V{i}'): Number(float(i)) for i in range(1000)}
+    bindings[x] = Number(3.0)
+    bindings[Variable('Y')] = Number(5.0)
+
+    bound = logic.substitute(bindings)
+    assert str(bound) == '5.0 >= 3.0'
+    assert bound.holds()
+    assert bound._compiled is logic._compiled
+
+    bound = arithmetic.substitute(bindings)
+    assert str(bound.evaluate()) == '6.0'
+    assert arithmetic._expression is bound._expression
@@ -0,0 +1,89 @@
+from prolog import csvtable
+from prolog.interpreter import Runtime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from tests.conftest import query
+
+
+source = '''
+senior(N) :- employee(_, N, D, S), 5000 < S.
+colleague(A, B) :- employee(_, A, D, _), employee(_, B, D, _).
+staff(D, C) :- aggregate_all(count, employee(_, _, D, _), C).
+'''
+
+rows = '''id,name,department,salary
+1,alice,sales,5200
+2,bob,"research, new",4100
+3,"Carol
+Smith",sales,6000.5
+4,dave,research,3900
+'''
+
+
+def test_csv_predicate(tmp_path, runtime_class):
+    path = tmp_path / 'employees.csv'
+    path.write_text(rows)
+    runtime = runtime_class(Parser(Scanner(source).tokenize()).parse_rules())
+    runtime.register_csv('employee', 4, path, header=True)
+
+    assert query(runtime, 'employee(2, N, D, S).') == [
+        'employee(2, bob, research, new, 4100)'
+    ]
+    assert query(runtime, 'senior(N).') == [
+        'senior(alice)', 'senior(Carol\nSmith)'
+    ]
+    assert query(runtime, 'colleague(alice, B).') == [
+        'colleague(alice, alice)',
+        'colleague(alice, Carol\nSmith)',
+    ]
+    assert query(runtime, 'staff(sales, C).') == ['staff(sales, 2)']
+    assert query(runtime, 'employee(I, N, D, 6000.5).') == [
+        'employee(3, Carol\nSmith, sales, 6000.5)'
+    ]
+    assert query(runtime, 'employee(I, N, D, f(S)).') == []
+
+
+def test_csv_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(csvtable, 'INDEX_RUN_SIZE', 64)
+    path = tmp_path / 'items.tsv'
+    path.write_text(''.join(f'i{i}\t{i % 7}\t{i}.0\n' for i in range(500)))
+    runtime = Runtime([])
+    runtime.register_csv('item', 3, path, index=[1, 2])
+    assert not (tmp_path / 'items.tsv.index').exists()
+
+    plain = Runtime([])
+    plain.register_csv('item', 3, path)
+    for text in ['item(N, 3, V).', 'item(N, 3, 10).', 'item(i8, K, V).']:
+        assert query(runtime, text) == query(plain, text)
+    assert len(query(runtime, 'item(N, 3, V).')) == 71
+    assert query(runtime, 'item(N, K, 10).') == ['item(i10, 3, 10)']
+    assert (tmp_path / 'items.tsv.index').exists()
+
+    with path.open('a') as writer:
+        writer.write('i500\t3\t500.0\n')
+    assert len(query(runtime, 'item(N, 3, V).')) == 72
+    assert query(runtime, 'item(N, 3, 500).') == ['item(i500, 3, 500)']
+
+
+def test_csv_index_header(tmp_path):
+    path = tmp_path / 'emp.csv'
+    path.write_text('id,name,dept,note\n1,alice,sales\n2,bob,research\n')
+    runtime = Runtime([])
+    runtime.register_csv('emp', 3, path, header=True, index=[1])
+    assert query(runtime, 'emp(X, Y, Z).') == [
+        'emp(1, alice, sales)', 'emp(2, bob, research)'
+    ]
+    assert query(runtime, 'emp(X, bob, Z).') == ['emp(2, bob, research)']
+
+
+def test_csv_index_not_writable(tmp_path, monkeypatch):
+    def mkstemp(*args, **kwargs):
+        raise PermissionError('read-only')
+
+    monkeypatch.setattr(csvtable.tempfile, 'mkstemp', mkstemp)
+    path = tmp_path / 'items.csv'
+    path.write_text('a,1\nb,2\nc,1\n')
+    runtime = Runtime([])
+    runtime.register_csv('item', 2, path, index=[1])
+    assert query(runtime, 'item(N, 1).') == ['item(a, 1)', 'item(c, 1)']
+    assert not (tmp_path / 'items.csv.index').exists()
@@ -1,7 +1,10 @@
+import pytest
+from prolog.errors import InterpreterError
 from prolog.interpreter import Runtime, Rule
 from prolog.types import Variable, Term, FALSE, TRUE, CUT
 from prolog.parser import Parser
 from prolog.scanner import Scanner
+from prolog.wam import WamRuntime
 import cProfile
 import functools
 import pstats
@@ -398,9 +401,9 @@ def test_support_for_numbers():
 
     x = goal.args[1]
 
-    expected_results = ['window(main, 2.0, 2.0, 20.0, 72.0)']
+    expected_results = ['window(main, 2, 2, 20, 72)']
 
-    expected_bindings = ['2.0']
+    expected_bindings = ['2']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(item) == expected_results[index]
@@ -456,12 +459,88 @@ def test_simple_arithmetics():
 
     x = goal.args[0]
 
-    expected_bindings = ['10.0']
+    expected_bindings = ['10']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(goal.match(item).get(x)) == expected_bindings[index]
 
 
+def test_integer_arithmetics():
+    input = '''
+    fact(0, 1) :- !.
+    fact(N, F) :- N1 is N - 1, fact(N1, F1), F is N * F1.
+    calc(A, B, C, D, E, F) :- A is 17 // 4, B is -7 mod 2, C is -7 rem 2,
+        D is max(3, abs(-20)), E is 1 << 70 >> 68, F is 7 / 2.
+    '''
+
+    rules = Parser(
+        Scanner(input).tokenize()
+    ).parse_rules()
+
+    runtime = Runtime(rules)
+
+    goal = Parser(
+        Scanner('fact(30, F).').tokenize()
+    ).parse_query()
+
+    expected_results = ['fact(30, 265252859812191058636308480000000)']
+
+    assert [str(item) for item in runtime.execute(goal)] == expected_results
+
+    goal = Parser(
+        Scanner('calc(A, B, C, D, E, F).').tokenize()
+    ).parse_query()
+
+    expected_results = ['calc(4, 1, -1, 20, 4, 3.5)']
+
+    assert [str(item) for item in runtime.execute(goal)] == expected_results
+
+
+@pytest.mark.parametrize('runtime_class', [Runtime, WamRuntime])
+@pytest.mark.parametrize('operator', ['/', '//', 'mod', 'rem'])
+def test_division_by_zero(runtime_class, operator):
+    input = f'''
+    constant(X) :- X is 5 {operator} 0.
+    divide(X, Y, Z) :- Z is X {operator} Y.
+    '''
+
+    runtime = runtime_class(Parser(Scanner(input).tokenize()).parse_rules())
+
+    for text in ['constant(X).', 'divide(5, 0, Z).', f'X is 5 {operator} 0.']:
+        goal = Parser(Scanner(text).tokenize()).parse_query()
+        with pytest.raises(InterpreterError, match='Evaluation error'):
+            list(runtime.execute(goal))
+
+
+@pytest.mark.parametrize('runtime_class', [Runtime, WamRuntime])
+@pytest.mark.parametrize(
+    'left, operator, right',
+    [
+        ('1', '<<', '-1'),
+        ('4', '>>', '-2'),
+        ('1' + '0' * 400, '/', '3'),
+        ('1' + '0' * 400, '+', '0.5'),
+        ('1' + '0' * 400, '*', '0.5'),
+    ],
+)
+def test_evaluation_errors(runtime_class, left, operator, right):
+    input = f'''
+    constant(X) :- X is {left} {operator} {right}.
+    apply(X, Y, Z) :- Z is X {operator} Y.
+    '''
+
+    runtime = runtime_class(Parser(Scanner(input).tokenize()).parse_rules())
+
+    for text in [
+        'constant(X).',
+        f'apply({left}, {right}, Z).',
+        f'X is {left} {operator} {right}.',
+    ]:
+        goal = Parser(Scanner(text).tokenize()).parse_query()
+        with pytest.raises(InterpreterError, match='Evaluation error'):
+            list(runtime.execute(goal))
+
+
 def test_arithmetics_with_grouping():
     input = '''
     test(Z) :- Z is (5 + 2) * (3 - 1).
@@ -481,7 +560,7 @@ def test_arithmetics_with_grouping():
 
     x = goal.args[0]
 
-    expected_bindings = ['14.0']
+    expected_bindings = ['14']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(goal.match(item).get(x)) == expected_bindings[index]
@@ -506,7 +585,7 @@ def test_arithmetics_with_variables():
 
     x = goal.args[1]
 
-    expected_bindings = ['212.0']
+    expected_bindings = ['212']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(goal.match(item).get(x)) == expected_bindings[index]
@@ -519,7 +598,7 @@ def test_arithmetics_with_variables():
 
     x = goal.args[1]
 
-    expected_bindings = ['32.0']
+    expected_bindings = ['32']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(goal.match(item).get(x)) == expected_bindings[index]
@@ -544,7 +623,7 @@ def test_arithmetics_with_variables_same_as_rule():
 
     x = goal.args[1]
 
-    expected_bindings = ['212.0']
+    expected_bindings = ['212']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(goal.match(item).get(x)) == expected_bindings[index]
@@ -557,7 +636,7 @@ def test_arithmetics_with_variables_same_as_rule():
 
     x = goal.args[1]
 
-    expected_bindings = ['32.0']
+    expected_bindings = ['32']
 
     for index, item in enumerate(runtime.execute(goal)):
         assert str(goal.match(item).get(x)) == expected_bindings[index]
@@ -0,0 +1,110 @@
+import sys
+import pytest
+
+from prolog.interpreter import Runtime, IterativeRuntime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+
+
+source = '''
+location(desk, office).
+location(apple, kitchen).
+location(flashlight, desk).
+location(broccoli, kitchen).
+location(computer, office).
+
+door(office, hall).
+door(kitchen, office).
+door(kitchen, cellar).
+
+data(one).
+data(two).
+data(three).
+
+cut_test_a(X) :- data(X).
+cut_test_a('last clause').
+
+cut_test_b(X) :- data(X), !.
+cut_test_b('last clause').
+
+cut_test_c(X, Y) :- data(X), !, data(Y).
+cut_test_c(none, none).
+
+append([], L, L).
+append([H | T], L, [H | R]) :- append(T, L, R).
+
+len([], 0).
+len([_ | T], N) :- len(T, M), N is M + 1.
+
+c_to_f(C, F) :- F is C * 9 / 5 + 32.
+warm(X) :- location(X, kitchen), len([X, X], N), N > 1.
+
+here(kitchen).
+move(Place) :- retract(here(_)), asserta(here(Place)).
+
+foo(a, c).
+foo(z, b).
+'''
+
+queries = [
+    'location(X, office).',
+    'door(kitchen, R), location(T, R).',
+    'cut_test_a(X).',
+    'cut_test_b(X).',
+    'cut_test_c(X, Y).',
+    'append(X, Y, [a, b, c]).',
+    'append([a], [b], X), len(X, N).',
+    'c_to_f(100, F).',
+    'warm(X).',
+    'location(X, Y), write(X), nl, fail.',
+    'move(office), here(X).',
+    'retract(foo(X, b)).',
+]
+
+
+def solutions(runtime_class, query):
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = runtime_class(rules)
+    goal = Parser(Scanner(query).tokenize()).parse_query()
+    results = [str(item) for item in runtime.execute(goal)]
+    return results, runtime.stream_read()
+
+
+def test_same_solutions_as_runtime():
+    for query in queries:
+        expected = solutions(Runtime, query)
+        assert solutions(IterativeRuntime, query) == expected, query
+
+
+def test_deep_recursion_does_not_overflow():
+    items = ', '.join('a' for _ in range(20000))
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = IterativeRuntime(rules)
+
+    goal = Parser(Scanner(f'len([{items}], N).').tokenize()).parse_terms()
+    n = goal.args[1]
+
+    results = list(runtime.execute(goal))
+    assert len(results) == 1
+    assert str(goal.match(results[0]).get(n)) == '20000'
+
+
+def test_tail_recursive_loop_runs_in_constant_memory():
+    resource = pytest.importorskip('resource')
+    source = '''
+    count(N, N) :- !.
+    count(I, N) :- I1 is I + 1, count(I1, N).
+    '''
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = IterativeRuntime(rules)
+    goal = Parser(Scanner('count(0, 1000000).').tokenize()).parse_query()
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results = list(runtime.execute(goal))
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    assert [str(item) for item in results] == ['count(0, 1000000)']
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS; either way
+    # a frame kept per iteration would grow it by hundreds of megabytes.
+    scale = 1024 if sys.platform == 'darwin' else 1
+    assert after - before < 64 * 1024 * scale
@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+from prolog import loader
+from prolog.interpreter import Runtime
+from prolog.loader import cache_path, load_clauses, map_clauses
+from prolog.loader import split_clauses
+from prolog.parser import Parser
+from prolog.prolog import start
+from prolog.scanner import Scanner
+from prolog.tabling import Table
+from prolog.types import atom
+from tests.conftest import query
+
+
+source = '''
+:- table path/2.
+edge(a, b).
+edge(b, c).
+path(X, Y) :- path(X, Z), edge(Z, Y).
+path(X, Y) :- edge(X, Y).
+size(X, S) :- S is X * 2, S > 3, write([X, S | _]), nl.
+'''
+
+
+def test_clause_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, 'CACHE_BATCH_SIZE', 2)
+    path = tmp_path / 'graph.prolog'
+    path.write_text(source)
+    expected = [str(clause) for clause in load_clauses(path, cache=False)]
+    assert not (tmp_path / 'graph.plc').exists()
+
+    assert [str(clause) for clause in load_clauses(path)] == expected
+    assert cache_path(str(path)) == str(tmp_path / 'graph.plc')
+    assert (tmp_path / 'graph.plc').exists()
+
+    def fail(path):
+        raise AssertionError('source parsed again')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(loader, 'read_clauses', fail)
+        clauses = list(load_clauses(path))
+    assert [str(clause) for clause in clauses] == expected
+    assert isinstance(clauses[0], Table)
+    assert clauses[1].head.args[0] is atom('a')
+
+    runtime = Runtime([])
+    runtime.consult(clauses)
+    assert query(runtime, 'path(a, X).') == ['path(a, b)', 'path(a, c)']
+    assert query(runtime, 'size(2, S).') == ['size(2, 4)']
+    assert runtime.stream_read() == '[2, 4 | _]\n'
+
+
+def test_stale_clause_cache_is_rebuilt(tmp_path):
+    path = tmp_path / 'graph.prolog'
+    path.write_text(source)
+    list(load_clauses(path))
+
+    path.write_text('edge(c, d).')
+    assert [str(clause) for clause in load_clauses(path)] == [
+        str(clause) for clause in load_clauses(path, cache=False)
+    ]
+
+    (tmp_path / 'graph.plc').write_bytes(b'garbage')
+    assert len(list(load_clauses(path))) == 1
+    assert len(list(load_clauses(path))) == 1
+
+    # Cache cut short after a whole batch lacks its end and is rebuilt.
+    data = (tmp_path / 'graph.plc').read_bytes()
+    (tmp_path / 'graph.plc').write_bytes(data[: data.rindex(b'N.')])
+    assert len(list(load_clauses(path))) == 1
+    assert (tmp_path / 'graph.plc').read_bytes() == data
+
+
+def test_unfinished_cache_is_removed(tmp_path):
+    path = tmp_path / 'graph.prolog'
+    path.write_text(source)
+    clauses = load_clauses(path)
+    next(clauses)
+    clauses.close()
+    assert [item.name for item in tmp_path.iterdir()] == ['graph.prolog']
+
+
+def test_parallel_clauses_keep_source_order(tmp_path):
+    text = source + ''.join(
+        f"fact({i}, {i}.5, 'a. b', X) :- X is {i} * 2. % c. d.\n"
+        f"/* e. */ other({i}).\n"
+        for i in range(50)
+    )
+    path = tmp_path / 'facts.prolog'
+    path.write_text(text)
+
+    pieces = split_clauses(text, 8)
+    assert len(pieces) == 8
+    assert ''.join(piece for piece, _ in pieces) == text
+    for piece, line in pieces:
+        assert line == text.count('\n', 0, text.index(piece)) + 1
+        assert piece.endswith('.') or piece is pieces[-1][0]
+
+    expected = [str(clause) for clause in load_clauses(path, cache=False)]
+    clauses = list(load_clauses(path, cache=False, workers=2))
+    assert [str(clause) for clause in clauses] == expected
+    assert isinstance(clauses[0], Table)
+    assert clauses[1].head.args[0] is atom('a')
+
+
+def test_memory_mapped_clauses(tmp_path):
+    path = tmp_path / 'facts.prolog'
+    path.write_text(source + "name('crème', 'brûlée').\n", encoding='utf-8')
+    clauses = list(map_clauses(path))
+    assert [str(clause) for clause in clauses] == [
+        str(clause)
+        for clause in Parser(Scanner(path.read_text('utf-8')).scan()).rules()
+    ]
+    assert clauses[-1].head.args[1] is atom('brûlée')
+
+    clauses = map_clauses(path)
+    next(clauses)
+    clauses.close()
+
+    (tmp_path / 'empty.prolog').write_bytes(b'')
+    assert list(map_clauses(tmp_path / 'empty.prolog')) == []
+
+
+def test_start_reads_file_in_chunks(tmp_path, monkeypatch):
+    def unmappable(*args, **kwargs):
+        raise OSError('cannot map')
+
+    # Pipes and special files cannot be mapped, they are read in chunks.
+    monkeypatch.setattr(
+        loader, 'mmap', SimpleNamespace(mmap=unmappable, ACCESS_READ=None)
+    )
+    monkeypatch.setattr(loader, 'CHUNK_SIZE', 5)
+    path = tmp_path / 'graph.prolog'
+    path.write_text(source + "name('crème', 'brûlée').\n", encoding='utf-8')
+
+    runtime = start(path, cache=False)
+    expected = Runtime(
+        Parser(Scanner(path.read_text('utf-8')).tokenize()).parse_rules()
+    )
+    assert [str(rule) for rule in runtime.rules] == [
+        str(rule) for rule in expected.rules
+    ]
+    assert query(runtime, 'path(a, X).') == ['path(a, b)', 'path(a, c)']
+    assert query(runtime, 'name(X, Y).') == ['name(crème, brûlée)']
+    assert not (tmp_path / 'graph.plc').exists()
@@ -0,0 +1,79 @@
+import pytest
+from prolog.interpreter import Runtime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from tests.conftest import query
+
+numpy = pytest.importorskip('numpy')
+
+
+source = '''
+dear(I, P) :- price(I, P), P > 4.
+cheap(I) :- price(I, P), 6 >= P * 2.
+total(S) :- aggregate_all(sum(P), price(_, P), S).
+count_dear(N) :- aggregate_all(count, (price(_, P), P > 4), N).
+top(M) :- aggregate_all(max(P), (price(_, P), P < 7), M).
+'''
+
+
+def make_runtime(runtime_class=Runtime):
+    runtime = runtime_class(Parser(Scanner(source).tokenize()).parse_rules())
+    runtime.register_table(
+        'price',
+        [
+            numpy.array(['apple', 'pear', 'plum', 'fig']),
+            numpy.array([3, 5, 7, 2]),
+        ],
+    )
+    return runtime
+
+
+def test_numeric_table_facts(runtime_class):
+    runtime = make_runtime(runtime_class)
+    assert query(runtime, 'price(pear, P).') == ['price(pear, 5)']
+    assert query(runtime, 'price(I, 7).') == ['price(plum, 7)']
+    assert query(runtime, 'price(kiwi, P).') == []
+    assert query(runtime, 'dear(I, P).') == ['dear(pear, 5)', 'dear(plum, 7)']
+    assert query(runtime, 'cheap(I).') == ['cheap(apple)', 'cheap(fig)']
+
+
+def test_numeric_table_aggregates(runtime_class):
+    runtime = make_runtime(runtime_class)
+    assert query(runtime, 'total(S).') == ['total(17)']
+    assert query(runtime, 'count_dear(N).') == ['count_dear(2)']
+    assert query(runtime, 'top(M).') == ['top(5)']
+    assert query(runtime, 'aggregate_all(max(P), price(kiwi, P), M).') == []
+
+
+def test_numeric_filters_match_clauses():
+    rows = [(f'i{i}', i % 17, (i * 7) % 11) for i in range(200)]
+    facts = ''.join(f'item({n}, {a}, {b}).\n' for n, a, b in rows)
+    rules = (
+        'pick(N) :- item(N, A, B), 12 < A + B, A =/ B.\n'
+        'sum_a(S) :- aggregate_all(sum(A), (item(_, A, B), B < 5), S).\n'
+    )
+    plain = Runtime(Parser(Scanner(facts + rules).tokenize()).parse_rules())
+    table = Runtime(Parser(Scanner(rules).tokenize()).parse_rules())
+    table.register_table('item', [numpy.array(c) for c in zip(*rows)])
+
+    for text in ['pick(N).', 'sum_a(S).', 'item(N, 3, B).']:
+        assert query(table, text) == query(plain, text)
+
+
+def test_numeric_filters_do_not_overflow():
+    rules = (
+        'big(I, V) :- price(I, V), 0 < V * V.\n'
+        'cnt(N) :- aggregate_all(count, (price(_, V), 0 < V * V), N).\n'
+        'low(I) :- small(I, V), 0 > V - 10.\n'
+    )
+    facts = f'price(a, {2**32}).\nprice(b, 3).\nsmall(c, 5).\n'
+    plain = Runtime(Parser(Scanner(facts + rules).tokenize()).parse_rules())
+    table = Runtime(Parser(Scanner(rules).tokenize()).parse_rules())
+    table.register_table('price', [numpy.array(['a', 'b']), [2**32, 3]])
+    table.register_table(
+        'small', [numpy.array(['c']), numpy.array([5], dtype=numpy.uint8)]
+    )
+
+    for text in ['big(I, V).', 'cnt(N).', 'low(I).']:
+        assert query(table, text) == query(plain, text)
+    assert query(table, 'cnt(N).') == ['cnt(2)']
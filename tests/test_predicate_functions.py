@@ -2,6 +2,7 @@ from prolog.interpreter import Runtime
 from prolog.parser import Parser
 from prolog.scanner import Scanner
 from prolog.types import Term
+from tests.conftest import query
 
 
 def color_predicate():
@@ -51,7 +52,7 @@ def test_simple_predicate_function():
 
     expected_binding = [
         '{Color: red}',
-        '{Color: gree}',
+        '{Color: green}',
         '{Color: blue}'
     ]
 
@@ -118,14 +119,74 @@ def test_two_predicate_functions():
     ).parse_terms()
 
     expected_binding = [
-        '{X1: 1, Y1: 10, X2: 1, Y2: 10}',
-        '{X1: 2, Y1: 20, X2: 2, Y2: 20}',
-        '{X1: 3, Y1: 30, X2: 3, Y2: 30}'
+        f'{{X1: {x}, Y1: {y}, X2: {x}, Y2: {y}}}'
+        for y in [10, 20, 30]
+        for x in [1, 2, 3]
     ]
 
-    has_solution = False
-    for index, item in enumerate(runtime.execute(goal)):
-        has_solution = True
-        assert str(goal.match(item)) == expected_binding[index]
+    bindings = [str(goal.match(item)) for item in runtime.execute(goal)]
+    assert bindings == expected_binding
 
-    assert has_solution is True
+
+def test_foreign_predicate_arguments(runtime_class):
+    source = '''
+    square_of(X, Y) :- square(X, Y).
+    '''
+    runtime = runtime_class(Parser(Scanner(source).tokenize()).parse_rules())
+
+    def square(x, y):
+        if x is not None:
+            yield None, x.pred * x.pred
+        elif y is not None:
+            root = round(y.pred ** 0.5)
+            if root * root == y.pred:
+                yield root, None
+                yield -root, None
+        else:
+            yield from ((n, n * n) for n in range(3))
+
+    runtime.register_function(square, 'square', 2)
+    assert query(runtime, 'square_of(3, Y).') == ['square_of(3, 9)']
+    assert query(runtime, 'square_of(X, 16).') == [
+        'square_of(4, 16)', 'square_of(-4, 16)'
+    ]
+    assert query(runtime, 'square_of(X, 15).') == []
+    assert query(runtime, 'square(X, Y).') == [
+        'square(0, 0)', 'square(1, 1)', 'square(2, 4)'
+    ]
+    assert query(runtime, 'square(X, Y), square(Y, Z), Z > 10.') == [
+        '##(2, 4, 16)'
+    ]
+
+
+def test_foreign_predicate_streams(runtime_class):
+    source = '''
+    first(X) :- nat(X), X > 2, !.
+    '''
+    runtime = runtime_class(Parser(Scanner(source).tokenize()).parse_rules())
+    pulled = []
+    closed = []
+
+    def nat():
+        number = 0
+        try:
+            while True:
+                pulled.append(number)
+                yield number
+                number += 1
+        finally:
+            closed.append(number)
+
+    runtime.register_function(nat, 'nat', 1)
+    assert query(runtime, 'first(X).') == ['first(3)']
+    assert closed == [pulled[-1]]
+    # One solution may be pulled ahead to tell whether more remain.
+    assert len(pulled) <= 5
+
+    goal = Parser(Scanner('nat(X), nat(Y).').tokenize()).parse_query()
+    solutions = runtime.execute(goal)
+    assert [str(next(solutions)) for _ in range(2)] == [
+        '##(0, 0)', '##(0, 1)'
+    ]
+    solutions.close()
+    assert len(closed) == 3
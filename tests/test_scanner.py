@@ -1,3 +1,7 @@
+import pytest
+from prolog.errors import ScannerError
+from prolog.interpreter import Runtime, IterativeRuntime
+from prolog.parser import Parser
 from prolog.scanner import Scanner
 from prolog.token import Token
 from prolog.token_type import TokenType
@@ -55,3 +59,95 @@ def test_scanner():
     for index, token in enumerate(tokens):
         assert token.token_type == expected_tokens[index].token_type
         assert token.lexeme == expected_tokens[index].lexeme
+
+
+def scan(source):
+    return [
+        (token.token_type, token.lexeme, token.literal, token.line)
+        for token in Scanner(source).tokenize()
+    ]
+
+
+def test_scanner_literals_and_lines():
+    source = "p('a\nb', -1, 2.5, _X, _ Y) :- /* x\ny */ X // 2 =< Y. % c\n"
+    assert scan(source) == [
+        (TokenType.ATOM, 'p', None, 1),
+        (TokenType.LEFTPAREN, '(', None, 1),
+        (TokenType.ATOM, 'a\nb', 'a\nb', 2),
+        (TokenType.COMMA, ',', None, 2),
+        (TokenType.NUMBER, '-1', -1, 2),
+        (TokenType.COMMA, ',', None, 2),
+        (TokenType.NUMBER, '2.5', 2.5, 2),
+        (TokenType.COMMA, ',', None, 2),
+        (TokenType.UNDERSCORE, '_', None, 2),
+        (TokenType.VARIABLE, 'X', None, 2),
+        (TokenType.COMMA, ',', None, 2),
+        (TokenType.VARIABLE, '_', None, 2),
+        (TokenType.VARIABLE, 'Y', None, 2),
+        (TokenType.RIGHTPAREN, ')', None, 2),
+        (TokenType.COLONMINUS, ':-', None, 2),
+        (TokenType.VARIABLE, 'X', None, 2),
+        (TokenType.SLASHSLASH, '//', None, 2),
+        (TokenType.NUMBER, '2', 2, 2),
+        (TokenType.EQUALLESS, '=<', None, 2),
+        (TokenType.VARIABLE, 'Y', None, 2),
+        (TokenType.DOT, '.', None, 2),
+        (TokenType.EOF, '\n', None, 3),
+    ]
+    assert scan('fail')[0][0] == TokenType.FAIL
+    assert scan('a. ')[-1] == (TokenType.EOF, ' ', None, 1)
+
+
+def test_scanner_errors():
+    errors = []
+
+    def report(line, message):
+        errors.append((line, message))
+
+    tokens = Scanner('a.\nb = c: d ?\n/* e', report).tokenize()
+    lexemes = [token.lexeme for token in tokens]
+    assert lexemes == ['a', '.', 'b', 'c', 'd', '/* e']
+    assert errors == [
+        (2, 'Unexpected character: ='),
+        (2, 'Expected `-` but found `:`'),
+        (2, 'Unexpected character: ?'),
+        (3, 'Unterminated comment'),
+    ]
+
+    with pytest.raises(ScannerError):
+        Scanner("p('a).").tokenize()
+
+
+def test_scanner_bytes():
+    source = "p('a\nb', -1, 2.5, _ X, 'crème') :- /* x */ X >= 2.\n  "
+    assert scan(source.encode()) == scan(source)
+
+    errors = []
+    tokens = Scanner('a.\nb é c'.encode(), lambda *e: errors.append(e))
+    lexemes = [token.lexeme for token in tokens.tokenize()]
+    assert lexemes == ['a', '.', 'b', 'c', 'c']
+    assert errors == [(2, 'Unexpected character: é')]
+
+
+def test_consult_clauses_from_chunks():
+    source = """
+    % rooms of the house
+    door(kitchen, office).
+    door(office, 'dining room').
+    size(kitchen, 12.5). /* square meters */
+    next(X, Y) :- door(X, Y).
+    next(X, Y) :- door(Y, X).
+    """
+    chunks = [source[i:i + 7] for i in range(0, len(source), 7)]
+    runtime = IterativeRuntime([])
+    runtime.consult(Parser(Scanner(chunks).scan()).rules())
+
+    expected = Runtime(Parser(Scanner(source).tokenize()).parse_rules())
+    assert [str(rule) for rule in runtime.rules] == [
+        str(rule) for rule in expected.rules
+    ]
+    goal = Parser(Scanner('next(office, X).').tokenize()).parse_query()
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'next(office, dining room)',
+        'next(office, kitchen)',
+    ]
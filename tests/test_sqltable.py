@@ -0,0 +1,77 @@
+import sqlite3
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from tests.conftest import query
+
+
+source = '''
+manager(E, M) :- reports(E, B), employee(B, M, _).
+peer(A, B) :- employee(I, A, D), employee(J, B, D).
+staff(D, N) :- aggregate_all(count, employee(_, _, D), N).
+'''
+
+
+def make_database(path):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT, dept TEXT)'
+    )
+    connection.executemany(
+        'INSERT INTO people VALUES (?, ?, ?)',
+        [(1, 'alice', 'sales'), (2, 'bob', 'lab'), (3, 'carol', 'sales')],
+    )
+    connection.execute('CREATE TABLE boss (worker, head)')
+    connection.executemany(
+        'INSERT INTO boss VALUES (?, ?)', [('alice', 3), ('bob', 1)]
+    )
+    connection.commit()
+    return connection
+
+
+def test_sqlite_predicate(tmp_path, runtime_class):
+    connection = make_database(tmp_path / 'staff.db')
+    statements = []
+    connection.set_trace_callback(statements.append)
+
+    runtime = runtime_class(Parser(Scanner(source).tokenize()).parse_rules())
+    runtime.register_sqlite('employee', connection, 'people')
+    runtime.register_sqlite('reports', tmp_path / 'staff.db', 'boss')
+
+    assert query(runtime, 'employee(2, N, D).') == ['employee(2, bob, lab)']
+    assert statements[-1] == (
+        'SELECT "id", "name", "dept" FROM "people" WHERE "id" = 2'
+    )
+    assert query(runtime, 'manager(alice, M).') == ['manager(alice, carol)']
+    assert query(runtime, 'peer(alice, B).') == [
+        'peer(alice, alice)', 'peer(alice, carol)'
+    ]
+    assert query(runtime, 'employee(X, Y, Y).') == []
+    assert 'WHERE "dept" IS "name"' in statements[-1]
+    assert query(runtime, 'employee(f(X), Y, Z).') == []
+
+    assert query(runtime, 'staff(sales, N).') == ['staff(sales, 2)']
+    assert statements[-1] == (
+        "SELECT count(*) FROM \"people\" WHERE \"dept\" = 'sales'"
+    )
+
+
+def test_sqlite_null(runtime_class):
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE t (a, b)')
+    connection.executemany(
+        'INSERT INTO t VALUES (?, ?)', [(1, None), (2, 'null'), (None, None)]
+    )
+    runtime = runtime_class([])
+    runtime.register_sqlite('t', connection, 't')
+
+    assert query(runtime, 't(1, B).') == ['t(1, null)']
+    assert query(runtime, 't(A, null).') == [
+        't(1, null)', 't(2, null)', 't(null, null)'
+    ]
+    assert query(runtime, 't(A, B), t(A, B).') == [
+        '##(1, null)', '##(2, null)', '##(null, null)'
+    ]
+    assert query(runtime, 't(X, X).') == ['t(null, null)']
+    assert query(runtime, 'aggregate_all(count, t(null, B), N).') == [
+        'aggregate_all(count, t(null, B), 1)'
+    ]
@@ -0,0 +1,100 @@
+from prolog.interpreter import Runtime, IterativeRuntime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from prolog.tabling import Table
+from tests.conftest import query
+
+
+source = '''
+:- table path/2.
+
+edge(a, b).
+edge(b, c).
+edge(c, a).
+edge(c, d).
+
+path(X, Y) :- path(X, Z), edge(Z, Y).
+path(X, Y) :- edge(X, Y).
+
+here(a).
+reach(X) :- here(H), path(H, X).
+'''
+
+
+def test_parse_table_directive():
+    rules = Parser(
+        Scanner(':- table path/2, edge/2.\nedge(a, b).').tokenize()
+    ).parse_rules()
+
+    assert [str(rule) for rule in rules[:2]] == [
+        ':- table path/2.',
+        ':- table edge/2.',
+    ]
+    assert isinstance(rules[0], Table)
+    assert str(rules[2].head) == 'edge(a, b)'
+
+
+def test_left_recursion_terminates(runtime_class):
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = runtime_class(rules)
+
+    assert sorted(query(runtime, 'path(a, X).')) == [
+        'path(a, a)',
+        'path(a, b)',
+        'path(a, c)',
+        'path(a, d)',
+    ]
+    assert sorted(query(runtime, 'path(X, d).')) == [
+        'path(a, d)',
+        'path(b, d)',
+        'path(c, d)',
+    ]
+    assert query(runtime, 'path(d, X).') == []
+
+
+def test_tables_invalidated_on_database_change():
+    runtime = Runtime(Parser(Scanner(source).tokenize()).parse_rules())
+    assert sorted(query(runtime, 'reach(X).')) == [
+        'reach(a)',
+        'reach(b)',
+        'reach(c)',
+        'reach(d)',
+    ]
+
+    query(runtime, 'assertz(edge(d, e)).')
+    assert 'path(a, e)' in query(runtime, 'path(a, X).')
+
+    query(runtime, 'retract(edge(c, d)).')
+    assert query(runtime, 'path(a, e).') == []
+
+    query(runtime, 'retract(here(_)), asserta(here(d)).')
+    assert query(runtime, 'reach(X).') == ['reach(e)']
+
+
+def cycle(n, recursion):
+    edges = '\n'.join(f'edge(n{i}, n{(i + 1) % n}).' for i in range(n))
+    text = f':- table path/2.\n{edges}\npath(X, Y) :- edge(X, Y).\n'
+    return Runtime(Parser(Scanner(text + recursion).tokenize()).parse_rules())
+
+
+def test_long_cycles_are_polynomial():
+    runtime = cycle(300, 'path(X, Y) :- path(X, Z), edge(Z, Y).')
+    assert len(query(runtime, 'path(n0, X).')) == 300
+
+    runtime = cycle(40, 'path(X, Y) :- edge(X, Z), path(Z, Y).')
+    assert len(query(runtime, 'path(n0, X).')) == 40
+
+
+def test_deep_tabled_recursion():
+    text = '''
+    :- table fib/2.
+    fib(0, 0).
+    fib(1, 1).
+    fib(N, F) :- N > 1, N1 is N - 1, N2 is N - 2,
+        fib(N1, F1), fib(N2, F2), F is F1 + F2.
+    '''
+    runtime = IterativeRuntime(Parser(Scanner(text).tokenize()).parse_rules())
+    a, b = 0, 1
+    for _ in range(1000):
+        a, b = b, a + b
+    assert query(runtime, 'fib(1000, F).') == [f'fib(1000, {a})']
@@ -0,0 +1,138 @@
+from prolog.interpreter import Runtime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from prolog.trail import Trail
+from prolog.types import Term, Variable, Dot, Bar
+
+
+def test_unify_binds_in_place_and_undo_restores():
+    x = Variable('X')
+    y = Variable('Y')
+    goal = Term('location', x, Term('room', y))
+    fact = Term('location', Term('desk'), Term('room', Term('office')))
+
+    trail = Trail()
+    mark = trail.mark()
+    assert goal.unify(fact, trail)
+    assert str(goal.resolve()) == 'location(desk, room(office))'
+    assert str(trail.bindings(mark)) == '{X: desk, Y: office}'
+
+    trail.undo(mark)
+    assert x.ref is None and y.ref is None
+    assert str(goal.resolve()) == 'location(X, room(Y))'
+
+
+def test_failed_unification_leaves_bindings_for_undo():
+    x = Variable('X')
+    goal = Term('door', x, x)
+    fact = Term('door', Term('kitchen'), Term('office'))
+
+    trail = Trail()
+    assert not goal.unify(fact, trail)
+    trail.undo(0)
+    assert x.ref is None
+
+
+def test_unify_partial_lists():
+    h = Variable('H')
+    t = Variable('T')
+    pattern = Bar(Dot.from_list([h]), t)
+    lst = Dot.from_list([Term('a'), Term('b'), Term('c')])
+
+    trail = Trail()
+    assert pattern.unify(lst, trail)
+    assert str(h.resolve()) == 'a'
+    assert str(t.resolve()) == '[b, c]'
+
+    trail.undo(0)
+    assert pattern.unify(Dot.from_list([Term('a')]), trail)
+    assert str(t.resolve()) == '[]'
+
+
+def test_recursive_predicates_over_lists():
+    source = '''
+    append([], L, L).
+    append([H | T], L, [H | R]) :- append(T, L, R).
+
+    len([], 0).
+    len([_ | T], N) :- len(T, M), N is M + 1.
+    '''
+
+    runtime = Runtime(Parser(Scanner(source).tokenize()).parse_rules())
+
+    goal = Parser(
+        Scanner('append(X, Y, [a, b]).').tokenize()
+    ).parse_query()
+
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'append([], [a, b], [a, b])',
+        'append([a], [b], [a, b])',
+        'append([a, b], [], [a, b])',
+    ]
+
+    goal = Parser(
+        Scanner('append([a, b], [c], X), len(X, N).').tokenize()
+    ).parse_query()
+
+    assert [str(item) for item in runtime.execute(goal)] == [
+        '##([a, b, c], 3)'
+    ]
+
+
+def test_atoms_and_ground_terms_are_shared():
+    rules = Parser(
+        Scanner(
+            'location(desk, room(office)).\n'
+            'location(lamp, room(office)).\n'
+            'near(X, desk) :- location(X, room(office)).\n'
+            'g(pos(1, 2.0)).\n'
+            'g(pos(1, 2.0)).\n'
+            'g(pos(1.0, 2)).'
+        ).tokenize()
+    ).parse_rules()
+
+    first, second, rule, one, two, three = rules
+    assert first.head.args[1] is second.head.args[1]
+    assert first.head.args[0] is rule.head.args[1]
+    assert first.head.args[1] is rule.body.args[1]
+    assert one.head.args[0] is two.head.args[0]
+    assert one.head.args[0] is not three.head.args[0]
+    assert str(three.head) == 'g(pos(1.0, 2))'
+
+    env = {}
+    assert first.head.rename(env) is first.head
+    assert first.head.resolve() is first.head
+    assert rule.head.rename(env) is not rule.head
+
+
+def test_terms_are_compact_and_lists_iterate_independently():
+    items = Dot.from_list([Term('a'), Term('b')])
+    pairs = [(str(x), str(y)) for x in items for y in items]
+    assert pairs == [('a', 'a'), ('a', 'b'), ('b', 'a'), ('b', 'b')]
+
+    for term in [Variable('X'), items, Bar(items, Variable('T')), Term('a')]:
+        assert not hasattr(term, '__dict__')
+    assert isinstance(Term('f', Term('a')).args, tuple)
+
+
+def test_rules_know_their_variables():
+    rules = Parser(
+        Scanner(
+            'location(desk, [office, hall]).\n'
+            'location(_, cellar).\n'
+            'near(X, Y) :- location(X, R), location(Y, R), Z is 1 + 2.'
+        ).tokenize()
+    ).parse_rules()
+
+    fact, anonymous, rule = rules
+    assert fact.ground and fact.head.ground
+    assert fact.head.args[1].rename({}) is fact.head.args[1]
+    assert anonymous.variables == {'_'}
+    assert rule.variables == {'X', 'Y', 'R', 'Z'}
+
+    runtime = Runtime(rules)
+    goal = Parser(Scanner('location(desk, X).').tokenize()).parse_query()
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'location(desk, [office, hall])',
+        'location(desk, cellar)',
+    ]
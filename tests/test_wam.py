@@ -0,0 +1,155 @@
+from prolog.interpreter import Runtime
+from prolog.parser import Parser
+from prolog.scanner import Scanner
+from prolog.types import Term
+from prolog.wam import WamRuntime, compile_predicate, disassemble
+
+
+source = '''
+:- table path/2.
+
+location(desk, office).
+location(apple, kitchen).
+location(flashlight, desk).
+location(broccoli, kitchen).
+location(computer, office).
+
+door(office, hall).
+door(kitchen, office).
+door(kitchen, cellar).
+
+data(one).
+data(two).
+data(three).
+
+cut_test(X, Y) :- data(X), !, data(Y).
+cut_test(none, none).
+
+append([], L, L).
+append([H | T], L, [H | R]) :- append(T, L, R).
+
+len([], 0).
+len([_ | T], N) :- len(T, M), N is M + 1.
+
+nrev([], []).
+nrev([H | T], R) :- nrev(T, RT), append(RT, [H], R).
+
+edge(a, b).
+edge(b, a).
+path(X, Y) :- path(X, Z), edge(Z, Y).
+path(X, Y) :- edge(X, Y).
+
+call_it(G) :- G.
+num(1).
+num(2).
+num(3).
+small(X) :- num(X), X =< 2.
+here(kitchen).
+move(Place) :- retract(here(_)), asserta(here(Place)).
+same(X, X).
+triple(f(X, Y, X)).
+shape(A, B) :- same(A, g(B, C)), write(A), nl.
+'''
+
+queries = [
+    'location(X, office).',
+    'door(kitchen, R), location(T, R).',
+    'cut_test(X, Y).',
+    'append(X, Y, [a, b, c]).',
+    'nrev([a, b, c, d], R), len(R, N).',
+    'path(a, X).',
+    'call_it(data(X)).',
+    'small(X).',
+    'location(X, Y), write(X), nl, fail.',
+    'move(office), here(X).',
+    'triple(T).',
+    'triple(f(A, B, C)).',
+    'same(X, Y).',
+    'shape(A, B).',
+    'append([a], T, L), write(L), nl.',
+]
+
+
+def solutions(runtime_class, query):
+    rules = Parser(Scanner(source).tokenize()).parse_rules()
+    runtime = runtime_class(rules)
+    goal = Parser(Scanner(query).tokenize()).parse_query()
+    results = [str(item) for item in runtime.execute(goal)]
+    return results, runtime.stream_read()
+
+
+def test_same_solutions_as_runtime():
+    for query in queries:
+        assert solutions(WamRuntime, query) == solutions(Runtime, query), query
+
+
+def test_compile_predicate():
+    rules = Parser(
+        Scanner(
+            'append([], L, L).\n'
+            'append([H | T], L, [H | R]) :- append(T, L, R).'
+        ).tokenize()
+    ).parse_rules()
+
+    code, registers = compile_predicate(rules, 3)
+    listing = [line.split()[1] for line in disassemble(code).splitlines()]
+
+    assert listing == [
+        'switch_on_term',
+        'try_me_else',
+        'get_constant',
+        'get_variable',
+        'get_value',
+        'proceed',
+        'trust_me',
+        'get_structure',
+        'unify_variable',
+        'unify_variable',
+        'get_variable',
+        'get_structure',
+        'unify_value',
+        'unify_variable',
+        'put_value',
+        'put_value',
+        'put_value',
+        'execute',
+        'fail',
+    ]
+    assert registers == 8
+
+
+def test_database_changes_recompile_predicates():
+    runtime = WamRuntime(Parser(Scanner(source).tokenize()).parse_rules())
+
+    def query(text):
+        goal = Parser(Scanner(text).tokenize()).parse_query()
+        return [str(item) for item in runtime.execute(goal)]
+
+    assert query('data(X).') == ['data(one)', 'data(two)', 'data(three)']
+    query('assertz(data(four)), retract(data(one)).')
+    assert query('data(X).') == ['data(two)', 'data(three)', 'data(four)']
+
+
+def test_registered_functions_run_foreign():
+    def colors():
+        for color in ['red', 'green']:
+            yield Term(color)
+
+    runtime = WamRuntime(Parser(Scanner(source).tokenize()).parse_rules())
+    runtime.register_function(colors, 'color', 1)
+    goal = Parser(Scanner('color(X), data(X).').tokenize()).parse_query()
+    assert list(runtime.execute(goal)) == []
+
+    goal = Parser(Scanner('color(X).').tokenize()).parse_query()
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'color(red)', 'color(green)'
+    ]
+
+
+def test_deep_recursion():
+    items = ', '.join('a' for _ in range(20000))
+    runtime = WamRuntime(Parser(Scanner(source).tokenize()).parse_rules())
+    goal = Parser(Scanner(f'len([{items}], N).').tokenize()).parse_query()
+    assert [str(item) for item in runtime.execute(goal)] == [
+        'len([' + items + '], 20000)'
+    ]